@@ -1,8 +1,138 @@
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Union
 
+import cv2
 import numpy as np
 
-from IMGBOX.core import Image
+from IMGBOX.core import Image, _check_out
+from IMGBOX.aio import _offloader
+
+
+Batch = Union[List[Image], np.ndarray]
+
+
+def _batch_names(imgs: Batch) -> List[str]:
+    """Names of images in batch, stacked array named by its id"""
+    if isinstance(imgs, np.ndarray) and not isinstance(imgs, Image):
+        prefix = "array_" + str(id(imgs))
+        return ["{}[{}]".format(prefix, idx) for idx in range(len(imgs))]
+    return [img.name for img in imgs]
+
+
+def _to_stack(imgs: Batch) -> np.ndarray:
+    """Stack images into array of (N, h, w[, 3]), None if shapes differ"""
+    if isinstance(imgs, np.ndarray) and not isinstance(imgs, Image):
+        valid = imgs.ndim == 3 or (imgs.ndim == 4 and imgs.shape[-1] == 3)
+        if imgs.dtype != np.uint8 or not valid:
+            msg = "Batch array must be uint8 of (N, h, w[, 3]), got {} {}"
+            raise ValueError(msg.format(imgs.dtype, imgs.shape))
+        return imgs
+
+    if len(imgs) == 0 or any(img.shape != imgs[0].shape for img in imgs):
+        return None
+    return np.stack([np.asarray(img) for img in imgs])
+
+
+def _to_images(imgs: Batch, names: List[str]) -> List[Image]:
+    """Batch as list of Image, stacked array is viewed without copy"""
+    if isinstance(imgs, np.ndarray) and not isinstance(imgs, Image):
+        _to_stack(imgs)  # validate the stacked array
+        result = []
+        for array, name in zip(imgs, names):
+            img = array.view(Image)
+            img.name = name
+            result.append(img)
+        return result
+    return list(imgs)
+
+
+def _cvt_stack(stack: np.ndarray, color: str, to_f32: bool) -> np.ndarray:
+    """Convert color and dtype of stacked images at once"""
+    n, h, w = stack.shape[:3]
+    if color == "gray" and stack.ndim == 4:
+        flat = np.ascontiguousarray(stack).reshape(n * h, w, 3)
+        stack = cv2.cvtColor(flat, cv2.COLOR_BGR2GRAY).reshape(n, h, w)
+    elif color == "color" and stack.ndim == 3:
+        flat = np.ascontiguousarray(stack).reshape(n * h, w)
+        stack = cv2.cvtColor(flat, cv2.COLOR_GRAY2BGR).reshape(n, h, w, 3)
+    elif color not in ["unchanged", "color", "gray"]:
+        msg = "Unrecognized color option: {}".format(color)
+        raise ValueError(msg)
+
+    if to_f32:
+        stack = stack.astype(np.float32, copy=False)
+    return stack
+
+
+def _split_stack(
+        result: np.ndarray, names: List[str], sources: List[np.ndarray]
+        ) -> List[Image]:
+    """Split stacked result into Image objects viewing the result"""
+    valid = result.ndim == 3 or (result.ndim == 4 and result.shape[-1] == 3)
+    if result.dtype != np.uint8 or not valid:
+        msg = "Batch result must be uint8 of (N, h, w[, 3]), got {} {}"
+        raise ValueError(msg.format(result.dtype, result.shape))
+
+    if any(np.may_share_memory(result, src) for src in sources):
+        result = result.copy()
+
+    imgs = []
+    for array, name in zip(result, names):
+        img = array.view(Image)
+        img.name = name
+        imgs.append(img)
+    return imgs
+
+
+class _Scratch(threading.local):
+    """Per-thread buffers reused by operations called with out"""
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, key, shape: tuple, dtype=np.uint8) -> np.ndarray:
+        """Buffer of shape and dtype for key, reallocated if they change"""
+        buffer = self._buffers.get(key)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[key] = buffer
+        return buffer
+
+
+_scratch = _Scratch()
+
+
+def _convert(img: Image, color: str, to_f32: bool, slot: int = None):
+    """Convert color and dtype of image for operating on it
+
+    Args:
+        slot: if given, the converted image is written into
+            per-thread buffers of the slot instead of a new array
+    """
+    if color == "color" and not img.is_color:
+        buffer = None
+        if slot is not None:
+            buffer = _scratch.get(("color", slot), img.shape[:2] + (3,))
+        img = img.to_color(out=buffer)
+    elif color == "gray" and img.is_color:
+        buffer = None
+        if slot is not None:
+            buffer = _scratch.get(("gray", slot), img.shape[:2])
+        img = img.to_gray(out=buffer)
+    elif color not in ["unchanged", "color", "gray"]:
+        msg = "Unrecognized color option: {}".format(color)
+        raise ValueError(msg)
+
+    if to_f32 and img.dtype != np.float32:
+        if slot is None:
+            img = img.to_float32()
+        else:
+            buffer = _scratch.get(("f32", slot), img.shape, np.float32)
+            np.copyto(buffer, img)
+            img = buffer
+    return img
 
 
 class SingularOperation(ABC):
@@ -10,6 +140,15 @@ class SingularOperation(ABC):
 
     _cvt_to_f32 = False
     _color = "unchanged"  # options: "unchanged", "color", "gray"
+    # radius of neighborhood an output pixel depends on,
+    # None if it depends on the whole image.
+    # Operations with finite _halo must keep (h, w) of image unchanged.
+    _halo = None
+    # optional, vectorised _operate on stacked array of (N, h, w[, 3])
+    _operate_batch = None
+    # optional, _operate(img1, out) writing result into out and return it,
+    # out must be checked by IMGBOX.core._check_out
+    _operate_into = None
 
     @abstractmethod
     def _operate(self, img1: np.ndarray) -> np.ndarray:
@@ -23,21 +162,70 @@ class SingularOperation(ABC):
         """
         pass
 
-    def on(self, img: Image) -> Image:
-        """Operate on single image"""
-        if self._color == "color":
-            img = img.to_color()
-        elif self._color == "gray":
-            img = img.to_gray()
-        elif self._color != "unchanged":
-            msg = "Unrecognized color option: {}".format(self._color)
-            raise ValueError(msg)
-
-        if self._cvt_to_f32:
-            img = img.astype(np.float32, copy=False)
-        result_array = self._operate(img)
+    def on(self, img: Image, out: np.ndarray = None) -> Image:
+        """Operate on single image
+
+        Args:
+            img: the image to operate on
+            out: if given, uint8 array of result shape to write the result in.
+                Conversions of img then reuse per-thread buffers,
+                so repeated calls on same shapes need no new arrays
+                for operations implement _operate_into.
+
+        Returns:
+            result Image, which is out if given
+        """
         name = "{} on ".format(self.__class__.__name__) + img.name
-        return Image(result_array, name=name)
+        if out is not None:
+            img = _convert(img, self._color, self._cvt_to_f32, slot=0)
+            if self._operate_into is not None:
+                out = self._operate_into(img, out)
+            else:
+                result_array = self._operate(img)
+                out = _check_out(out, result_array.shape)
+                np.copyto(out, result_array)
+            out.name = name
+            return out
+
+        img = _convert(img, self._color, self._cvt_to_f32)
+        result_array = self._operate(img)
+        # _operate may return a view of its input (e.g. Crop)
+        copy = np.may_share_memory(result_array, img)
+        return Image(result_array, name=name, copy=copy)
+
+    async def aon(self, img: Image) -> Image:
+        """Async .on(), run on the executor of configure_async
+
+        Bytes in flight are estimated as twice of the image.
+        """
+        return await _offloader.run(2 * img.nbytes, self.on, img)
+
+    def on_batch(self, imgs: Batch, workers: int = None) -> List[Image]:
+        """Operate on a batch of images
+
+        Operations implement _operate_batch process same-shaped images
+        at once, otherwise images are operated one by one in a thread pool.
+
+        Args:
+            imgs: list of Image, or stacked array of (N, h, w[, 3])
+            workers (int): number of threads used when not vectorised
+
+        Returns:
+            list of result Image, in the same order as imgs
+        """
+        names = _batch_names(imgs)
+        stack = _to_stack(imgs) if self._operate_batch is not None else None
+        if stack is not None:
+            converted = _cvt_stack(stack, self._color, self._cvt_to_f32)
+            result = self._operate_batch(converted)
+            names = [
+                "{} on ".format(self.__class__.__name__) + name
+                for name in names
+            ]
+            return _split_stack(result, names, [stack])
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.on, _to_images(imgs, names)))
 
 
 class BinaryOperation(ABC):
@@ -45,6 +233,9 @@ class BinaryOperation(ABC):
 
     _cvt_to_f32 = False
     _color = "unchanged"  # options: "unchanged", "color", "gray"
+    _halo = None  # see SingularOperation._halo
+    _operate_batch = None  # see SingularOperation._operate_batch
+    _operate_into = None  # see SingularOperation._operate_into
 
     @abstractmethod
     def _operate(self, img1: np.ndarray, img2: np.ndarray) -> np.ndarray:
@@ -58,24 +249,93 @@ class BinaryOperation(ABC):
         """
         pass
 
-    def on(self, img1: Image, img2: Image) -> Image:
-        """Operate on two images"""
-        if self._color == "color":
-            img1 = img1.to_color()
-            img2 = img2.to_color()
-        elif self._color == "gray":
-            img1 = img1.to_gray()
-            img2 = img2.to_gray()
-        elif self._color != "unchanged":
-            msg = "Unrecognized color option: {}".format(self._color)
-            raise ValueError(msg)
-
-        if self._cvt_to_f32:
-            img1 = img1.astype(np.float32, copy=False)
-            img2 = img2.astype(np.float32, copy=False)
+    def on(self, img1: Image, img2: Image, out: np.ndarray = None) -> Image:
+        """Operate on two images
 
-        result_array = self._operate(img1, img2)
+        Args:
+            img1, img2: the images to operate on
+            out: if given, uint8 array to write the result in,
+                see SingularOperation.on
+
+        Returns:
+            result Image, which is out if given
+        """
         name = "{} on ({}, {})".format(
             self.__class__.__name__, img1.name, img2.name
         )
-        return Image(result_array, name=name)
+        if out is not None:
+            img1 = _convert(img1, self._color, self._cvt_to_f32, slot=0)
+            img2 = _convert(img2, self._color, self._cvt_to_f32, slot=1)
+            if self._operate_into is not None:
+                out = self._operate_into(img1, img2, out)
+            else:
+                result_array = self._operate(img1, img2)
+                out = _check_out(out, result_array.shape)
+                np.copyto(out, result_array)
+            out.name = name
+            return out
+
+        img1 = _convert(img1, self._color, self._cvt_to_f32)
+        img2 = _convert(img2, self._color, self._cvt_to_f32)
+        result_array = self._operate(img1, img2)
+        copy = np.may_share_memory(result_array, img1) or \
+            np.may_share_memory(result_array, img2)
+        return Image(result_array, name=name, copy=copy)
+
+    async def aon(self, img1: Image, img2: Image) -> Image:
+        """Async .on(), see SingularOperation.aon"""
+        nbytes = 2 * (img1.nbytes + img2.nbytes)
+        return await _offloader.run(nbytes, self.on, img1, img2)
+
+    def on_batch(
+            self, imgs1: Batch, imgs2: Union[Batch, Image],
+            workers: int = None
+            ) -> List[Image]:
+        """Operate on batches of image pairs
+
+        Operations implement _operate_batch process same-shaped images
+        at once, otherwise pairs are operated one by one in a thread pool.
+
+        Args:
+            imgs1: list of Image, or stacked array of (N, h, w[, 3])
+            imgs2:
+                list of Image, or stacked array of (N, h, w[, 3]),
+                or a single Image to pair with every image in imgs1
+            workers (int): number of threads used when not vectorised
+
+        Returns:
+            list of result Image, in the same order as imgs1
+        """
+        names1 = _batch_names(imgs1)
+        broadcast = isinstance(imgs2, Image)
+        if broadcast:
+            names2 = [imgs2.name] * len(names1)
+            imgs2 = [imgs2] * len(names1)
+        else:
+            names2 = _batch_names(imgs2)
+        if len(names1) != len(names2):
+            msg = "Batches must have same length, got {} and {}"
+            raise ValueError(msg.format(len(names1), len(names2)))
+
+        stack1 = stack2 = None
+        if self._operate_batch is not None:
+            stack1 = _to_stack(imgs1)
+            # a single Image paired with all is broadcasted as (1, h, w[, 3])
+            stack2 = _to_stack(imgs2[:1] if broadcast else imgs2)
+
+        if stack1 is not None and stack2 is not None and \
+                stack1.shape[1:] == stack2.shape[1:]:
+            converted1 = _cvt_stack(stack1, self._color, self._cvt_to_f32)
+            converted2 = _cvt_stack(stack2, self._color, self._cvt_to_f32)
+            result = self._operate_batch(converted1, converted2)
+            names = [
+                "{} on ({}, {})".format(self.__class__.__name__, n1, n2)
+                for n1, n2 in zip(names1, names2)
+            ]
+            return _split_stack(result, names, [stack1, stack2])
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(
+                self.on,
+                _to_images(imgs1, names1), _to_images(imgs2, names2)
+            ))
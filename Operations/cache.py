@@ -0,0 +1,189 @@
+import os
+import uuid
+import hashlib
+import pathlib
+import threading
+from collections import OrderedDict
+from numbers import Number
+from typing import Union
+
+import numpy as np
+
+from IMGBOX.core import Image
+from IMGBOX.Operations.base import SingularOperation, BinaryOperation
+
+__all__ = ["ResultCache"]
+
+
+def _digest(hasher, value):
+    """Feed value into hasher, by content instead of repr
+
+    repr of large arrays is abbreviated and that of most objects contains
+    their address, so only values of known types are accepted.
+    """
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        hasher.update("array{}{}".format(array.dtype.str, array.shape).encode())
+        hasher.update(array.data.cast("B"))
+    elif isinstance(value, dict):
+        hasher.update("dict{}".format(len(value)).encode())
+        for key in sorted(value, key=repr):
+            _digest(hasher, key)
+            _digest(hasher, value[key])
+    elif isinstance(value, (list, tuple)):
+        # namedtuple e.g. Rectangle is keyed with its type name
+        hasher.update("{}{}".format(type(value).__name__, len(value)).encode())
+        for item in value:
+            _digest(hasher, item)
+    elif value is None or isinstance(value, (str, bytes, Number, np.generic)):
+        hasher.update(repr(value).encode())
+    else:
+        msg = "Can not key parameter of type {} for ResultCache"
+        raise TypeError(msg.format(type(value)))
+
+
+class ResultCache:
+    """Results of operations stored in .npy files of a directory
+
+    Results are keyed by hash of input images and of the operation,
+    i.e. its class and attributes set by its constructor,
+    such as Canny._thres1 or _FromSK._kwargs.
+    So rerunning an operation with the same parameters on the same images
+    reads the result back, memory-mapped, instead of operating again.
+    Least recently used results are removed when exceeding max_bytes.
+
+    The directory can be shared by processes, each of which only
+    tracks usage by itself and the modified time of files.
+
+    Example:
+        cache = ResultCache("~/.cache/imgbox", max_bytes=2**30)
+        for mu in [0.1, 0.25, 0.5]:
+            segmentation = cache.on(ChanVese(mu=mu), img)
+    """
+
+    def __init__(
+            self, directory: Union[str, pathlib.Path],
+            max_bytes: int = 2**30
+            ):
+        """
+        Args:
+            directory: where result files are stored, created if not exists
+            max_bytes (int): budget of total size of result files
+        """
+        if max_bytes < 0:
+            raise ValueError("max_bytes must >= 0, got {}".format(max_bytes))
+        self.directory = pathlib.Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        # key -> file size, from least to most recently used
+        self._sizes = OrderedDict()
+        files = sorted(
+            (f.stat().st_mtime, f.stem, f.stat().st_size)
+            for f in self.directory.glob("*.npy")
+        )
+        for _, key, size in files:
+            self._sizes[key] = size
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of result files"""
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def key(self, operation, *imgs: np.ndarray) -> str:
+        """Key of results of operation on imgs
+
+        Raises:
+            TypeError: operation has attributes can not be keyed,
+                e.g. callables or arbitrary objects
+        """
+        hasher = hashlib.blake2b(digest_size=20)
+        cls = type(operation)
+        hasher.update("{}.{}".format(cls.__module__, cls.__qualname__).encode())
+        _digest(hasher, vars(operation))
+        for img in imgs:
+            _digest(hasher, np.asarray(img))
+        return hasher.hexdigest()
+
+    def get(self, key: str) -> np.ndarray:
+        """Cached result of key, or None if not cached
+
+        The result is memory-mapped copy-on-write,
+        so changing it does not change the file.
+        """
+        file = self._file(key)
+        try:
+            result = np.load(str(file), mmap_mode="c")
+            os.utime(str(file))
+        except FileNotFoundError:
+            with self._lock:
+                self._sizes.pop(key, None)
+            return None
+
+        with self._lock:
+            self._sizes[key] = file.stat().st_size
+            self._sizes.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: np.ndarray):
+        """Store result of key, evicting least recently used results"""
+        file = self._file(key)
+        temp = file.with_name(".{}.{}.tmp".format(file.name, uuid.uuid4().hex))
+        try:
+            with open(str(temp), "wb") as f:
+                np.save(f, np.asarray(result), allow_pickle=False)
+            os.replace(str(temp), str(file))
+        finally:
+            if temp.exists():
+                temp.unlink()
+
+        with self._lock:
+            self._sizes[key] = file.stat().st_size
+            self._sizes.move_to_end(key)
+            self._evict()
+
+    def on(self, operation, *imgs: Image):
+        """Result of operation.on(*imgs), read from cache if available
+
+        Only results of np.ndarray are cached,
+        others, e.g. tuple of ChanVese(extended_output=True), are not.
+        """
+        key = self.key(operation, *imgs)
+        result = self.get(key)
+        if result is None:
+            result = operation.on(*imgs)
+            if isinstance(result, np.ndarray):
+                self.put(key, result)
+            return result
+
+        if isinstance(operation, (SingularOperation, BinaryOperation)):
+            result = result.view(Image)
+            names = ", ".join(img.name for img in imgs)
+            form = "{} on {}" if len(imgs) == 1 else "{} on ({})"
+            result.name = form.format(operation.__class__.__name__, names)
+        return result
+
+    def clear(self):
+        """Remove all result files"""
+        with self._lock:
+            for key in list(self._sizes):
+                self._remove(key)
+
+    def _file(self, key: str) -> pathlib.Path:
+        return self.directory / (key + ".npy")
+
+    def _evict(self):
+        total = sum(self._sizes.values())
+        while total > self.max_bytes and self._sizes:
+            key = next(iter(self._sizes))
+            total -= self._sizes[key]
+            self._remove(key)
+
+    def _remove(self, key: str):
+        self._sizes.pop(key, None)
+        try:
+            self._file(key).unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,224 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from IMGBOX.core import Image
+from IMGBOX.shapes import Rectangle
+from IMGBOX.Operations.base import SingularOperation, BinaryOperation
+from IMGBOX.Operations.crop import Crop
+
+__all__ = ["Chain"]
+
+
+def _crop_of(region: Tuple[int, int, int, int]) -> Crop:
+    return Crop(Rectangle(*region))
+
+
+def _shift(region, offset: Tuple[int, int]) -> Tuple[int, int, int, int]:
+    ymin, xmin, ymax, xmax = region
+    dy, dx = offset
+    return ymin + dy, xmin + dx, ymax + dy, xmax + dx
+
+
+class _Representations:
+    """Color and dtype conversions of arrays computed along a chain
+
+    Gray converted to color is remembered in both direction,
+    so converting it back to gray returns the original array.
+    Color converted to gray is not, as gray to color does not restore it.
+    """
+
+    def __init__(self):
+        self._derived = {}
+
+    def _remember(self, src: np.ndarray, key: str, dst: np.ndarray):
+        self._derived.setdefault(id(src), (src, {}))[1][key] = dst
+
+    def _lookup(self, src: np.ndarray, key: str):
+        _, derived = self._derived.get(id(src), (None, {}))
+        return derived.get(key)
+
+    def retain(self, arrays: List[np.ndarray]):
+        """Forget conversions of arrays not in the given list"""
+        ids = [id(array) for array in arrays]
+        self._derived = {
+            key: value for key, value in self._derived.items() if key in ids
+        }
+
+    def convert(self, array: np.ndarray, color: str, to_f32: bool):
+        if color == "gray" and array.ndim == 3:
+            gray = self._lookup(array, "gray")
+            if gray is None:
+                gray = cv2.cvtColor(array, cv2.COLOR_BGR2GRAY)
+                self._remember(array, "gray", gray)
+            array = gray
+        elif color == "color" and array.ndim == 2:
+            bgr = self._lookup(array, "color")
+            if bgr is None:
+                bgr = cv2.cvtColor(array, cv2.COLOR_GRAY2BGR)
+                self._remember(array, "color", bgr)
+                self._remember(bgr, "gray", array)
+            array = bgr
+        elif color not in ["unchanged", "color", "gray"]:
+            msg = "Unrecognized color option: {}".format(color)
+            raise ValueError(msg)
+
+        if to_f32 and array.dtype != np.float32:
+            f32 = self._lookup(array, "f32")
+            if f32 is None:
+                f32 = array.astype(np.float32)
+                self._remember(array, "f32", f32)
+            array = f32
+        return array
+
+
+class Chain:
+    """Lazy chain of operations, only computed when calling .on()
+
+    The result equals to applying the operations one by one, but:
+        1. intermediate results are not wrapped into Image objects,
+        2. color conversions and float32 casts are computed once
+           and reused when converting back,
+        3. Crop is moved to the front of operations with finite _halo,
+           so these operations process only the cropped region
+           (plus its halo).
+
+    Example:
+        chain = Chain(Laplacian(), Crop(region)).then(AbsDiff(), other=ref)
+        result = chain.on(img)
+    """
+
+    def __init__(self, *operations):
+        """
+        Args:
+            operations: SingularOperation objects to apply in order
+        """
+        self._stages = []
+        for op in operations:
+            self._stages.append(self._check_stage(op, None))
+
+    @staticmethod
+    def _check_stage(operation, other: Image):
+        if isinstance(operation, SingularOperation):
+            if other is not None:
+                msg = "SingularOperation {} does not accept other image"
+                raise ValueError(msg.format(operation.__class__.__name__))
+        elif isinstance(operation, BinaryOperation):
+            if other is None:
+                msg = "BinaryOperation {} requires other image"
+                raise ValueError(msg.format(operation.__class__.__name__))
+        else:
+            msg = "Chain only accepts Singular/BinaryOperation, got {}"
+            raise TypeError(msg.format(type(operation)))
+        return operation, other
+
+    def then(self, operation, other: Image = None) -> "Chain":
+        """Return a new Chain with operation appended
+
+        Args:
+            operation: a SingularOperation or a BinaryOperation
+            other (Image):
+                for BinaryOperation, the second image it operates with,
+                i.e. operation.on(current result, other)
+        """
+        chain = Chain()
+        chain._stages = self._stages + [self._check_stage(operation, other)]
+        return chain
+
+    def __len__(self) -> int:
+        return len(self._stages)
+
+    def _name(self, img: Image) -> str:
+        """Name of the result, same as applying operations one by one"""
+        name = img.name
+        for op, other in self._stages:
+            if other is None:
+                name = "{} on {}".format(op.__class__.__name__, name)
+            else:
+                name = "{} on ({}, {})".format(
+                    op.__class__.__name__, name, other.name
+                )
+        return name
+
+    def _plan(self, shape: tuple) -> List[Tuple[object, Image]]:
+        """Reorder stages so that Crop is computed as early as possible"""
+        planned = []
+        shapes = [tuple(shape[:2])]  # shapes[i] is the input shape of planned[i]
+
+        def append(op, other):
+            prev = planned[-1][0] if planned else None
+            if isinstance(op, Crop) and isinstance(prev, Crop):
+                # merge two consecutive crops into one
+                planned.pop()
+                shapes.pop()
+                region = (op.ymin, op.xmin, op.ymax, op.xmax)
+                op = _crop_of(_shift(region, (prev.ymin, prev.xmin)))
+            planned.append((op, other))
+            if isinstance(op, Crop):
+                shapes.append((op.ymax - op.ymin, op.xmax - op.xmin))
+            else:
+                shapes.append(shapes[-1])
+
+        for op, other in self._stages:
+            if not isinstance(op, Crop):
+                append(op, other)
+                continue
+
+            op._check_range(shapes[-1])
+            start = len(planned)
+            while start > 0 and not isinstance(planned[start - 1][0], Crop) \
+                    and planned[start - 1][0]._halo is not None:
+                start -= 1
+
+            hoisted = planned[start:]
+            if not hoisted:
+                append(op, other)
+                continue
+
+            del planned[start:]
+            del shapes[start + 1:]
+            halo = sum(stage._halo for stage, _ in hoisted)
+            h, w = shapes[-1]
+            outer = (
+                max(op.ymin - halo, 0), max(op.xmin - halo, 0),
+                min(op.ymax + halo, h), min(op.xmax + halo, w)
+            )
+            append(_crop_of(outer), None)
+            for stage, stage_other in hoisted:
+                if stage_other is not None:
+                    stage_other = stage_other[
+                        outer[0]:outer[2], outer[1]:outer[3], ...
+                    ]
+                append(stage, stage_other)
+
+            inner = _shift(
+                (op.ymin, op.xmin, op.ymax, op.xmax), (-outer[0], -outer[1])
+            )
+            if inner != (0, 0, outer[2] - outer[0], outer[3] - outer[1]):
+                append(_crop_of(inner), None)
+        return planned
+
+    def on(self, img: Image) -> Image:
+        """Compute the chain of operations on image"""
+        planned = self._plan(img.shape)
+        others = {
+            id(other): np.asarray(other)
+            for _, other in planned if other is not None
+        }
+
+        reps = _Representations()
+        array = np.asarray(img)
+        for op, other in planned:
+            array = reps.convert(array, op._color, op._cvt_to_f32)
+            if other is None:
+                array = op._operate(array)
+            else:
+                other = reps.convert(
+                    others[id(other)], op._color, op._cvt_to_f32
+                )
+                array = op._operate(array, other)
+            reps.retain([array] + list(others.values()))
+
+        copy = np.may_share_memory(array, img)
+        return Image(array, name=self._name(img), copy=copy)
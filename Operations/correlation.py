@@ -1,11 +1,18 @@
+import threading
+from collections import namedtuple
+from typing import List, Tuple
+
 import numpy as np
+from scipy import fft
+from scipy.ndimage import maximum_filter
 from scipy.signal import fftconvolve as fftconv
 
 from IMGBOX.core import Image
-from IMGBOX.Operations.base import BinaryOperation
+from IMGBOX.shapes import Point
+from IMGBOX.Operations.base import BinaryOperation, Batch, _to_stack
 
 
-__all__ = ["CrossCorrelate2D"]
+__all__ = ["CrossCorrelate2D", "TemplateMatcher", "Match", "PyramidMatcher"]
 
 
 class CrossCorrelate2D(BinaryOperation):
@@ -27,3 +34,327 @@ class CrossCorrelate2D(BinaryOperation):
         result = (result - np.min(result))
         result = (result / np.max(result)) * 255
         return result.astype(np.uint8)
+
+    def _operate_batch(
+            self, arrays1: np.ndarray, arrays2: np.ndarray
+            ) -> np.ndarray:
+        imgs1 = np.sum(arrays1, axis=3)
+        imgs1 -= np.mean(imgs1, axis=(1, 2), keepdims=True)
+
+        imgs2 = np.sum(arrays2, axis=3)
+        imgs2 -= np.mean(imgs2, axis=(1, 2), keepdims=True)
+
+        result = fftconv(
+            imgs1, imgs2[:, ::-1, ::-1], mode="same", axes=(1, 2)
+        )
+        result = (result - np.min(result, axis=(1, 2), keepdims=True))
+        result = (result / np.max(result, axis=(1, 2), keepdims=True)) * 255
+        return result.astype(np.uint8)
+
+
+class Match(namedtuple("Match", ["y", "x", "score"])):
+    """Location of template in frame and its normalized correlation
+
+    (y, x) is the top-left corner of the matched region,
+    refined to sub-pixel precision, and score lies in [-1, 1].
+    """
+
+
+def _to_plane(array: np.ndarray, color: bool) -> np.ndarray:
+    """Sum channels of color (..., h, w, 3) into float64 of (..., h, w)"""
+    array = np.asarray(array, dtype=np.float64)
+    return np.sum(array, axis=-1) if color else array
+
+
+def _window_sum(planes: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    """Sum over every window of shape in planes of (N, h, w)"""
+    th, tw = shape
+    integral = np.zeros(
+        (planes.shape[0], planes.shape[1] + 1, planes.shape[2] + 1)
+    )
+    np.cumsum(planes, axis=1, out=integral[:, 1:, 1:])
+    np.cumsum(integral[:, 1:, 1:], axis=2, out=integral[:, 1:, 1:])
+    return integral[:, th:, tw:] - integral[:, :-th, tw:] \
+        - integral[:, th:, :-tw] + integral[:, :-th, :-tw]
+
+
+def _subpixel(scores: np.ndarray, y: int, x: int) -> Tuple[float, float]:
+    """Refine peak at (y, x) by fitting parabola along each axis"""
+    def offset(prev, peak, next):
+        denom = prev - 2 * peak + next
+        return 0.5 * (prev - next) / denom if denom < 0 else 0.0
+
+    dy = dx = 0.0
+    if 0 < y < scores.shape[0] - 1:
+        dy = offset(scores[y - 1, x], scores[y, x], scores[y + 1, x])
+    if 0 < x < scores.shape[1] - 1:
+        dx = offset(scores[y, x - 1], scores[y, x], scores[y, x + 1])
+    return float(y + dy), float(x + dx)
+
+
+class TemplateMatcher:
+    """Normalized cross correlation of one template against many frames
+
+    Spectrum of the zero-mean template is computed once for each padded
+    frame size (scipy.fft.next_fast_len), and reused by later calls,
+    including calls from other threads.
+    Color images are summed over channels as CrossCorrelate2D does.
+
+    Example:
+        matcher = TemplateMatcher(template)
+        matches = matcher.match_batch(frames)
+    """
+
+    def __init__(self, template: Image, workers: int = None):
+        """
+        Args:
+            template (Image): the image to search for
+            workers (int): number of threads used by each FFT call
+        """
+        self._color = template.ndim == 3
+        plane = _to_plane(template, self._color)
+        if plane.ndim != 2 or plane.size == 0 or \
+                (self._color and template.shape[-1] != 3):
+            msg = "Template must be (h, w) or (h, w, 3), got {}"
+            raise ValueError(msg.format(template.shape))
+
+        self._shape = plane.shape
+        self._template = plane - np.mean(plane)
+        self._norm = np.sqrt(np.sum(self._template ** 2))
+        self._workers = workers
+        self._spectrums = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(h, w) of the template"""
+        return self._shape
+
+    def _spectrum(self, padded: Tuple[int, int]) -> np.ndarray:
+        """Conjugated spectrum of template at padded shape, cached"""
+        with self._lock:
+            spectrum = self._spectrums.get(padded)
+        if spectrum is None:
+            spectrum = np.conj(fft.rfft2(
+                self._template, s=padded, workers=self._workers
+            ))
+            with self._lock:
+                spectrum = self._spectrums.setdefault(padded, spectrum)
+        return spectrum
+
+    def _planes(self, frames: np.ndarray) -> np.ndarray:
+        """Convert stacked frames into planes of (N, h, w)"""
+        color = frames.ndim == 4
+        if color != self._color:
+            msg = "Frames must be {} as the template, got {}"
+            msg = msg.format("color" if self._color else "gray", frames.shape)
+            raise ValueError(msg)
+
+        th, tw = self._shape
+        if frames.shape[1] < th or frames.shape[2] < tw:
+            msg = "Frame {} smaller than template {}"
+            raise ValueError(msg.format(frames.shape[1:3], self._shape))
+        return _to_plane(frames, color)
+
+    def _scores(self, planes: np.ndarray) -> np.ndarray:
+        """Normalized correlation of planes of (N, h, w)
+
+        Returns:
+            float32 array of (N, h - th + 1, w - tw + 1)
+        """
+        h, w = planes.shape[1:]
+        th, tw = self._shape
+        padded = (fft.next_fast_len(h), fft.next_fast_len(w, real=True))
+
+        # correlation does not wrap around within the valid region,
+        # since padded shape is no smaller than the frame
+        spectrums = fft.rfft2(
+            planes, s=padded, axes=(1, 2), workers=self._workers
+        )
+        spectrums *= self._spectrum(padded)
+        numer = fft.irfft2(
+            spectrums, s=padded, axes=(1, 2), workers=self._workers
+        )[:, :h - th + 1, :w - tw + 1]
+
+        count = th * tw
+        sums = _window_sum(planes, self._shape)
+        squares = _window_sum(planes ** 2, self._shape)
+        variance = np.maximum(squares - sums ** 2 / count, 0)
+        denom = np.sqrt(variance) * self._norm
+
+        # flat windows or flat template have no defined correlation,
+        # tiny variance is only round-off error of the window sums
+        valid = (variance > 1e-10 * squares) & (self._norm > 0)
+        scores = np.zeros(numer.shape, dtype=np.float32)
+        np.divide(numer, denom, out=scores, where=valid, casting="unsafe")
+        return np.clip(scores, -1, 1, out=scores)
+
+    def scores(self, frame: Image) -> np.ndarray:
+        """Normalized correlation of template at every location of frame
+
+        Returns:
+            float32 array of (h - th + 1, w - tw + 1) with values in [-1, 1],
+            the value at (y, x) is for template placed with top-left at (y, x)
+        """
+        return self._scores(self._planes(np.asarray(frame)[None, ...]))[0]
+
+    def match(self, frame: Image) -> Match:
+        """Find location of template in frame with highest correlation"""
+        return self.match_batch([frame])[0]
+
+    def match_batch(self, frames: Batch) -> List[Match]:
+        """Find template in frames, same-shaped frames share one FFT call
+
+        Args:
+            frames: list of Image, or stacked array of (N, h, w[, 3])
+
+        Returns:
+            list of Match, in the same order as frames
+        """
+        stack = _to_stack(frames)
+        groups = [stack] if stack is not None else \
+            [np.asarray(frame)[None, ...] for frame in frames]
+
+        matches = []
+        for group in groups:
+            for scores in self._scores(self._planes(group)):
+                y, x = np.unravel_index(np.argmax(scores), scores.shape)
+                sub_y, sub_x = _subpixel(scores, y, x)
+                matches.append(Match(sub_y, sub_x, float(scores[y, x])))
+        return matches
+
+
+def _peaks(scores: np.ndarray, k: int, radius: int) -> List[Tuple[int, int]]:
+    """Locations of top k local maxima, at least radius apart"""
+    size = 2 * radius + 1
+    is_peak = scores == maximum_filter(scores, size=size, mode="nearest")
+    ys, xs = np.nonzero(is_peak)
+    order = np.argsort(-scores[ys, xs], kind="stable")
+
+    peaks = []
+    for y, x in zip(ys[order], xs[order]):
+        # plateaus have many maxima, keep the first of them
+        if all(abs(y - py) > radius or abs(x - px) > radius
+               for py, px in peaks):
+            peaks.append((int(y), int(x)))
+            if len(peaks) == k:
+                break
+    return peaks
+
+
+class PyramidMatcher:
+    """Coarse-to-fine template search over image pyramids
+
+    Frame and template are downsampled by 2 for each level with
+    Image.resize (INTER_AREA). Top k candidates are found on the coarsest
+    level, and each of them is refined level by level, by correlating only
+    a small window around it.
+
+    Example:
+        matcher = PyramidMatcher(template, levels=3, top_k=5)
+        [(point, score), ...] = matcher.search(frame)
+    """
+
+    _margin = 3  # pixels searched around candidate when refining a level
+
+    def __init__(
+            self, template: Image, levels: int = 3, top_k: int = 1,
+            min_size: int = 8, workers: int = None
+            ):
+        """
+        Args:
+            template (Image): the image to search for
+            levels (int):
+                max number of downsampled levels, 0 for full-res search only
+            top_k (int): number of candidates kept from the coarsest level
+            min_size (int):
+                min height and width of downsampled template,
+                levels making template smaller are not used
+            workers (int): number of threads used by each FFT call
+        """
+        if levels < 0 or top_k <= 0 or min_size <= 0:
+            msg = "Invalid levels, top_k or min_size: {}, {}, {}"
+            raise ValueError(msg.format(levels, top_k, min_size))
+
+        self._top_k = top_k
+        self._matchers = [TemplateMatcher(template, workers=workers)]
+        h, w = template.shape[:2]
+        for level in range(1, levels + 1):
+            shape = (h >> level, w >> level)
+            if min(shape) < min_size:
+                break
+            self._matchers.append(
+                TemplateMatcher(template.resize(shape), workers=workers)
+            )
+
+    @property
+    def levels(self) -> int:
+        """Number of downsampled levels actually used"""
+        return len(self._matchers) - 1
+
+    def _pyramid(self, frame: Image) -> List[Image]:
+        """Frames downsampled for each level, from full-res to coarsest"""
+        frames = [frame]
+        for level in range(1, len(self._matchers)):
+            shape = (frame.h >> level, frame.w >> level)
+            th, tw = self._matchers[level].shape
+            if shape[0] < th or shape[1] < tw:
+                break
+            frames.append(frames[-1].resize(shape))
+        return frames
+
+    def search(self, frame: Image) -> List[Tuple[Point, float]]:
+        """Find top k locations of template in frame
+
+        Returns:
+            list of (Point, score), sorted by score in descending order,
+            Point is the top-left corner of the matched region in frame,
+            and score is the normalized correlation at full resolution.
+        """
+        frames = self._pyramid(frame)
+        coarsest = len(frames) - 1
+        matcher = self._matchers[coarsest]
+        scores = matcher.scores(frames[coarsest])
+        radius = max(1, min(matcher.shape) // 2)
+        candidates = [
+            (y, x, float(scores[y, x]))
+            for y, x in _peaks(scores, self._top_k, radius)
+        ]
+
+        for level in range(coarsest - 1, -1, -1):
+            candidates = self._refine(
+                frames[level], frames[level + 1].shape[:2],
+                self._matchers[level], candidates
+            )
+
+        results = {}
+        for y, x, score in candidates:
+            results[Point(y, x)] = max(score, results.get(Point(y, x), -1))
+        return sorted(results.items(), key=lambda item: -item[1])
+
+    def _refine(
+            self, frame: Image, coarse_shape: Tuple[int, int],
+            matcher: TemplateMatcher, candidates: list
+            ) -> List[Tuple[int, int, float]]:
+        """Search windows around candidates upscaled from coarse_shape"""
+        th, tw = matcher.shape
+        h, w = frame.shape[:2]
+        windows, origins = [], []
+        for candidate in candidates:
+            y = int(round(candidate[0] * h / coarse_shape[0]))
+            x = int(round(candidate[1] * w / coarse_shape[1]))
+            ymin = min(max(y - self._margin, 0), h - th)
+            xmin = min(max(x - self._margin, 0), w - tw)
+            ymax = min(y + self._margin + th, h)
+            xmax = min(x + self._margin + tw, w)
+            windows.append(frame[ymin:ymax, xmin:xmax, ...])
+            origins.append((ymin, xmin))
+
+        refined = []
+        matches = matcher.match_batch(windows)
+        for (ymin, xmin), window, match in zip(origins, windows, matches):
+            # Match is sub-pixel, snap it back to pixel grid in window
+            y = min(int(round(match.y)), window.shape[0] - th)
+            x = min(int(round(match.x)), window.shape[1] - tw)
+            refined.append((ymin + y, xmin + x, match.score))
+        return refined
@@ -1,6 +1,6 @@
 import numpy as np
 
-from IMGBOX.core import Image
+from IMGBOX.core import Image, _check_out
 from IMGBOX.shapes import Rectangle
 from IMGBOX.Operations.base import SingularOperation
 
@@ -25,9 +25,22 @@ class Crop(SingularOperation):
             int(cropped_region.ymin), int(cropped_region.xmin), \
             int(cropped_region.ymax), int(cropped_region.xmax)
 
-    def _operate(self, img: np.ndarray) -> np.ndarray:
-        if self.ymax > img.shape[0] or self.xmax > img.shape[1]:
+    def _check_range(self, shape: tuple):
+        """Check the cropped region lies inside image of given shape"""
+        if self.ymax > shape[0] or self.xmax > shape[1]:
             msg = "Cropped region out of range: cropped {} from image shape {}"
-            raise ValueError(msg.format(self._cropped_region, img.shape))
+            raise ValueError(msg.format(self._cropped_region, shape))
 
+    def _operate(self, img: np.ndarray) -> np.ndarray:
+        self._check_range(img.shape)
         return img[self.ymin:self.ymax, self.xmin:self.xmax, ...]
+
+    def _operate_into(self, img: np.ndarray, out: np.ndarray) -> Image:
+        cropped = self._operate(img)
+        out = _check_out(out, cropped.shape)
+        np.copyto(out, cropped)
+        return out
+
+    def _operate_batch(self, imgs: np.ndarray) -> np.ndarray:
+        self._check_range(imgs.shape[1:])
+        return imgs[:, self.ymin:self.ymax, self.xmin:self.xmax, ...]
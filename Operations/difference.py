@@ -1,15 +1,191 @@
+from collections import namedtuple
+from typing import List, Tuple, Union
+
+import cv2
 import numpy as np
 
-from IMGBOX.core import Image
+from IMGBOX.core import Image, _check_out
+from IMGBOX.shapes import Rectangle, RectangleArray, _as_rectangle_array
 from IMGBOX.Operations.base import BinaryOperation
 
-__all__ = ["AbsDiff"]
+__all__ = ["AbsDiff", "BackgroundDiff", "ChangeStats"]
+
+
+class ChangeStats(namedtuple("ChangeStats", ["mean", "changed"])):
+    """Difference statistics of regions, arrays of one value per region
+
+    mean is the mean absolute difference of pixels in the region,
+    changed is the ratio of pixels whose difference > threshold.
+    For color images, difference of a pixel is the max over channels.
+    """
+
+
+def _check_threshold(threshold: int) -> int:
+    if threshold is not None and not 0 <= threshold < 255:
+        msg = "threshold must in [0, 255), got {}"
+        raise ValueError(msg.format(threshold))
+    return threshold
+
+
+def _binarize(diff: np.ndarray, threshold: int) -> np.ndarray:
+    """Pixels of diff > threshold to 255, otherwise 0, in place"""
+    flat = diff.reshape(-1, diff.shape[-1]) if diff.ndim > 2 else diff
+    cv2.threshold(flat, threshold, 255, cv2.THRESH_BINARY, dst=flat)
+    return diff
+
+
+def _region_stats(
+        diff: np.ndarray, regions: RectangleArray, threshold: int
+        ) -> ChangeStats:
+    """ChangeStats of regions in uint8 diff of (h, w[, 3])"""
+    if diff.ndim == 3:
+        diff = np.max(diff, axis=2)
+    changed = (diff > (threshold or 0)).view(np.uint8)
+    sums = cv2.integral(diff, sdepth=cv2.CV_64F)
+    counts = cv2.integral(changed, sdepth=cv2.CV_64F)
+
+    h, w = diff.shape
+    ymin, xmin, ymax, xmax = [
+        np.clip(np.round(coord), 0, limit).astype(np.int64)
+        for coord, limit in zip(
+            (regions.ymin, regions.xmin, regions.ymax, regions.xmax),
+            (h, w, h, w)
+        )
+    ]
+    areas = (ymax - ymin) * (xmax - xmin)
+    if np.any(areas <= 0):
+        msg = "Regions must overlap image of shape {}"
+        raise ValueError(msg.format(diff.shape))
+
+    def window(integral):
+        return integral[ymax, xmax] - integral[ymin, xmax] \
+            - integral[ymax, xmin] + integral[ymin, xmin]
+    return ChangeStats(window(sums) / areas, window(counts) / areas)
 
 
 class AbsDiff(BinaryOperation):
-    """Pixel wise difference on image"""
+    """Pixel wise difference on image
 
-    _cvt_to_f32 = True
+    Difference is computed on uint8 with cv2.absdiff,
+    optionally binarized to 255 for pixels whose difference > threshold.
+    """
+
+    _halo = 0
+
+    def __init__(self, threshold: int = None):
+        """
+        Args:
+            threshold (int): if given, result is 255 for difference > it,
+                otherwise 0, per channel
+        """
+        self._threshold = _check_threshold(threshold)
 
     def _operate(self, array1: np.ndarray, array2: np.ndarray) -> np.ndarray:
-        return np.abs(array1 - array2).astype(np.uint8)
+        diff = cv2.absdiff(array1, array2)
+        if self._threshold is not None:
+            _binarize(diff, self._threshold)
+        return diff
+
+    def _operate_into(
+            self, array1: np.ndarray, array2: np.ndarray, out: np.ndarray
+            ) -> Image:
+        out = _check_out(out, array1.shape)
+        cv2.absdiff(array1, array2, dst=out)
+        if self._threshold is not None:
+            _binarize(out, self._threshold)
+        return out
+
+    def _operate_batch(
+            self, arrays1: np.ndarray, arrays2: np.ndarray
+            ) -> np.ndarray:
+        # cv2.absdiff does not broadcast (1, h, w[, 3]) against batch
+        diff = np.maximum(arrays1, arrays2)
+        diff -= np.minimum(arrays1, arrays2)
+        if self._threshold is not None:
+            _binarize(diff, self._threshold)
+        return diff
+
+    def on_regions(
+            self, img1: Image, img2: Image,
+            regions: Union[RectangleArray, List[Rectangle]]
+            ) -> Tuple[Image, ChangeStats]:
+        """Operate on two images and summarize difference in regions
+
+        Statistics are computed from integral images of the difference,
+        so the cost does not grow with number or size of regions.
+
+        Args:
+            regions: RectangleArray or list of Rectangle in pixel positions,
+                parts outside image are ignored
+
+        Returns:
+            tuple of (result Image, ChangeStats of regions),
+            statistics are of the difference before binarized
+        """
+        regions = _as_rectangle_array(regions)
+        diff = cv2.absdiff(np.asarray(img1), np.asarray(img2))
+        stats = _region_stats(diff, regions, self._threshold)
+        if self._threshold is not None:
+            _binarize(diff, self._threshold)
+
+        name = "{} on ({}, {})".format(
+            self.__class__.__name__, img1.name, img2.name
+        )
+        return Image(diff, name=name, copy=False), stats
+
+
+class BackgroundDiff:
+    """Difference of frames from a running average background
+
+    Background is updated in place by each frame,
+    i.e. background = (1 - alpha) * background + alpha * frame,
+    and its buffers are allocated only at the first frame,
+    or when the frame shape changes.
+
+    Example:
+        model = BackgroundDiff(alpha=0.05, threshold=30)
+        for frame in frames:
+            foreground = model.on(frame)
+    """
+
+    def __init__(self, alpha: float = 0.05, threshold: int = None):
+        """
+        Args:
+            alpha (float): weight of new frame to background, in (0, 1]
+            threshold (int): if given, result is 255 for difference > it,
+                otherwise 0, per channel
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must in (0, 1], got {}".format(alpha))
+        self._alpha = alpha
+        self._threshold = _check_threshold(threshold)
+        self.reset()
+
+    def reset(self):
+        """Forget the background, next frame starts a new one"""
+        self._background = None
+        self._rounded = None
+
+    @property
+    def background(self) -> Image:
+        """Current background rounded to uint8, None before any frame"""
+        if self._rounded is None:
+            return None
+        return Image(self._rounded, name="background")
+
+    def on(self, frame: Image) -> Image:
+        """Difference of frame from background, then update background"""
+        frame_array = np.asarray(frame)
+        if self._background is None or \
+                self._background.shape != frame_array.shape:
+            self._background = frame_array.astype(np.float32)
+            self._rounded = frame_array.copy()
+
+        diff = cv2.absdiff(frame_array, self._rounded)
+        if self._threshold is not None:
+            _binarize(diff, self._threshold)
+
+        cv2.accumulateWeighted(frame_array, self._background, self._alpha)
+        cv2.convertScaleAbs(self._background, dst=self._rounded)
+        name = "{} on {}".format(self.__class__.__name__, frame.name)
+        return Image(diff, name=name, copy=False)
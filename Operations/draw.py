@@ -1,12 +1,43 @@
-from typing import Tuple, List
+from typing import Tuple, List, Union
 
 import cv2
 import numpy as np
 
 from IMGBOX.core import Image
-from IMGBOX.shapes import Rectangle, Point
+from IMGBOX.shapes import Rectangle, Point, RectangleArray, PointArray
+from IMGBOX.shapes import _as_rectangle_array
 
-__all__ = ["draw_rectangle", "draw_points"]
+__all__ = ["draw_rectangle", "draw_rectangles", "draw_points"]
+
+
+def _as_colors(color, n: int, img: np.ndarray) -> np.ndarray:
+    """Colors of (n, c) for color image, (n,) for gray image
+
+    color is either one color for all, or one for each of n items.
+    A scalar color is used for every channel of color image.
+    """
+    colors = np.asarray(color)
+    if np.any(colors < 0) or np.any(colors > 255):
+        msg = "Value of color shold lies in 0 <= val <= 255, got {}"
+        raise ValueError(msg.format(color))
+
+    item_shape = img.shape[2:]
+    if colors.ndim == 0:
+        colors = np.broadcast_to(colors, item_shape)
+    if colors.shape == item_shape:
+        colors = np.broadcast_to(colors, (n,) + item_shape)
+    elif colors.shape != (n,) + item_shape:
+        msg = "color must be of shape {} or {} for image {}, got {}"
+        raise ValueError(msg.format(
+            item_shape, (n,) + item_shape, img.shape, colors.shape
+        ))
+    return colors.astype(img.dtype)
+
+
+def _drawn(img: np.ndarray):
+    """Invalidate cached conversions of img drawn by cv2 in place"""
+    if isinstance(img, Image):
+        img.invalidate_conversions()
 
 
 def draw_rectangle(
@@ -20,28 +51,144 @@ def draw_rectangle(
         (rectangle.xmax, rectangle.ymax),
         color, line_width
     )
+    _drawn(img)
+
+
+def draw_rectangles(
+        img: Image, rectangles: Union[RectangleArray, List[Rectangle]],
+        color, line_width: int = 1
+        ):
+    """Draw many rectangles onto image
+
+    Result is the same as calling draw_rectangle for each rectangle,
+    but all rectangles of the same color are drawn in one pass,
+    by one cv2.polylines call, or one coverage mask when filled,
+    so where rectangles of different colors overlap,
+    colors are drawn in order of their first appearance.
+
+    Args:
+        img: the Image object to draw on
+        rectangles: RectangleArray or list of Rectangle,
+            coordinates are rounded to pixel positions
+        color: a color for all rectangles, or array of one for each
+            i.e. (B, G, R), int or (N, 3) for color image; int or (N,) for gray
+        line_width (int): border width in pixels, negative for filled
+    """
+    rects = _as_rectangle_array(rectangles)
+    colors = _as_colors(color, len(rects), img)
+    if line_width == 0:
+        raise ValueError("line_width must not be 0")
 
+    # skip rectangles outside image, clip the rest to int32 range
+    margin = abs(line_width) + 2
+    h, w = img.shape[:2]
+    visible = (rects.ymax > -margin) & (rects.ymin < h + margin) & \
+        (rects.xmax > -margin) & (rects.xmin < w + margin)
+    ymin, xmin, ymax, xmax = [
+        np.clip(np.round(coord[visible]), -margin, limit + margin)
+        .astype(np.int32)
+        for coord, limit in zip(
+            (rects.ymin, rects.xmin, rects.ymax, rects.xmax), (h, w, h, w)
+        )
+    ]
+    colors = colors[visible]
+    if len(colors) == 0:
+        return
 
-def draw_points(img, points: List[Point], color: Tuple[int, int, int]):
+    keys = colors.reshape(len(colors), -1)
+    _, first, groups = np.unique(
+        keys, axis=0, return_index=True, return_inverse=True
+    )
+    # rectangles sorted by group, each group keeps its own order
+    order = np.argsort(groups.reshape(-1), kind="stable")
+    bounds = np.cumsum(np.bincount(groups.reshape(-1)))[:-1]
+
+    if line_width < 0:
+        boxes = np.stack([
+            np.maximum(ymin, 0), np.maximum(xmin, 0),
+            np.minimum(ymax + 1, h), np.minimum(xmax + 1, w)
+        ], axis=1)
+        grouped = np.split(boxes[order], bounds)
+        for group in np.argsort(first):
+            _fill_boxes(img, grouped[group], colors[first[group]])
+    else:
+        corners = np.stack([
+            np.stack([xmin, ymin], axis=1), np.stack([xmax, ymin], axis=1),
+            np.stack([xmax, ymax], axis=1), np.stack([xmin, ymax], axis=1)
+        ], axis=1)
+        grouped = np.split(corners[order], bounds)
+        for group in np.argsort(first):
+            cv2.polylines(
+                img, grouped[group], isClosed=True,
+                color=keys[first[group]].tolist(), thickness=line_width
+            )
+    _drawn(img)
+
+
+def _fill_boxes(img: np.ndarray, boxes: np.ndarray, color: np.ndarray):
+    """Fill boxes of (N, 4) rows (y0, x0, y1, x1), end exclusive, by color
+
+    cv2.fillPoly would XOR overlapped polygons, so the union of boxes is
+    found by a 2D difference array: +1 at top-left and bottom-right
+    corners, -1 at the others, whose integral image counts boxes covering
+    each pixel. Only the bounding region of boxes is computed,
+    and few boxes in a large region are filled one by one instead,
+    which costs about 1000 pixels of the mask for each box.
+    """
+    boxes = boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])]
+    if len(boxes) == 0:
+        return
+
+    top, left = boxes[:, 0].min(), boxes[:, 1].min()
+    y0, x0 = boxes[:, 0] - top, boxes[:, 1] - left
+    y1, x1 = boxes[:, 2] - top, boxes[:, 3] - left
+    height, width = y1.max(), x1.max()
+    if len(boxes) * 1000 < height * width:
+        color = color.tolist()
+        for y0, x0, y1, x1 in boxes.tolist():
+            cv2.rectangle(img, (x0, y0), (x1 - 1, y1 - 1), color, -1)
+        return
+
+    # float32 counts are exact, and cv2.integral is much faster than cumsum
+    diff = np.zeros((height + 1, width + 1), dtype=np.float32)
+    np.add.at(diff, (np.concatenate([y0, y1]), np.concatenate([x0, x1])), 1)
+    np.add.at(diff, (np.concatenate([y0, y1]), np.concatenate([x1, x0])), -1)
+    counts = cv2.integral(diff, sdepth=cv2.CV_32F)[1:-1, 1:-1]
+    mask = cv2.compare(counts, 0.5, cv2.CMP_GT)
+
+    # set color under mask in place: zero the pixels, then add color
+    region = img[top:top + height, left:left + width]
+    scalar = tuple(np.ravel(color).tolist()) + (0,) * (4 - np.size(color))
+    cv2.subtract(region, region, dst=region, mask=mask)
+    cv2.add(region, scalar, dst=region, mask=mask)
+
+
+def draw_points(
+        img, points: Union[PointArray, List[Point], np.ndarray],
+        color, clip: bool = False
+        ):
     """Draw points onto image by given color
 
     Args:
         img: the Image object to draw on
         points: points to draw on images, can be either
             a) list of Point object
-            b) a numpy array of dim (N, 2)
-        color: the drawing color of image
+            b) a numpy array of dim (N, 2), each row is (y, x)
+            c) a PointArray
+        color: a color for all points, or array of one for each
+            i.e. (B, G, R), int or (N, 3) for color image; int or (N,) for gray
+        clip (bool):
+            if True, points outside image are skipped,
+            otherwise ValueError is raised for them
     """
     if isinstance(points, np.ndarray):
-        if not (points.ndim == 2 and points.shape[-1] == 2):
-            msg = "Invalid dimension for points, must be (N, 2), got {}"
-            raise ValueError(msg.format(points.shape))
-        indices = points.astype(np.int)
-    else:
-        if any(not pt.inside(img) for pt in points):
-            msg = "Points {} not all inside image with shape {}"
-            raise ValueError(msg.format(points, img))
-        # stack points into indices
-        indices = np.array([(pt.y, pt.x) for pt in points], dtype=np.int)
+        points = PointArray.from_array(points)
+    elif not isinstance(points, PointArray):
+        points = PointArray.from_points(points)
+    colors = _as_colors(color, len(points), img)
 
-    img[indices[:, 0], indices[:, 1], ...] = color
+    inside = points.inside(img)
+    if not clip and not np.all(inside):
+        msg = "Points {} not all inside image with shape {}"
+        raise ValueError(msg.format(points[~inside].array, img.shape))
+    img[points.y[inside], points.x[inside], ...] = colors[inside]
@@ -1,3 +1,4 @@
+import asyncio
 from typing import List
 
 import cv2
@@ -6,7 +7,8 @@ from skimage.segmentation import active_contour, chan_vese
 from skimage.segmentation import morphological_chan_vese as morph_chan_vese
 from skimage.segmentation import morphological_geodesic_active_contour as morph_gac
 
-from IMGBOX.core import Image
+from IMGBOX.core import Image, _check_out
+from IMGBOX.aio import _offloader
 from IMGBOX.Operations.base import SingularOperation
 
 
@@ -34,6 +36,31 @@ class _FromSK:
         gray = img.to_gray()
         return self.op_func(gray, **self._kwargs)
 
+    async def aon(self, img: Image, timeout: float = None) -> np.ndarray:
+        """Async .on(), run in a worker process of its own
+
+        Scikit-image segmentations hold the GIL, so they would stall
+        the event loop on threads. The process is killed when cancelled,
+        or when exceeding timeout with concurrent.futures.TimeoutError.
+        It counts twice of the image into bytes in flight of configure_async.
+        """
+        # parallel imports _FromSK from this module
+        from IMGBOX.Operations.parallel import ProcessRunner
+
+        granted = await _offloader.budget.acquire(2 * img.nbytes)
+        try:
+            runner = ProcessRunner(self, workers=1, timeout=timeout)
+            try:
+                future, = runner.submit([img])
+                return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                runner.cancel()
+                raise
+            finally:
+                runner.close()
+        finally:
+            _offloader.budget.release(granted)
+
 
 MorphGAC = type("MorphGAC", (_FromSK,), {"op_func": staticmethod(morph_gac)})
 MorphChanVese = type("MorphChanVese", (_FromSK,), {"op_func": staticmethod(morph_chan_vese)})
@@ -60,6 +87,14 @@ class Canny(SingularOperation):
         )
         return result
 
+    def _operate_into(self, img: np.ndarray, out: np.ndarray) -> Image:
+        out = _check_out(out, img.shape[:2])
+        cv2.Canny(
+            img.astype(np.uint8, copy=False),
+            self._thres1, self._thres2, edges=out
+        )
+        return out
+
 
 class Laplacian(SingularOperation):
     """Simple Laplacian edge detector"""
@@ -71,9 +106,22 @@ class Laplacian(SingularOperation):
         """
         self._kern = kernel_size
 
+    @property
+    def _halo(self) -> int:
+        # ksize 1 is a 3x3 aperture
+        return max(1, self._kern // 2)
+
     def _operate(self, img: np.ndarray) -> np.ndarray:
         result = cv2.Laplacian(
             img.astype(np.uint8, copy=False),
             ddepth=cv2.CV_8U, ksize=self._kern
         )
         return result
+
+    def _operate_into(self, img: np.ndarray, out: np.ndarray) -> Image:
+        out = _check_out(out, img.shape)
+        cv2.Laplacian(
+            img.astype(np.uint8, copy=False),
+            ddepth=cv2.CV_8U, dst=out, ksize=self._kern
+        )
+        return out
@@ -1,10 +1,11 @@
+from functools import lru_cache
 from typing import Tuple
 
 import cv2
 import numpy as np
 
-from IMGBOX.core import Image
-from IMGBOX.Operations.base import BinaryOperation
+from IMGBOX.core import Image, _check_out
+from IMGBOX.Operations.base import BinaryOperation, _scratch
 
 __all__ = ["Overlap", "Mask"]
 
@@ -24,6 +25,76 @@ def _check_color(color: Tuple[int, int, int], argname: str):
     return color
 
 
+@lru_cache(maxsize=32)
+def _mask_luts(color: Tuple[int, int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Lookup tables of Mask for pixels outside and inside mask
+
+    Each is of (256, 1, 3) for cv2.LUT, computed by cv2.addWeighted itself,
+    so the rounding is the same as blending images.
+    """
+    values = np.repeat(np.arange(256, dtype=np.uint8)[:, None, None], 3, 2)
+    colors = np.zeros_like(values)
+    outside = cv2.addWeighted(values, 0.9, colors, 0.1, 0)
+    colors[...] = color
+    inside = cv2.addWeighted(values, 0.9, colors, 0.1, 0)
+    outside.flags.writeable = inside.flags.writeable = False
+    return outside, inside
+
+
+@lru_cache(maxsize=32)
+def _overlap_lut(
+        color1: Tuple[int, int, int], color2: Tuple[int, int, int]
+        ) -> np.ndarray:
+    """Lookup table of Overlap, result of gray (v1, v2) is at v1 << 8 | v2
+
+    Returns:
+        read-only uint8 array of (65536, 3)
+    """
+    values = np.arange(256) / 255
+    lut = values[:, None, None] * color1 + values[None, :, None] * color2
+    lut = np.clip(lut, a_min=0, a_max=255).astype(np.uint8).reshape(-1, 3)
+    lut.flags.writeable = False
+    return lut
+
+
+def _lookup_pairs(
+        lut: np.ndarray, array1: np.ndarray, array2: np.ndarray,
+        rows: int = 64, out: np.ndarray = None
+        ) -> np.ndarray:
+    """Look up lut of (65536, c) by uint8 arrays of (..., w)
+
+    Rows are looked up chunk by chunk, so temporaries of indices
+    stay small instead of being as large as the image.
+
+    Args:
+        out: if given, checked array of (..., w, c) to write result in,
+            indices are then kept in per-thread buffer too
+
+    Returns:
+        uint8 array of (..., w, c)
+    """
+    width = array1.shape[-1]
+    # indices of intp, which np.take would otherwise cast to for each chunk
+    if out is None:
+        result = np.empty(array1.shape + lut.shape[1:], dtype=np.uint8)
+        indices = np.empty((rows, width), dtype=np.intp)
+    else:
+        result = out
+        indices = _scratch.get("lut_indices", (rows, width), np.intp)
+    flat1 = array1.reshape(-1, width)
+    flat2 = array2.reshape(-1, width)
+    flat_result = result.reshape((-1, width) + lut.shape[1:])
+
+    for start in range(0, len(flat1), rows):
+        chunk = indices[:min(rows, len(flat1) - start)]
+        stop = start + len(chunk)
+        np.left_shift(flat1[start:stop], 8, out=chunk, dtype=np.intp)
+        np.bitwise_or(chunk, flat2[start:stop], out=chunk)
+        # indices never exceed lut, mode "clip" avoids buffering the output
+        np.take(lut, chunk, axis=0, out=flat_result[start:stop], mode="clip")
+    return result
+
+
 class Mask:
     """For create image from overlap a mask with another"""
 
@@ -31,21 +102,18 @@ class Mask:
         self._color = _check_color(color, argname="color")
 
     def on(self, image: Image, mask: Image):
-        color_mask = mask.to_color()
-        color_mask[mask.to_gray() > 0, :] = self._color
-        color_mask[mask.to_gray() <= 0, :] = [0, 0, 0]
-        result = cv2.addWeighted(
-            src1=image.to_color(), alpha=0.9,
-            src2=color_mask, beta=0.1,
-            gamma=0
-        )
-        return Image(result)
+        outside, inside = _mask_luts(self._color)
+        color_image = image.to_color()
+        result = cv2.LUT(color_image, outside)
+        cv2.copyTo(cv2.LUT(color_image, inside), mask.to_gray(), result)
+        return Image(result, copy=False)
 
 
 class Overlap(BinaryOperation):
     """For create image from overlap one image with another"""
 
     _color = "gray"
+    _halo = 0
 
     def __init__(
             self,
@@ -66,10 +134,30 @@ class Overlap(BinaryOperation):
         if not array1.shape[:2] == array2.shape[:2]:
             msg = "Height, Width of two images must be equal, get: {} and {}"
             raise ValueError(msg.format(array1.shape[:2], array2.shape[:2]))
+        return self._blend(array1, array2)
 
-        array1 = np.tile(array1[..., None], (1, 1, 3))
-        array2 = np.tile(array2[..., None], (1, 1, 3))
-
-        result = (array1 / 255) * self._color1 + (array2/255) * self._color2
-        result = np.clip(result, a_min=0, a_max=255).astype(np.uint8)
-        return result
+    def _operate_into(
+            self, array1: np.ndarray, array2: np.ndarray, out: np.ndarray
+            ) -> Image:
+        if not array1.shape[:2] == array2.shape[:2]:
+            msg = "Height, Width of two images must be equal, get: {} and {}"
+            raise ValueError(msg.format(array1.shape[:2], array2.shape[:2]))
+        out = _check_out(out, array1.shape + (3,))
+        lut = _overlap_lut(self._color1, self._color2)
+        _lookup_pairs(lut, array1, array2, out=out)
+        return out
+
+    def _operate_batch(
+            self, arrays1: np.ndarray, arrays2: np.ndarray
+            ) -> np.ndarray:
+        if not arrays1.shape[1:] == arrays2.shape[1:]:
+            msg = "Height, Width of two images must be equal, get: {} and {}"
+            raise ValueError(msg.format(arrays1.shape[1:], arrays2.shape[1:]))
+        return self._blend(arrays1, arrays2)
+
+    def _blend(self, array1: np.ndarray, array2: np.ndarray) -> np.ndarray:
+        """Blend gray images of (..., h, w) into color of (..., h, w, 3)"""
+        lut = _overlap_lut(self._color1, self._color2)
+        # batch of (N, h, w) may be paired with a single image of (1, h, w)
+        array1, array2 = np.broadcast_arrays(array1, array2)
+        return _lookup_pairs(lut, array1, array2)
@@ -0,0 +1,335 @@
+import os
+import time
+import threading
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from collections import deque
+from concurrent.futures import Future, CancelledError, TimeoutError
+from typing import List
+
+from IMGBOX.core import Image
+from IMGBOX.shared import SharedImage
+from IMGBOX.Operations.edges import _FromSK
+
+__all__ = ["ProcessRunner"]
+
+
+def _serve(operation: _FromSK, conn):
+    """Entry of worker process: operate on gray images in shared memory
+
+    Handles of SharedImage are received from conn until None or EOF.
+    """
+    while True:
+        try:
+            shared = conn.recv()
+        except EOFError:
+            break
+        if shared is None:
+            break
+        try:
+            # operate on Image as _FromSK.on does
+            gray = shared.image
+            try:
+                result = operation.op_func(gray, **operation._kwargs)
+                conn.send((True, result))
+            except Exception as err:
+                conn.send((False, err))
+            finally:
+                del gray  # release the export before closing shared memory
+        finally:
+            shared.close()
+    conn.close()
+
+
+class _Worker:
+    """A worker process operating on images one by one"""
+
+    def __init__(self, ctx, operation: _FromSK):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_serve, args=(operation, child_conn), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def stop(self):
+        """Let the worker exit after its current image"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass  # already exited
+        self.process.join()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class _Task:
+    """A image being operated by a worker"""
+
+    def __init__(self, worker: _Worker, img: Image, future: Future):
+        self.future = future
+        self.worker = worker
+        self.conn = worker.conn
+        self.shared = SharedImage.from_image(img.to_gray())
+        try:
+            self.conn.send(self.shared)
+        except BaseException:
+            self.release()
+            raise
+        self.start = time.monotonic()
+
+    def collect(self) -> bool:
+        """Receive result from worker, call it when conn is ready
+
+        Returns:
+            True if the worker is still alive to take next image
+        """
+        try:
+            success, value = self.conn.recv()
+            alive = True
+        except EOFError:
+            msg = "Worker process exited unexpectedly with code {}"
+            self.worker.process.join()
+            success, alive = False, False
+            value = RuntimeError(msg.format(self.worker.process.exitcode))
+
+        if success:
+            self.future.set_result(value)
+        else:
+            self.future.set_exception(value)
+        self.release()
+        return alive
+
+    def abort(self, error: BaseException):
+        """Kill the worker and set error to the future"""
+        self.worker.kill()
+        self.future.set_exception(error)
+        self.release()
+
+    def release(self):
+        self.shared.close()
+        self.shared.unlink()
+
+
+class ProcessRunner:
+    """Run _FromSK operations over many images in worker processes
+
+    Scikit-image segmentations (ChanVese, MorphGAC...) hold the GIL,
+    so they are run in processes instead of threads.
+    Worker processes are started on demand and kept for next images,
+    each gray image is passed to a worker through shared memory.
+    A worker exceeding timeout or being cancelled is killed,
+    and replaced by a new one if more images are pending.
+
+    Example:
+        with ProcessRunner(ChanVese(mu=0.25), workers=8, timeout=60) as run:
+            segmentations = run.map(imgs)
+    """
+
+    def __init__(
+            self, operation: _FromSK,
+            workers: int = None, timeout: float = None
+            ):
+        """
+        Args:
+            operation: the _FromSK operation to run
+            workers (int): max number of worker processes, default cpu count
+            timeout (float):
+                seconds allowed for each image, the future of an image
+                exceeding it is set with concurrent.futures.TimeoutError
+        """
+        if not isinstance(operation, _FromSK):
+            msg = "ProcessRunner only runs _FromSK operations, got {}"
+            raise TypeError(msg.format(type(operation)))
+
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        if workers <= 0:
+            raise ValueError("workers must > 0, got {}".format(workers))
+        if timeout is not None and not timeout > 0:
+            raise ValueError("timeout must > 0, got {}".format(timeout))
+
+        self._operation = operation
+        self._workers = workers
+        self._timeout = timeout
+        self._ctx = mp.get_context()
+
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._running = []
+        self._aborting = []
+        self._idle = []  # workers waiting for images, of scheduler only
+        self._cancels = 0
+        self._closed = False
+        self._wakeup_r, self._wakeup_w = self._ctx.Pipe(duplex=False)
+        self._wakeup_lock = threading.Lock()
+        self._scheduler = None
+
+    def submit(self, imgs: List[Image]) -> List[Future]:
+        """Submit images to operate on
+
+        Returns:
+            list of Future in the same order as imgs,
+            each resolves to the result of operation.on(img)
+        """
+        futures = []
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Can not submit to a closed ProcessRunner")
+            for img in imgs:
+                future = Future()
+                self._pending.append((future, img))
+                futures.append(future)
+
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(
+                    target=self._schedule, daemon=True
+                )
+                self._scheduler.start()
+        self._wakeup()
+        return futures
+
+    def map(self, imgs: List[Image]) -> list:
+        """Operate on images and return results in order
+
+        If any image fails, the rest are cancelled and the error is raised.
+        """
+        futures = self.submit(imgs)
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            self.cancel()
+            raise
+
+    def cancel(self):
+        """Cancel pending images and kill the running ones"""
+        with self._lock:
+            while self._pending:
+                future, _ = self._pending.popleft()
+                future.cancel()
+            self._aborting.extend(self._running)
+            self._running = []
+            self._cancels += 1
+        self._wakeup()
+
+    def close(self, cancel: bool = False):
+        """Wait for all images to finish (or cancel them) and stop
+
+        Closing a closed runner does nothing.
+        """
+        if cancel:
+            self.cancel()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            scheduler = self._scheduler
+        self._wakeup()
+        if scheduler is not None:
+            scheduler.join()
+        with self._wakeup_lock:
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+
+    def _wakeup(self):
+        """Wake up the scheduler, sends of any thread are serialized"""
+        with self._wakeup_lock:
+            if not self._wakeup_w.closed:
+                self._wakeup_w.send(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(cancel=exc_type is not None)
+
+    def _launch(self):
+        """Start pending images until reaching number of workers"""
+        with self._lock:
+            aborting, self._aborting = self._aborting, []
+        for task in aborting:
+            task.abort(CancelledError())
+
+        with self._lock:
+            cancels = self._cancels
+            starting = []
+            while self._pending and \
+                    len(self._running) + len(starting) < self._workers:
+                future, img = self._pending.popleft()
+                if future.set_running_or_notify_cancel():
+                    starting.append((future, img))
+
+        # starting processes is slow under spawn, so not holding the lock
+        tasks = []
+        for future, img in starting:
+            try:
+                worker = self._idle.pop() if self._idle else \
+                    _Worker(self._ctx, self._operation)
+            except BaseException as err:
+                future.set_exception(err)
+                continue
+            try:
+                tasks.append(_Task(worker, img, future))
+            except BaseException as err:
+                future.set_exception(err)
+                worker.kill()
+
+        with self._lock:
+            if cancels == self._cancels:
+                self._running.extend(tasks)
+            else:
+                # cancelled while starting, aborted in next _launch
+                self._aborting.extend(tasks)
+            finished = self._closed and not self._pending and \
+                not self._running and not self._aborting
+            return list(self._running), finished
+
+    def _schedule(self):
+        """Loop in a background thread to launch, collect and time out"""
+        while True:
+            running, finished = self._launch()
+            if finished:
+                for worker in self._idle:
+                    worker.stop()
+                self._idle = []
+                return
+
+            timeout = None
+            if self._timeout is not None and running:
+                now = time.monotonic()
+                deadline = min(task.start for task in running) + self._timeout
+                timeout = max(deadline - now, 0)
+
+            ready = wait([self._wakeup_r] + [t.conn for t in running], timeout)
+            if self._wakeup_r in ready:
+                while self._wakeup_r.poll():
+                    self._wakeup_r.recv()
+
+            now = time.monotonic()
+            done, expired = [], []
+            with self._lock:
+                for task in running:
+                    if task not in self._running:
+                        continue  # cancelled, aborted in next _launch
+                    elif task.conn in ready:
+                        done.append(task)
+                    elif self._timeout is not None and \
+                            now - task.start >= self._timeout:
+                        expired.append(task)
+                    else:
+                        continue
+                    self._running.remove(task)
+
+            for task in done:
+                if task.collect():
+                    self._idle.append(task.worker)
+                else:
+                    task.worker.kill()
+            for task in expired:
+                msg = "Operation exceeds timeout of {} seconds"
+                task.abort(TimeoutError(msg.format(self._timeout)))
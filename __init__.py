@@ -1,11 +1,20 @@
 from IMGBOX.core import *
+from IMGBOX.aio import *
 from IMGBOX.shapes import *
+from IMGBOX.nms import *
+from IMGBOX.tiled import *
+from IMGBOX.shared import *
+from IMGBOX.video import *
+from IMGBOX.pipeline import *
 from IMGBOX.Operations.edges import *
 from IMGBOX.Operations.crop import *
 from IMGBOX.Operations.draw import *
 from IMGBOX.Operations.overlap import *
 from IMGBOX.Operations.difference import *
 from IMGBOX.Operations.correlation import *
+from IMGBOX.Operations.chain import *
+from IMGBOX.Operations.parallel import *
+from IMGBOX.Operations.cache import *
 from IMGBOX.Visualization.plot import *
 
 
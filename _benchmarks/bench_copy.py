@@ -0,0 +1,46 @@
+"""Bytes allocated per operation, with and without the extra Image copy
+
+Run by:
+    python -m IMGBOX._benchmarks.bench_copy
+"""
+import numpy as np
+
+from IMGBOX.core import Image
+from IMGBOX.Operations.edges import Canny, Laplacian
+from IMGBOX.Operations.difference import AbsDiff
+from IMGBOX._benchmarks.common import measure, random_image, report
+
+
+SHAPE_4K = (2160, 3840, 3)
+
+
+def main():
+    color = random_image(SHAPE_4K)
+    gray = color.to_gray()
+    other = random_image(SHAPE_4K, seed=1)
+    owned = np.array(color)
+
+    rows = [
+        ("Image(array)", measure(lambda: Image(color))),
+        ("Image(array, copy=False)", measure(lambda: Image(owned, copy=False))),
+        ("to_gray", measure(color.to_gray)),
+        ("to_color", measure(gray.to_color)),
+        ("resize to 1080p", measure(lambda: color.resize((1080, 1920)))),
+        ("concate", measure(lambda: color.concate(other, axis=0))),
+    ]
+    for op in [Canny(), Laplacian()]:
+        name = op.__class__.__name__
+        rows.append((
+            name + " with copy",
+            measure(lambda: Image(op._operate(gray), copy=True))
+        ))
+        rows.append((name + ".on", measure(lambda: op.on(gray))))
+
+    diff = AbsDiff()
+    rows.append(("AbsDiff.on", measure(lambda: diff.on(color, other))))
+
+    report("Traced allocation per call on {}".format(SHAPE_4K), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Drawing shapes one by one, against drawing them in bulk
+
+Run by:
+    python -m IMGBOX._benchmarks.bench_draw
+"""
+import numpy as np
+
+from IMGBOX.shapes import RectangleArray, PointArray
+from IMGBOX.Operations.draw import draw_rectangle, draw_rectangles
+from IMGBOX.Operations.draw import draw_points
+from IMGBOX._benchmarks.common import measure, random_image, report
+
+
+SHAPE_1080P = (1080, 1920, 3)
+COUNTS = [1000, 10000]
+
+
+def main():
+    img = random_image(SHAPE_1080P)
+    rng = np.random.default_rng(0)
+    h, w = SHAPE_1080P[:2]
+
+    rows = []
+    for n in COUNTS:
+        ymin, xmin = rng.integers(0, h - 50, n), rng.integers(0, w - 50, n)
+        size = rng.integers(5, 50, (2, n))
+        rects = RectangleArray(ymin, xmin, ymin + size[0], xmin + size[1])
+        listed = [rect._replace(
+            ymin=int(rect.ymin), xmin=int(rect.xmin),
+            ymax=int(rect.ymax), xmax=int(rect.xmax)
+        ) for rect in rects]
+        colors = rng.integers(0, 256, (n, 3))
+
+        def loop_rectangles():
+            for rect in listed:
+                draw_rectangle(img, rect, (0, 0, 255), 2)
+
+        def loop_filled():
+            for rect in listed:
+                draw_rectangle(img, rect, (0, 0, 255), -1)
+
+        points = PointArray(rng.integers(0, h, n), rng.integers(0, w, n))
+        point_list = points.to_points()
+        rows += [
+            ("{} draw_rectangle loop".format(n), measure(loop_rectangles)),
+            ("{} draw_rectangles".format(n), measure(
+                lambda: draw_rectangles(img, rects, (0, 0, 255), 2)
+            )),
+            ("{} draw_rectangles, color each".format(n), measure(
+                lambda: draw_rectangles(img, rects, colors, 2)
+            )),
+            ("{} draw_rectangle loop, filled".format(n), measure(loop_filled)),
+            ("{} draw_rectangles, filled".format(n), measure(
+                lambda: draw_rectangles(img, rects, (0, 0, 255), -1)
+            )),
+            ("{} draw_points of Point list".format(n), measure(
+                lambda: draw_points(img, point_list, (0, 255, 0))
+            )),
+            ("{} draw_points of PointArray".format(n), measure(
+                lambda: draw_points(img, points, (0, 255, 0))
+            )),
+        ]
+    report("Drawing on {}".format(SHAPE_1080P), rows)
+
+
+if __name__ == "__main__":
+    main()
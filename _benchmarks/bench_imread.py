@@ -0,0 +1,51 @@
+"""Peak traced memory of reading image files
+
+Compare reading the whole file into a bytes object before decoding,
+against decoding from the memory-mapped file by _safe_imread.
+
+Run by:
+    python -m IMGBOX._benchmarks.bench_imread
+"""
+import pathlib
+import tempfile
+
+import cv2
+import numpy as np
+
+from IMGBOX.core import _safe_imread
+from IMGBOX._benchmarks.common import measure, random_image, report
+from IMGBOX._unittests.configs import SAMPLE_IMAGES, IMAGE_BW
+
+
+LARGE_BMP_SHAPE = (6000, 8000, 3)
+
+
+def _read_into_bytes(file: str) -> np.ndarray:
+    with open(file, "rb") as f:
+        content = f.read()
+    return cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_UNCHANGED)
+
+
+def main():
+    files = [str(file) for file in SAMPLE_IMAGES + [IMAGE_BW]]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        large = str(pathlib.Path(tmp_dir).joinpath("large.bmp"))
+        cv2.imwrite(large, random_image(LARGE_BMP_SHAPE))
+        files.append(large)
+
+        rows = []
+        for file in files:
+            name = pathlib.Path(file).name
+            rows.append((
+                name + " f.read()",
+                measure(lambda: _read_into_bytes(file), repeat=3)
+            ))
+            rows.append((
+                name + " mmap",
+                measure(lambda: _safe_imread(file), repeat=3)
+            ))
+        report("Decode time and peak traced memory per file", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Overlap and Mask with float blending, against lookup tables
+
+Run by:
+    python -m IMGBOX._benchmarks.bench_lut
+"""
+import cv2
+import numpy as np
+
+from IMGBOX.core import Image
+from IMGBOX.Operations.overlap import Overlap, Mask
+from IMGBOX._benchmarks.common import measure, random_image, report
+
+
+SHAPE_4K = (2160, 3840, 3)
+
+
+def float_overlap(array1, array2, color1=(255, 0, 0), color2=(0, 0, 255)):
+    """Overlap._blend before lookup tables"""
+    array1 = np.tile(array1[..., None], (1, 1, 3))
+    array2 = np.tile(array2[..., None], (1, 1, 3))
+    result = (array1 / 255) * color1 + (array2/255) * color2
+    return np.clip(result, a_min=0, a_max=255).astype(np.uint8)
+
+
+def float_mask(image, mask, color=(0, 0, 255)):
+    """Mask.on before lookup tables"""
+    color_mask = mask.to_color()
+    color_mask[mask.to_gray() > 0, :] = color
+    color_mask[mask.to_gray() <= 0, :] = [0, 0, 0]
+    result = cv2.addWeighted(
+        src1=image.to_color(), alpha=0.9, src2=color_mask, beta=0.1, gamma=0
+    )
+    return Image(result)
+
+
+def main():
+    color = random_image(SHAPE_4K)
+    gray1 = random_image(SHAPE_4K[:2], seed=1)
+    gray2 = random_image(SHAPE_4K[:2], seed=2)
+    mask = Image(((gray1 > 127) * 255).astype(np.uint8))
+
+    overlap, masking = Overlap(), Mask()
+    assert np.all(overlap.on(gray1, gray2) == float_overlap(gray1, gray2))
+    assert np.all(masking.on(color, mask) == float_mask(color, mask))
+
+    rows = [
+        ("Overlap float", measure(lambda: float_overlap(gray1, gray2))),
+        ("Overlap.on lut", measure(lambda: overlap.on(gray1, gray2))),
+        ("Mask float", measure(lambda: float_mask(color, mask))),
+        ("Mask.on lut", measure(lambda: masking.on(color, mask))),
+    ]
+    report("Blending on {}".format(SHAPE_4K), rows)
+
+
+if __name__ == "__main__":
+    main()
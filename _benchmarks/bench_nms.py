@@ -0,0 +1,73 @@
+"""Naive NMS looping over Rectangle.overlap_with, against vectorised nms
+
+Run by:
+    python -m IMGBOX._benchmarks.bench_nms
+"""
+import numpy as np
+
+from IMGBOX.shapes import RectangleArray
+from IMGBOX.nms import nms, soft_nms, merge_rectangles
+from IMGBOX._benchmarks.common import measure, report
+
+
+NAIVE_SIZES = [1000, 3000]
+SIZES = [1000, 3000, 10000, 100000]
+
+
+def random_rectangles(n: int, seed: int = 0):
+    """n rectangles of 5 ~ 40 pixels, about 0.5 rectangles per 40 x 40"""
+    rng = np.random.default_rng(seed)
+    size = 40 * np.sqrt(2 * n)
+    ymin, xmin = rng.uniform(0, size, (2, n))
+    height, width = rng.uniform(5, 40, (2, n))
+    rects = RectangleArray(ymin, xmin, ymin + height, xmin + width)
+    return rects, rng.uniform(0, 1, n)
+
+
+def naive_nms(rects, scores, iou_threshold: float = 0.5):
+    """Greedy NMS checking each pair with Rectangle.overlap_with"""
+    order = sorted(range(len(rects)), key=lambda idx: -scores[idx])
+    kept = []
+    for idx in order:
+        rect = rects[idx]
+        for other in kept:
+            other = rects[other]
+            if not rect.overlap_with(other):
+                continue
+            inter = (min(rect.ymax, other.ymax) - max(rect.ymin, other.ymin)) \
+                * (min(rect.xmax, other.xmax) - max(rect.xmin, other.xmin))
+            if inter / (rect.area + other.area - inter) > iou_threshold:
+                break
+        else:
+            kept.append(idx)
+    return kept
+
+
+def main():
+    rows = []
+    for n in SIZES:
+        rects, scores = random_rectangles(n)
+        if n in NAIVE_SIZES:
+            listed, listed_scores = rects.to_rectangles(), scores.tolist()
+            assert naive_nms(listed, listed_scores) == \
+                nms(rects, scores).tolist()
+            rows.append((
+                "{} naive overlap_with".format(n),
+                measure(lambda: naive_nms(listed, listed_scores), repeat=1)
+            ))
+        rows.append((
+            "{} nms".format(n), measure(lambda: nms(rects, scores))
+        ))
+        rows.append((
+            "{} soft_nms".format(n),
+            measure(lambda: soft_nms(rects, scores))
+        ))
+        rows.append((
+            "{} merge_rectangles".format(n),
+            measure(lambda: merge_rectangles(rects, scores))
+        ))
+    report("NMS of random rectangles", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Operations and conversions allocating results, against writing into out
+
+In steady state, calls with out should allocate no image-sized arrays,
+only small Python objects, since conversions reuse per-thread buffers.
+
+Run by:
+    python -m IMGBOX._benchmarks.bench_out
+"""
+import numpy as np
+
+from IMGBOX.shapes import Rectangle
+from IMGBOX.Operations.crop import Crop
+from IMGBOX.Operations.difference import AbsDiff
+from IMGBOX.Operations.edges import Canny, Laplacian
+from IMGBOX.Operations.overlap import Overlap
+from IMGBOX._benchmarks.common import measure, random_image, report
+
+
+SHAPE_1080P = (1080, 1920, 3)
+# allocation of a call with out, e.g. casting buffers of ufuncs,
+# above it an image-sized array is allocated
+STEADY_LIMIT = 256 * 2**10
+
+
+def main():
+    img1 = random_image(SHAPE_1080P, seed=1)
+    img2 = random_image(SHAPE_1080P, seed=2)
+
+    singular = [
+        ("Canny", Canny()),
+        ("Laplacian", Laplacian()),
+        ("Crop", Crop(Rectangle(100, 200, 900, 1700))),
+    ]
+    binary = [
+        ("AbsDiff", AbsDiff(threshold=30)),
+        ("Overlap", Overlap()),
+    ]
+    cases = [
+        ("Image.to_gray", lambda out=None: img1.to_gray(out=out)),
+        (
+            "Image.resize",
+            lambda out=None: img1.resize((540, 960), out=out)
+        ),
+    ]
+    cases += [
+        (name + ".on", lambda out=None, op=op: op.on(img1, out=out))
+        for name, op in singular
+    ]
+    cases += [
+        (name + ".on", lambda out=None, op=op: op.on(img1, img2, out=out))
+        for name, op in binary
+    ]
+
+    rows, exceeded = [], []
+    for name, func in cases:
+        out = np.empty_like(func())
+        steady = measure(lambda: func(out=out))
+        rows.append((name, measure(func)))
+        rows.append((name + " out=", steady))
+        if steady.allocated > STEADY_LIMIT:
+            exceeded.append(name)
+    report("Allocation per call on {}".format(SHAPE_1080P), rows)
+    if exceeded:
+        print("Allocated image-sized arrays with out: " + ", ".join(exceeded))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Full-res CrossCorrelate2D, against coarse-to-fine PyramidMatcher
+
+Run by:
+    python -m IMGBOX._benchmarks.bench_pyramid
+"""
+import numpy as np
+
+from IMGBOX.core import Image
+from IMGBOX.Operations.correlation import CrossCorrelate2D, PyramidMatcher
+from IMGBOX._benchmarks.common import measure, report
+from IMGBOX._unittests.configs import IMAGE_BW
+
+
+REGIONS = [(300, 280, 120, 100), (100, 500, 64, 80)]  # (y, x, h, w)
+
+
+def main():
+    frame = Image.from_file(IMAGE_BW)
+    # CrossCorrelate2D sums over color channels
+    color = frame.to_color()
+    correlate = CrossCorrelate2D()
+
+    for y, x, h, w in REGIONS:
+        template = Image(frame[y:y + h, x:x + w], name="template")
+        color_template = template.to_color()
+
+        result = correlate.on(color, color_template)
+        # "same" mode correlation peaks at the center of template
+        cy, cx = np.unravel_index(np.argmax(result), result.shape)
+        rows = [(
+            "CrossCorrelate2D at ({}, {})".format(cy - h // 2, cx - w // 2),
+            measure(lambda: correlate.on(color, color_template), repeat=3)
+        )]
+        for levels in (0, 1, 2, 3):
+            matcher = PyramidMatcher(template, levels=levels, top_k=3)
+            point, _ = matcher.search(frame)[0]
+            rows.append((
+                "PyramidMatcher levels={} at ({}, {})".format(
+                    matcher.levels, point.y, point.x
+                ),
+                measure(lambda: matcher.search(frame), repeat=3)
+            ))
+        title = "{} template of {} at ({}, {})".format(
+            frame.shape, (h, w), y, x
+        )
+        report(title, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Decode then resize, against decode at reduced resolution
+
+Run by:
+    python -m IMGBOX._benchmarks.bench_reduced_decode
+"""
+import pathlib
+import tempfile
+
+import cv2
+
+from IMGBOX.core import Image
+from IMGBOX._benchmarks.common import measure, random_image, report
+from IMGBOX._unittests.configs import IMAGE_BW
+
+
+LARGE_JPEG_SHAPE = (4000, 6000, 3)
+TARGETS = [(1000, 1000), (480, 640), (224, 224)]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        large = str(pathlib.Path(tmp_dir).joinpath("large.jpg"))
+        h, w, c = LARGE_JPEG_SHAPE
+        small = random_image((h // 8, w // 8, c))
+        # upsampled noise compresses like a natural photo rather than pure noise
+        cv2.imwrite(large, small.resize(LARGE_JPEG_SHAPE[:2], "INTER_CUBIC"))
+
+        for file in [str(IMAGE_BW), large]:
+            rows = []
+            for target in TARGETS:
+                shape = Image.from_file(file, max_shape=target).shape[:2]
+                rows.append((
+                    "{} full decode + resize".format(target),
+                    measure(
+                        lambda: Image.from_file(file).resize(shape), repeat=3
+                    )
+                ))
+                rows.append((
+                    "{} reduced decode".format(target),
+                    measure(
+                        lambda: Image.from_file(file, max_shape=target),
+                        repeat=3
+                    )
+                ))
+            report(pathlib.Path(file).name, rows)
+
+
+if __name__ == "__main__":
+    main()
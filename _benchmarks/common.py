@@ -0,0 +1,79 @@
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+
+from IMGBOX.core import Image
+
+
+Measurement = namedtuple("Measurement", ["seconds", "allocated"])
+Traced = namedtuple("Traced", ["peak", "blocks"])
+
+
+def random_image(shape, seed: int = 0) -> Image:
+    """Create a random uint8 Image of given shape"""
+    rng = np.random.default_rng(seed)
+    array = rng.integers(0, 256, size=shape, dtype=np.uint8)
+    return Image(array, name="random_{}".format("x".join(map(str, shape))))
+
+
+def traced(func) -> Traced:
+    """Peak bytes and allocated blocks traced during one call of func
+
+    blocks counts memory blocks allocated by the call and still held
+    when it returns, including its result, from tracemalloc snapshots
+    taken around the call. Temporaries freed within the call are
+    not counted, but they show in peak.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        del result
+    finally:
+        tracemalloc.stop()
+    # leave out blocks of tracemalloc taking snapshots
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(ignored).compare_to(
+        before.filter_traces(ignored), "filename"
+    )
+    return Traced(peak=peak - base, blocks=sum(s.count_diff for s in stats))
+
+
+def traced_peak(func) -> int:
+    """Peak bytes traced by tracemalloc during one call of func"""
+    return traced(func).peak
+
+
+def measure(func, repeat: int = 10) -> Measurement:
+    """Measure average time and traced allocation of calling func
+
+    Args:
+        func: callable with no arguments
+        repeat: number of calls to average over
+
+    Returns:
+        Measurement of (seconds per call, peak bytes allocated per call)
+    """
+    func()  # warm up caches and lazy initialization
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    seconds = (time.perf_counter() - start) / repeat
+    return Measurement(seconds=seconds, allocated=traced_peak(func))
+
+
+def report(title: str, rows):
+    """Print rows of (label, Measurement) as a table"""
+    print(title)
+    for label, result in rows:
+        line = "  {:<40s} {:10.3f} ms {:12.1f} MB"
+        print(line.format(
+            label, result.seconds * 1e3, result.allocated / 2**20
+        ))
@@ -0,0 +1,303 @@
+"""Benchmark suite of Operations and core methods of Image
+
+Each case is timed on random images from VGA to 8K, in gray and color,
+and reported in ms per call, throughput in MPix/s of the input image,
+peak memory traced during one call, and number of memory blocks
+allocated by one call and still held when it returns.
+Results can be saved as a baseline, and later runs compared against it,
+exiting with status 1 if any case regresses beyond tolerance.
+
+Run by:
+    python -m IMGBOX._benchmarks.suite
+    python -m IMGBOX._benchmarks.suite --sizes VGA,1080p --match Canny
+    python -m IMGBOX._benchmarks.suite --save baseline.json
+    python -m IMGBOX._benchmarks.suite --compare baseline.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from collections import OrderedDict, namedtuple
+
+import cv2
+import numpy as np
+
+from IMGBOX.core import Image
+from IMGBOX.shapes import Rectangle, RectangleArray
+from IMGBOX.Operations.crop import Crop
+from IMGBOX.Operations.correlation import CrossCorrelate2D
+from IMGBOX.Operations.correlation import TemplateMatcher, PyramidMatcher
+from IMGBOX.Operations.difference import AbsDiff
+from IMGBOX.Operations.draw import draw_rectangles, draw_points
+from IMGBOX.Operations.edges import Canny, Laplacian, MorphChanVese
+from IMGBOX.Operations.overlap import Overlap, Mask
+from IMGBOX._benchmarks.common import random_image, traced
+
+
+SIZES = OrderedDict([
+    ("VGA", (480, 640)),
+    ("720p", (720, 1280)),
+    ("1080p", (1080, 1920)),
+    ("4K", (2160, 3840)),
+    ("8K", (4320, 7680)),
+])
+
+# name, factory of (img, other, tmp_dir) -> func to time, max size
+Case = namedtuple("Case", ["name", "factory", "max_size"])
+Result = namedtuple(
+    "Result", ["seconds", "mpix_per_s", "peak", "allocations"],
+    defaults=(0,)
+)
+
+
+def _region(img: Image) -> Rectangle:
+    return Rectangle(img.h // 4, img.w // 4, 3 * img.h // 4, 3 * img.w // 4)
+
+
+def _template(img: Image) -> Image:
+    return Image(img[img.h // 3:img.h // 3 + 64, img.w // 3:img.w // 3 + 64])
+
+
+def _saved(img: Image, tmp_dir: str) -> str:
+    file = os.path.join(tmp_dir, "{}.jpg".format(img.name))
+    if not os.path.exists(file):
+        img.save(file)
+    return file
+
+
+def _rectangles(img: Image, count: int = 1000) -> RectangleArray:
+    rng = np.random.default_rng(0)
+    ymin = rng.uniform(0, img.h, count)
+    xmin = rng.uniform(0, img.w, count)
+    return RectangleArray(ymin, xmin, ymin + 50, xmin + 80)
+
+
+def _white(img: Image) -> np.ndarray:
+    return np.full(img.shape[2:], 255, dtype=np.uint8)
+
+
+def _points(img: Image, count: int = 10000) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return np.stack([
+        rng.integers(0, img.h, count), rng.integers(0, img.w, count)
+    ], axis=1)
+
+
+CASES = [
+    Case("Image.from_file", lambda img, other, tmp: (
+        lambda file=_saved(img, tmp): Image.from_file(file)
+    ), None),
+    Case("Image.save", lambda img, other, tmp: (
+        lambda: img.save(os.path.join(tmp, "save.jpg"))
+    ), None),
+    Case("Image.to_gray", lambda img, other, tmp: img.to_gray, None),
+    Case("Image.to_color", lambda img, other, tmp: img.to_color, None),
+    Case("Image.resize", lambda img, other, tmp: (
+        lambda: img.resize((img.h // 2, img.w // 2))
+    ), None),
+    Case("Image.concate", lambda img, other, tmp: (
+        lambda: img.concate(other, axis=1)
+    ), None),
+    Case("Canny", lambda img, other, tmp: (
+        lambda op=Canny(): op.on(img)
+    ), None),
+    Case("Laplacian", lambda img, other, tmp: (
+        lambda op=Laplacian(): op.on(img)
+    ), None),
+    Case("Crop", lambda img, other, tmp: (
+        lambda op=Crop(_region(img)): op.on(img)
+    ), None),
+    Case("AbsDiff", lambda img, other, tmp: (
+        lambda op=AbsDiff(): op.on(img, other)
+    ), None),
+    Case("Overlap", lambda img, other, tmp: (
+        lambda op=Overlap(): op.on(img, other)
+    ), None),
+    Case("Mask", lambda img, other, tmp: (
+        lambda op=Mask(): op.on(img, other)
+    ), None),
+    # CrossCorrelate2D sums over channels, so it only takes color images
+    Case("CrossCorrelate2D", lambda img, other, tmp: (
+        lambda op=CrossCorrelate2D(), color=img.to_color(),
+        template=_template(img).to_color(): op.on(color, template)
+    ), "4K"),
+    Case("TemplateMatcher.match", lambda img, other, tmp: (
+        lambda matcher=TemplateMatcher(_template(img)): matcher.match(img)
+    ), "4K"),
+    Case("PyramidMatcher.search", lambda img, other, tmp: (
+        lambda matcher=PyramidMatcher(_template(img)): matcher.search(img)
+    ), None),
+    # drawing on copies, leaving inputs of other cases unchanged
+    Case("draw_rectangles", lambda img, other, tmp: (
+        lambda canvas=img.copy(), rects=_rectangles(img):
+            draw_rectangles(canvas, rects, _white(img))
+    ), None),
+    Case("draw_points", lambda img, other, tmp: (
+        lambda canvas=img.copy(), points=_points(img):
+            draw_points(canvas, points, _white(img))
+    ), None),
+    Case("MorphChanVese", lambda img, other, tmp: (
+        lambda op=MorphChanVese(num_iter=5): op.on(img)
+    ), "VGA"),
+]
+
+
+def _key(case: str, size: str, color: str) -> str:
+    return "{} {} {}".format(case, size, color)
+
+
+def _time(func, min_time: float, max_repeat: int) -> float:
+    """Median seconds of calls, repeated until min_time or max_repeat"""
+    func()  # warm up caches and lazy initialization
+    durations = []
+    while len(durations) < max_repeat and sum(durations) < min_time:
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations))
+
+
+def run(sizes, pattern: str, min_time: float, max_repeat: int) -> OrderedDict:
+    """Run matched cases on sizes, printing and returning results by key"""
+    results = OrderedDict()
+    names = list(SIZES)
+    print("{:<48s} {:>10s} {:>10s} {:>10s} {:>8s}".format(
+        "case", "ms", "MPix/s", "peak MB", "allocs"
+    ))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            for color in ["gray", "color"]:
+                shape = SIZES[size] + ((3,) if color == "color" else ())
+                img = random_image(shape, seed=1)
+                other = random_image(shape, seed=2)
+                for case in CASES:
+                    if not re.search(pattern, case.name):
+                        continue
+                    if case.max_size is not None and \
+                            names.index(size) > names.index(case.max_size):
+                        continue
+
+                    func = case.factory(img, other, tmp)
+                    seconds = _time(func, min_time, max_repeat)
+                    memory = traced(func)
+                    result = Result(
+                        seconds=seconds,
+                        mpix_per_s=img.h * img.w / seconds / 1e6,
+                        peak=memory.peak,
+                        allocations=memory.blocks
+                    )
+                    key = _key(case.name, size, color)
+                    results[key] = result
+                    print("{:<48s} {:10.3f} {:10.1f} {:10.1f} {:8d}".format(
+                        key, result.seconds * 1e3, result.mpix_per_s,
+                        result.peak / 2**20, result.allocations
+                    ))
+    return results
+
+
+def _environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def save(results: OrderedDict, file: str):
+    """Save results as a baseline of json"""
+    content = {
+        "environment": _environment(),
+        "results": {key: result._asdict() for key, result in results.items()},
+    }
+    with open(file, "w") as f:
+        json.dump(content, f, indent=2)
+
+
+def compare(results: OrderedDict, file: str, tolerance: float) -> list:
+    """Print results against a saved baseline, return regressed keys
+
+    A case regresses if it is slower than baseline by more than tolerance
+    (and 0.1 ms), its peak memory grows by more than tolerance (and 1 MB),
+    or its allocations grow by more than tolerance (and 10 blocks).
+    Absolute margins keep noise of tiny cases from being regressions.
+    """
+    with open(file) as f:
+        content = json.load(f)
+    if content["environment"] != _environment():
+        print("Baseline environment differs: {}".format(content["environment"]))
+
+    baseline = content["results"]
+    regressed = []
+    print("\n{:<48s} {:>10s} {:>10s} {:>10s}".format(
+        "case", "time", "peak", "allocs"
+    ))
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        base = Result(**baseline[key])
+        slower = result.seconds / base.seconds - 1
+        grown = (result.peak - base.peak) / max(base.peak, 1)
+        more = result.allocations - base.allocations
+        failed = (
+            slower > tolerance and result.seconds - base.seconds > 1e-4
+        ) or (
+            grown > tolerance and result.peak - base.peak > 2**20
+        ) or (
+            more > tolerance * max(base.allocations, 1) and more > 10
+        )
+        if failed:
+            regressed.append(key)
+        print("{:<48s} {:>+9.1%} {:>+9.1%} {:>+10d}{}".format(
+            key, slower, grown, more, "  REGRESSED" if failed else ""
+        ))
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes", default=",".join(SIZES),
+        help="comma separated sizes in {}".format(", ".join(SIZES))
+    )
+    parser.add_argument(
+        "--match", default="", help="regex of case names to run"
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=0.5,
+        help="seconds to repeat each case at least"
+    )
+    parser.add_argument(
+        "--max-repeat", type=int, default=20,
+        help="max number of calls of each case"
+    )
+    parser.add_argument("--save", help="save results as baseline json")
+    parser.add_argument("--compare", help="compare against baseline json")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.15,
+        help="relative slowdown or memory growth counted as regression"
+    )
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes.split(",")
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error("unknown sizes: {}".format(", ".join(unknown)))
+
+    results = run(sizes, args.match, args.min_time, args.max_repeat)
+    if args.save:
+        save(results, args.save)
+    if args.compare:
+        regressed = compare(results, args.compare, args.tolerance)
+        if regressed:
+            print("\n{} cases regressed".format(len(regressed)))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
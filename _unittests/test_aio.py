@@ -0,0 +1,164 @@
+import os
+import time
+import asyncio
+import pathlib
+import threading
+from concurrent.futures import TimeoutError
+
+import numpy as np
+import pytest
+
+from IMGBOX.core import Image
+from IMGBOX.aio import configure_async, _offloader
+from IMGBOX.Operations.base import SingularOperation
+from IMGBOX.Operations.difference import AbsDiff
+from IMGBOX.Operations.edges import Laplacian, MorphChanVese, ChanVese
+
+from IMGBOX._unittests.configs import SAMPLE_IMAGES
+
+
+class _Sleep(SingularOperation):
+    """Sleep then return input, recording max number of concurrent calls"""
+
+    def __init__(self, seconds: float):
+        self._seconds = seconds
+        self._lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.calls = 0
+
+    def _operate(self, img: np.ndarray) -> np.ndarray:
+        with self._lock:
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self._seconds)
+        with self._lock:
+            self.running -= 1
+        return img
+
+
+@pytest.fixture
+def configured():
+    """Restore default configuration of async API after test"""
+    yield configure_async
+    configure_async(workers=os.cpu_count() or 1, max_bytes=2**30)
+
+
+class TestAsync:
+
+    def test_load_operate_save(self, tmp_path: pathlib.Path):
+        """Async API should equal to their blocking counterparts"""
+        file = str(SAMPLE_IMAGES[0])
+        out_file = str(tmp_path.joinpath("out.png"))
+
+        async def run():
+            img = await Image.afrom_file(file)
+            small = await Image.afrom_file(file, scale=0.5)
+            edges = await Laplacian().aon(img)
+            diff = await AbsDiff().aon(img, edges)
+            await diff.asave(out_file)
+            return img, small, edges, diff
+
+        img, small, edges, diff = asyncio.run(run())
+        assert np.all(img == Image.from_file(file))
+        assert small.shape == Image.from_file(file, scale=0.5).shape
+        assert np.all(edges == Laplacian().on(img))
+        assert edges.name == Laplacian().on(img).name
+        assert np.all(Image.from_file(out_file) == diff)
+        assert _offloader.budget.used == 0
+
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(Image.afrom_file(str(tmp_path.joinpath("none.png"))))
+
+    def test_memory_cap(self, configured):
+        """Images in flight should be capped by max_bytes"""
+        img = Image(np.zeros((100, 100), dtype=np.uint8))
+        # each call counts 2 * 10000 bytes
+        configured(workers=8, max_bytes=40000)
+        op = _Sleep(0.05)
+
+        async def run():
+            return await asyncio.gather(*[op.aon(img) for _ in range(8)])
+
+        results = asyncio.run(run())
+        assert len(results) == 8 and op.calls == 8
+        assert op.max_running == 2
+        assert _offloader.budget.used == 0
+
+        # image larger than max_bytes runs alone instead of waiting forever
+        configured(max_bytes=1000)
+        asyncio.run(op.aon(img))
+
+    def test_lower_cap_while_waiting(self, configured):
+        """Waiters should not hang when max_bytes is lowered below them"""
+        small = Image(np.zeros((100, 100), dtype=np.uint8))
+        large = Image(np.zeros((300, 300), dtype=np.uint8))
+        configured(workers=4, max_bytes=40000)
+        op = _Sleep(0.1)
+
+        async def run():
+            first = asyncio.ensure_future(op.aon(small))
+            await asyncio.sleep(0.02)
+            # large waits for 40000 bytes, then the cap goes below it
+            waiting = [
+                asyncio.ensure_future(op.aon(large)),
+                asyncio.ensure_future(op.aon(small))
+            ]
+            await asyncio.sleep(0.02)
+            configured(max_bytes=10000)
+            return await asyncio.wait_for(
+                asyncio.gather(first, *waiting), timeout=5
+            )
+
+        results = asyncio.run(run())
+        assert len(results) == 3 and op.calls == 3
+        assert op.max_running == 1
+        assert _offloader.budget.used == 0
+
+    def test_cancel(self, configured):
+        """Cancelled calls should not run, and release their bytes"""
+        img = Image(np.zeros((100, 100), dtype=np.uint8))
+        configured(workers=1, max_bytes=20000)
+        op = _Sleep(0.1)
+
+        async def run():
+            tasks = [asyncio.ensure_future(op.aon(img)) for _ in range(4)]
+            await asyncio.sleep(0.02)
+            for task in tasks[1:]:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            return tasks
+
+        tasks = asyncio.run(run())
+        assert not tasks[0].cancelled()
+        assert all(task.cancelled() for task in tasks[1:])
+        assert op.calls == 1
+        assert _offloader.budget.used == 0
+
+    def test_from_sk(self):
+        """_FromSK should run in a process, killed if cancelled"""
+        img = Image.from_file(SAMPLE_IMAGES[0])
+        op = MorphChanVese(num_iter=3)
+        assert np.all(asyncio.run(op.aon(img)) == op.on(img))
+
+        slow = ChanVese(max_num_iter=10**6, tol=0)
+
+        async def cancel_after(seconds: float):
+            task = asyncio.ensure_future(slow.aon(img))
+            await asyncio.sleep(seconds)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        start = time.monotonic()
+        asyncio.run(cancel_after(0.2))
+        with pytest.raises(TimeoutError):
+            asyncio.run(slow.aon(img, timeout=0.2))
+        assert time.monotonic() - start < 5
+        assert _offloader.budget.used == 0
+
+        # bytes are released even if the runner fails to construct
+        with pytest.raises(ValueError):
+            asyncio.run(op.aon(img, timeout=-1))
+        assert _offloader.budget.used == 0
@@ -1,3 +1,4 @@
+import pickle
 import operator
 import pathlib
 
@@ -5,7 +6,7 @@ import pytest
 import cv2
 import numpy as np
 
-from IMGBOX.core import Image
+from IMGBOX.core import Image, ImageWriter
 from IMGBOX._unittests.configs import INVALID_IMAGES, SAMPLE_IMAGES
 from IMGBOX._unittests.configs import UNDETECTED_IMAGES, IMAGE_BW
 
@@ -52,6 +53,22 @@ class TestImageObject:
         assert not img.is_color
         assert _is_ref_unequal(img, array)
 
+    def test_from_array_without_copy(self):
+        """Image created with copy=False should view owned contiguous array"""
+        array = np.random.randint(0, 255, size=(100, 500, 3), dtype=np.uint8)
+        img = Image(array, copy=False)
+        assert np.shares_memory(img, array)
+
+        # non-contiguous or non-owned array must still be copied
+        sliced = array[:, ::2]
+        img = Image(sliced, copy=False)
+        assert not np.shares_memory(img, array)
+        assert np.all(img == sliced)
+
+        view = array[10:20]
+        img = Image(view, copy=False)
+        assert not np.shares_memory(img, array)
+
     def test_from_invalid_array(self):
         """Image object should refuse invalid array"""
         wrong_dimension = np.random.randint(
@@ -151,6 +168,144 @@ class TestImageObject:
         with pytest.raises(ValueError):
             img = Image.from_file(sample)
 
+    def test_from_empty_file(self, tmp_path: pathlib.Path):
+        """Create Image object from empty file should raise ValueError"""
+        file = tmp_path.joinpath("empty.jpg")
+        file.touch()
+        with pytest.raises(ValueError):
+            img = Image.from_file(str(file))
+
+    @pytest.mark.parametrize(
+        "file", SAMPLE_IMAGES + [IMAGE_BW]
+    )
+    def test_from_file_downscale(self, file):
+        """from_file with scale/max_shape should match full decode + resize"""
+        full = Image.from_file(str(file))
+
+        half = (round(full.h * 0.3), round(full.w * 0.3))
+        img = Image.from_file(str(file), scale=0.3)
+        assert img.name == file.stem
+        assert img.shape[:2] == half
+        assert img.c == full.c
+        expected = full.resize(half).astype(np.float32)
+        assert np.mean(np.abs(img - expected)) < 8
+
+        img = Image.from_file(str(file), max_shape=(100, 80))
+        assert img.h <= 100 and img.w <= 80
+        assert img.h == 100 or img.w == 80
+        assert img.c == full.c
+
+        # max_shape of numpy integers, e.g. from shape of another array
+        img = Image.from_file(str(file), max_shape=np.array([100, 80]))
+        assert img.h <= 100 and img.w <= 80
+        assert img.h == 100 or img.w == 80
+
+        # image smaller than max_shape is not resized
+        img = Image.from_file(str(file), max_shape=(10000, 10000))
+        assert np.all(img == full)
+
+    def test_from_file_invalid_downscale(self):
+        """from_file should refuse invalid scale or both scale and max_shape"""
+        with pytest.raises(ValueError):
+            Image.from_file(str(IMAGE_BW), scale=0)
+
+        with pytest.raises(ValueError):
+            Image.from_file(str(IMAGE_BW), scale=0.5, max_shape=(10, 10))
+
+    @pytest.mark.parametrize(
+        "file", SAMPLE_IMAGES + [IMAGE_BW]
+    )
+    def test_probe(self, file):
+        """probe should read the same shape as decoded Image"""
+        img = Image.from_file(str(file))
+        info = Image.probe(str(file))
+        assert (info.h, info.w, info.c) == (img.h, img.w, img.c)
+        assert info.format in ["jpeg", "bmp"]
+
+    @pytest.mark.parametrize("ext", ["png", "bmp", "jpg"])
+    def test_probe_saved_file(self, tmp_path: pathlib.Path, ext):
+        """probe should read the header of png, bmp and jpeg files"""
+        for img in [Image.from_file(SAMPLE_IMAGES[0]), Image.from_file(IMAGE_BW)]:
+            file = str(tmp_path.joinpath("probe." + ext))
+            img.save(file)
+            info = Image.probe(file)
+            assert (info.h, info.w, info.c) == (img.h, img.w, img.c)
+
+    @pytest.mark.parametrize(
+        "ext, shape, dtype", [
+            ("bmp", (20, 30, 4), np.uint8),
+            ("png", (20, 30, 4), np.uint8),
+            ("png", (20, 30), np.uint16),
+            ("png", (20, 30, 3), np.uint16),
+        ]
+    )
+    def test_probe_unchanged_decode(
+            self, tmp_path: pathlib.Path, ext, shape, dtype
+            ):
+        """probe should match channels and depth decoded unchanged"""
+        file = str(tmp_path.joinpath("probe." + ext))
+        cv2.imwrite(file, np.ones(shape, dtype=dtype))
+        array = cv2.imread(file, cv2.IMREAD_UNCHANGED)
+        assert array.shape == shape and array.dtype == dtype
+
+        info = Image.probe(file)
+        c = shape[2] if len(shape) == 3 else 0
+        assert (info.h, info.w, info.c) == (20, 30, c)
+        assert info.depth == np.dtype(dtype).itemsize * 8
+
+    def test_probe_invalid_header(self, tmp_path: pathlib.Path):
+        """probe should raise ValueError on corrupted or unsupported header"""
+        with pytest.raises(ValueError):
+            Image.probe(str(SAMPLE_IMAGES[0].parent.joinpath(
+                "Invalid_wrong-header.jpg"
+            )))
+
+        truncated = tmp_path.joinpath("truncated.jpg")
+        with open(str(IMAGE_BW), "rb") as f:
+            truncated.write_bytes(f.read(30))
+        with pytest.raises(ValueError):
+            Image.probe(str(truncated))
+
+    def test_from_files(self):
+        """from_files should load images in order and skip invalid files"""
+        files = SAMPLE_IMAGES + INVALID_IMAGES + [IMAGE_BW]
+        errors = []
+        imgs = list(Image.from_files(files, workers=3, prefetch=2, errors=errors))
+
+        assert [img.name for img in imgs] == \
+            [file.stem for file in SAMPLE_IMAGES + [IMAGE_BW]]
+        for img, file in zip(imgs, SAMPLE_IMAGES + [IMAGE_BW]):
+            assert np.all(img == Image.from_file(file))
+
+        assert [file for file, _ in errors] == [str(f) for f in INVALID_IMAGES]
+        assert all(isinstance(err, ValueError) for _, err in errors)
+
+    def test_from_files_invalid_arguments(self, tmp_path: pathlib.Path):
+        """from_files should check arguments when called, not iterated"""
+        for kwargs in [{"workers": 0}, {"workers": -1}, {"prefetch": 0}]:
+            with pytest.raises(ValueError):
+                Image.from_files(SAMPLE_IMAGES, **kwargs)
+
+        # missing file is collected instead of aborting the others
+        missing = str(tmp_path.joinpath("missing.png"))
+        errors = []
+        imgs = list(Image.from_files([missing, IMAGE_BW], errors=errors))
+        assert [img.name for img in imgs] == [IMAGE_BW.stem]
+        assert [file for file, _ in errors] == [missing]
+        assert isinstance(errors[0][1], OSError)
+
+    def test_from_files_glob_and_directory(self):
+        """from_files should accept a glob pattern or a directory"""
+        pattern = str(SAMPLE_IMAGES[0].parent.joinpath("sample*.*"))
+        imgs = list(Image.from_files(pattern, workers=2))
+        assert [img.name for img in imgs] == \
+            sorted(file.stem for file in SAMPLE_IMAGES)
+
+        with pytest.warns(UserWarning):
+            imgs = list(Image.from_files(SAMPLE_IMAGES[0].parent))
+        assert len(imgs) == len(list(SAMPLE_IMAGES[0].parent.iterdir())) - \
+            len(INVALID_IMAGES)
+
     @pytest.mark.parametrize(
         "sample", [SAMPLE_IMAGES[0], IMAGE_BW], ids=["color", "bw"]
     )
@@ -175,6 +330,62 @@ class TestImageObject:
 
         img.save(str(file), overwrite=True)
 
+    def test_save_encode_params(self, tmp_path: pathlib.Path):
+        """quality and compression should apply to JPEG and PNG"""
+        img = Image.from_file(SAMPLE_IMAGES[0])
+        low, high = tmp_path / "low.jpg", tmp_path / "high.jpg"
+        img.save(str(low), quality=10)
+        img.save(str(high), quality=100)
+        assert low.stat().st_size < high.stat().st_size
+
+        fast, small = tmp_path / "fast.png", tmp_path / "small.png"
+        img.save(str(fast), compression=0)
+        img.save(str(small), compression=9)
+        assert small.stat().st_size < fast.stat().st_size
+        assert np.all(Image.from_file(str(small)) == img)
+
+        with pytest.raises(ValueError):
+            img.save(str(tmp_path / "a.png"), quality=90)
+        with pytest.raises(ValueError):
+            img.save(str(tmp_path / "a.jpg"), quality=101)
+        with pytest.raises(ValueError):
+            img.save(str(tmp_path / "a.png"), compression=10)
+        with pytest.raises(ValueError):
+            img.save(str(tmp_path / "a.unknown"))
+        # temporary files are never left
+        assert sorted(f.name for f in tmp_path.iterdir()) == [
+            "fast.png", "high.jpg", "low.jpg", "small.png"
+        ]
+
+    def test_save_async(self, tmp_path: pathlib.Path):
+        """ImageWriter should write copies of images in background"""
+        img = Image.from_file(SAMPLE_IMAGES[0])
+        expected = img.copy()
+        with ImageWriter(workers=2, max_pending=2) as writer:
+            futures = [
+                writer.save(img, str(tmp_path / "{}.png".format(idx)))
+                for idx in range(6)
+            ]
+            img[...] = 0  # images are copied when queued
+
+        for idx, future in enumerate(futures):
+            assert future.done()
+            assert future.result() == str(tmp_path / "{}.png".format(idx))
+            assert np.all(Image.from_file(future.result()) == expected)
+
+        future = expected.save_async(str(tmp_path / "0.png"), overwrite=False)
+        with pytest.raises(ValueError):
+            future.result(timeout=10)
+
+        future = img.save_async(str(tmp_path / "0.png"))
+        future.result(timeout=10)
+        assert np.all(Image.from_file(str(tmp_path / "0.png")) == 0)
+        assert len(list(tmp_path.iterdir())) == 6
+
+        for kwargs in [{"workers": 0}, {"workers": -1}, {"max_pending": 0}]:
+            with pytest.raises(ValueError):
+                ImageWriter(**kwargs)
+
     @pytest.mark.xfail(reason="Image object can not detect these image defects")
     @pytest.mark.parametrize(
         "sample", [str(file) for file in UNDETECTED_IMAGES]
@@ -235,6 +446,119 @@ class TestImageObject:
         with pytest.raises(ValueError):
             img.resize((224, 224), interpolation="NOT_EXIST")
 
+    def test_pickle(self):
+        """Pickled Image should keep its name"""
+        img = Image.from_file(SAMPLE_IMAGES[0])
+        loaded = pickle.loads(pickle.dumps(img))
+        assert isinstance(loaded, Image)
+        assert loaded.name == img.name
+        assert np.all(loaded == img)
+
+    def test_conversion_cache(self):
+        """With conversions cached, each is computed once and read-only"""
+        color = Image.from_file(SAMPLE_IMAGES[0])
+        assert color.to_gray() is not color.to_gray()
+
+        color.cache_conversions()
+        gray = color.to_gray()
+        assert gray is color.to_gray()
+        assert not gray.flags.writeable
+        assert np.all(gray == cv2.cvtColor(color, cv2.COLOR_BGR2GRAY))
+
+        f32 = gray.to_float32()
+        assert f32.dtype == np.float32
+        assert f32 is color.to_gray().to_float32()
+        assert f32.to_float32() is f32
+
+        color.cache_conversions(False)
+        assert color.to_gray() is not gray
+        assert color.to_gray().flags.writeable
+
+    def test_conversion_cache_invalidated(self):
+        """Writing image should drop its cached conversions"""
+        gray = Image.from_file(IMAGE_BW).cache_conversions()
+        color = gray.to_color()
+        assert color is gray.to_color()
+
+        gray[:10, :10] = 255
+        assert gray.to_color() is not color
+        assert np.all(gray.to_color()[:10, :10] == 255)
+
+        color = gray.to_color()
+        cv2.circle(gray, (50, 50), 10, 0, -1)
+        gray.invalidate_conversions()
+        assert np.all(gray.to_color()[..., 0] == gray)
+
+        out = np.empty(gray.shape, dtype=np.uint8)
+        cached = Image(out, copy=False).cache_conversions()
+        color = cached.to_color()
+        gray.to_gray(out=cached)
+        assert cached.to_color() is not color
+        assert np.all(cached.to_color()[..., 0] == gray)
+
+    def test_conversion_cache_size(self):
+        """Cached conversions should be bounded by memory"""
+        imgs = [
+            Image(np.full((100, 100), idx, dtype=np.uint8)).cache_conversions()
+            for idx in range(3)
+        ]
+        try:
+            # room for two color images of 30000 bytes
+            Image.set_conversion_cache_size(60000)
+            colors = [img.to_color() for img in imgs]
+            assert imgs[2].to_color() is colors[2]
+            assert imgs[1].to_color() is colors[1]
+            # the least recently used is evicted
+            assert imgs[0].to_color() is not colors[0]
+
+            Image.set_conversion_cache_size(0)
+            assert imgs[2].to_color() is not imgs[2].to_color()
+
+            with pytest.raises(ValueError):
+                Image.set_conversion_cache_size(-1)
+        finally:
+            Image.set_conversion_cache_size(512 * 2**20)
+
+    def test_conversion_into_out(self):
+        """.resize(), .to_gray(), .to_color() should write into given out"""
+        color = Image.from_file(SAMPLE_IMAGES[0])
+        gray = Image.from_file(IMAGE_BW)
+
+        out = np.empty((100, 400, 3), dtype=np.uint8)
+        resize = color.resize((100, 400), out=out)
+        assert np.shares_memory(resize, out)
+        assert resize.name == color.name
+        assert np.all(resize == color.resize((100, 400)))
+
+        out = np.empty(color.shape[:2], dtype=np.uint8)
+        converted = color.to_gray(out=out)
+        assert np.shares_memory(converted, out)
+        assert np.all(converted == color.to_gray())
+
+        out = Image(np.empty(gray.shape + (3,), dtype=np.uint8))
+        converted = gray.to_color(out=out)
+        assert converted is out
+        assert np.all(converted == gray.to_color())
+
+        # same color space is copied into out
+        out = np.empty(gray.shape, dtype=np.uint8)
+        assert np.all(gray.to_gray(out=out) == gray)
+
+    @pytest.mark.parametrize(
+        "out", [
+            np.empty((100, 400), dtype=np.uint8),
+            np.empty((100, 400, 3), dtype=np.float32),
+            np.empty((100, 800, 3), dtype=np.uint8)[:, ::2],
+            [[0] * 400] * 100,
+        ],
+        ids=["shape", "dtype", "non-contiguous", "not-array"]
+    )
+    def test_conversion_into_invalid_out(self, out):
+        """out should be rejected instead of silently reallocated"""
+        img = Image.from_file(SAMPLE_IMAGES[0])
+        with pytest.raises(ValueError):
+            img.resize((100, 400), out=out)
+
     def test_concatenate_invalid_dtype(self):
         """concate works only with Image with same dtype"""
         img1 = Image(np.ones((200, 100, 3), dtype=np.uint8), dtype=np.float32)
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from IMGBOX.shapes import Rectangle, RectangleArray
+from IMGBOX.nms import nms, soft_nms, merge_rectangles
+
+
+def _random_rectangles(n: int, size: float):
+    ymin = np.random.uniform(0, size, n)
+    xmin = np.random.uniform(0, size, n)
+    height = np.random.uniform(5, 40, n)
+    width = np.random.uniform(5, 40, n)
+    rects = RectangleArray(ymin, xmin, ymin + height, xmin + width)
+    return rects, np.random.uniform(0, 1, n)
+
+
+class TestNMS:
+
+    def test_simple_case(self):
+        """Rectangles overlapped with a higher score one are suppressed"""
+        rects = [
+            Rectangle(0, 0, 10, 10), Rectangle(1, 1, 11, 11),
+            Rectangle(20, 20, 30, 30), Rectangle(0, 5, 10, 15)
+        ]
+        scores = [0.9, 0.8, 0.7, 0.95]
+        assert nms(rects, scores, iou_threshold=0.5).tolist() == [3, 0, 2]
+        assert nms(rects, scores, iou_threshold=0.3).tolist() == [3, 2]
+        assert nms([], []).tolist() == []
+
+        with pytest.raises(ValueError):
+            nms(rects, scores[:2])
+        with pytest.raises(ValueError):
+            nms(rects, scores, iou_threshold=1)
+
+    @pytest.mark.parametrize("size", [200, 1000])
+    def test_same_as_dense(self, size):
+        """Result should equal to greedy NMS on the dense IoU matrix"""
+        rects, scores = _random_rectangles(500, size)
+        iou = rects.iou(rects)
+        expected = []
+        for idx in np.argsort(-scores, kind="stable"):
+            if all(iou[idx, kept] <= 0.5 for kept in expected):
+                expected.append(idx)
+        assert nms(rects, scores, iou_threshold=0.5).tolist() == expected
+
+
+class TestSoftNMS:
+
+    @pytest.mark.parametrize("method", ["gaussian", "linear"])
+    def test_same_as_dense(self, method):
+        """Result should equal to soft-NMS on the dense IoU matrix"""
+        rects, scores = _random_rectangles(300, 200)
+        iou = rects.iou(rects)
+        current = scores.copy()
+        remaining = list(range(len(rects)))
+        expected, expected_scores = [], []
+        while remaining:
+            idx = max(remaining, key=lambda i: current[i])
+            if current[idx] < 1e-3:
+                break
+            remaining.remove(idx)
+            expected.append(idx)
+            expected_scores.append(current[idx])
+            for other in remaining:
+                if method == "gaussian":
+                    current[other] *= np.exp(-iou[idx, other] ** 2 / 0.5)
+                elif iou[idx, other] > 0.3:
+                    current[other] *= 1 - iou[idx, other]
+
+        kept, kept_scores = soft_nms(rects, scores, method=method)
+        assert kept.tolist() == expected
+        assert np.allclose(kept_scores, expected_scores)
+
+    def test_invalid(self):
+        rects, scores = _random_rectangles(10, 100)
+        with pytest.raises(ValueError):
+            soft_nms(rects, scores, method="hard")
+        with pytest.raises(ValueError):
+            soft_nms(rects, scores, sigma=0)
+
+
+class TestMergeRectangles:
+
+    def test_simple_case(self):
+        """Clusters should merge into score-weighted average"""
+        rects = [
+            Rectangle(0, 0, 10, 10), Rectangle(2, 2, 12, 12),
+            Rectangle(50, 50, 60, 60)
+        ]
+        merged, scores = merge_rectangles(
+            rects, [0.75, 0.25, 0.5], iou_threshold=0.3
+        )
+        assert merged.to_rectangles() == [
+            Rectangle(0.5, 0.5, 10.5, 10.5), Rectangle(50, 50, 60, 60)
+        ]
+        assert scores.tolist() == [0.75, 0.5]
+
+        with pytest.raises(ValueError):
+            merge_rectangles(rects, [0.75, -0.25, 0.5])
+
+    def test_same_clusters_as_nms(self):
+        """Merged rectangles should be one for each rectangle kept by NMS"""
+        rects, scores = _random_rectangles(500, 300)
+        merged, merged_scores = merge_rectangles(rects, scores)
+        kept = nms(rects, scores)
+        assert len(merged) == len(kept)
+        assert np.all(merged_scores == scores[kept])
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", "-v", __file__])
@@ -1,13 +1,27 @@
+import os
+import time
 import pathlib
+from concurrent.futures import CancelledError, TimeoutError
 
 import cv2
 import numpy as np
 import pytest
 
 from IMGBOX.core import Image
-from IMGBOX.Operations.difference import AbsDiff
-from IMGBOX.Operations.correlation import CrossCorrelate2D
+from IMGBOX.Operations.base import SingularOperation
+from IMGBOX.Operations.difference import AbsDiff, BackgroundDiff
+from IMGBOX.Operations.correlation import CrossCorrelate2D, TemplateMatcher
+from IMGBOX.Operations.correlation import PyramidMatcher
 from IMGBOX.Operations.edges import Canny, Laplacian
+from IMGBOX.Operations.crop import Crop
+from IMGBOX.Operations.chain import Chain
+from IMGBOX.Operations.overlap import Overlap, Mask
+from IMGBOX.Operations.draw import draw_rectangle, draw_rectangles
+from IMGBOX.Operations.draw import draw_points
+from IMGBOX.Operations.edges import MorphChanVese, ChanVese, _FromSK
+from IMGBOX.Operations.parallel import ProcessRunner
+from IMGBOX.Operations.cache import ResultCache
+from IMGBOX.shapes import Rectangle, Point, RectangleArray, PointArray
 
 from IMGBOX._unittests.configs import SAMPLE_IMAGES, IMAGE_BW
 from IMGBOX.Visualization.plot import display
@@ -49,6 +63,68 @@ class TestAbsDiff:
         result2 = operation.on(img1, img2)
         assert np.all(result1 == result2)
 
+    def test_same_as_float(self):
+        """uint8 difference should equal to difference in float32"""
+        array1 = np.random.randint(0, 255, size=(20, 30, 3), dtype=np.uint8)
+        array2 = np.random.randint(0, 255, size=(20, 30, 3), dtype=np.uint8)
+        expected = np.abs(
+            array1.astype(np.float32) - array2.astype(np.float32)
+        ).astype(np.uint8)
+        result = AbsDiff().on(Image(array1), Image(array2))
+        assert result.dtype == np.uint8
+        assert np.all(result == expected)
+
+        result = AbsDiff(threshold=100).on(Image(array1), Image(array2))
+        assert np.all(result == np.where(expected > 100, 255, 0))
+
+        with pytest.raises(ValueError):
+            AbsDiff(threshold=255)
+
+    def test_on_regions(self):
+        """Statistics of regions should equal to computing on crops"""
+        array1 = np.random.randint(0, 255, size=(20, 30, 3), dtype=np.uint8)
+        array2 = np.random.randint(0, 255, size=(20, 30, 3), dtype=np.uint8)
+        regions = [Rectangle(0, 0, 20, 30), Rectangle(5, 3, 12, 25)]
+        op = AbsDiff(threshold=50)
+        result, stats = op.on_regions(Image(array1), Image(array2), regions)
+        assert np.all(result == op.on(Image(array1), Image(array2)))
+
+        diff = np.max(np.abs(
+            array1.astype(np.int32) - array2.astype(np.int32)
+        ), axis=2)
+        for idx, rect in enumerate(regions):
+            region = diff[int(rect.ymin):int(rect.ymax),
+                          int(rect.xmin):int(rect.xmax)]
+            assert stats.mean[idx] == pytest.approx(np.mean(region))
+            assert stats.changed[idx] == pytest.approx(np.mean(region > 50))
+
+        with pytest.raises(ValueError):
+            op.on_regions(
+                Image(array1), Image(array2), [Rectangle(30, 0, 40, 10)]
+            )
+
+    def test_background(self):
+        """Background should follow running average of frames"""
+        frames = np.random.randint(0, 255, size=(5, 10, 12), dtype=np.uint8)
+        model = BackgroundDiff(alpha=0.5)
+        assert model.background is None
+
+        background = frames[0].astype(np.float64)
+        for frame in frames:
+            rounded = np.round(background).astype(np.uint8)
+            result = model.on(Image(frame))
+            expected = np.abs(frame.astype(np.int32) - rounded)
+            # float32 accumulation may round differently by one
+            assert np.max(np.abs(result - expected.astype(np.int32))) <= 1
+            background = background * 0.5 + frame * 0.5
+
+        buffer = model._background
+        model.on(Image(frames[0]))
+        assert model._background is buffer
+
+        model.reset()
+        assert np.all(model.on(Image(frames[1])) == 0)
+
 
 class TestCrossCorrelation:
 
@@ -61,6 +137,125 @@ class TestCrossCorrelation:
         op.on(img1, img2)
 
 
+class TestTemplateMatcher:
+
+    @pytest.mark.parametrize(
+        "shape", [(60, 70, 3), (60, 70)], ids=["color", "gray"]
+    )
+    def test_same_as_cv2(self, shape):
+        """Scores should equal to cv2.matchTemplate with TM_CCOEFF_NORMED"""
+        frame = np.random.randint(0, 255, size=shape, dtype=np.uint8)
+        template = Image(frame[10:30, 25:40])
+        matcher = TemplateMatcher(template)
+
+        scores = matcher.scores(Image(frame))
+        planes = [
+            np.asarray(array, dtype=np.float32) for array in (frame, template)
+        ]
+        if len(shape) == 3:
+            planes = [np.sum(plane, axis=2) for plane in planes]
+        expected = cv2.matchTemplate(*planes, cv2.TM_CCOEFF_NORMED)
+        assert scores.shape == expected.shape
+        assert np.allclose(scores, expected, atol=1e-4)
+
+        match = matcher.match(Image(frame))
+        assert (round(match.y), round(match.x)) == (10, 25)
+        assert match.score == pytest.approx(1.0)
+
+    def test_batch(self):
+        """match_batch should equal to match on each frame"""
+        template = Image(np.random.randint(0, 255, (8, 9), dtype=np.uint8))
+        stack = np.random.randint(0, 255, size=(3, 40, 50), dtype=np.uint8)
+        stack[1, 20:28, 5:14] = template
+        frames = [Image(array) for array in stack]
+
+        matches = TemplateMatcher(template).match_batch(stack)
+        assert matches == [TemplateMatcher(template).match(f) for f in frames]
+        assert (round(matches[1].y), round(matches[1].x)) == (20, 5)
+
+        # frames of different shapes
+        frames[2] = Image(np.zeros((30, 30), dtype=np.uint8))
+        matches = TemplateMatcher(template).match_batch(frames)
+        assert matches[2].score == 0
+
+    def test_invalid_frames(self):
+        """Frames must be larger than and of same color as the template"""
+        matcher = TemplateMatcher(Image(np.zeros((10, 10), dtype=np.uint8)))
+        with pytest.raises(ValueError):
+            matcher.match(Image(np.zeros((5, 20), dtype=np.uint8)))
+        with pytest.raises(ValueError):
+            matcher.match(Image(np.zeros((20, 20, 3), dtype=np.uint8)))
+
+
+class TestPyramidMatcher:
+
+    @pytest.mark.parametrize("levels", [0, 2, 3])
+    def test_search(self, levels):
+        """Pyramid search should find the region template cropped from"""
+        frame = Image.from_file(IMAGE_BW)
+        template = Image(frame[100:164, 500:580])
+        matcher = PyramidMatcher(template, levels=levels, top_k=3)
+        assert matcher.levels == levels
+
+        results = matcher.search(frame)
+        assert 0 < len(results) <= 3
+        point, score = results[0]
+        assert point == Point(100, 500)
+        assert score == pytest.approx(1.0)
+        scores = [score for _, score in results]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_small_template(self):
+        """Levels making template smaller than min_size are not used"""
+        template = Image(np.zeros((20, 40), dtype=np.uint8))
+        assert PyramidMatcher(template, levels=5, min_size=5).levels == 2
+
+        with pytest.raises(ValueError):
+            PyramidMatcher(template, top_k=0)
+
+
+class TestOverlap:
+
+    def test_same_as_float_blending(self):
+        """Lookup table should equal to blending gray levels in float"""
+        array1 = np.random.randint(0, 255, size=(30, 40, 3), dtype=np.uint8)
+        array2 = np.random.randint(0, 255, size=(30, 40), dtype=np.uint8)
+        color1, color2 = (200, 30, 0), (120, 10, 255)
+        result = Overlap(color1, color2).on(Image(array1), Image(array2))
+
+        gray1 = cv2.cvtColor(array1, cv2.COLOR_BGR2GRAY)[..., None]
+        expected = (gray1 / 255) * color1 + (array2[..., None] / 255) * color2
+        expected = np.clip(expected, 0, 255).astype(np.uint8)
+        assert np.all(result == expected)
+
+    def test_mask(self):
+        """Mask should equal to weighted sum of image and colored mask"""
+        image = np.random.randint(0, 255, size=(30, 40, 3), dtype=np.uint8)
+        mask = np.random.randint(0, 2, size=(30, 40), dtype=np.uint8) * 255
+        result = Mask(color=(10, 200, 30)).on(Image(image), Image(mask))
+
+        color_mask = np.zeros_like(image)
+        color_mask[mask > 0] = (10, 200, 30)
+        expected = cv2.addWeighted(image, 0.9, color_mask, 0.1, 0)
+        assert np.all(result == expected)
+
+        # input mask is not modified
+        color = Image(cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR))
+        Mask().on(Image(image), color)
+        assert np.all(color == mask[..., None])
+
+
+class TestCrop:
+
+    def test_result_not_view(self):
+        """Cropped Image should not share memory with the input Image"""
+        img = Image(np.random.randint(0, 255, size=(20, 30, 3), dtype=np.uint8))
+        cropped = Crop(Rectangle(2, 3, 12, 23)).on(img)
+        assert cropped.shape == (10, 20, 3)
+        assert np.all(cropped == img[2:12, 3:23])
+        assert not np.shares_memory(cropped, img)
+
+
 @pytest.mark.parametrize(
     "file", [SAMPLE_IMAGES[0], IMAGE_BW], ids=["color", "gray"]
 )
@@ -81,5 +276,488 @@ class TestEdges:
         assert laplace.is_color == img.is_color
 
 
+class TestDraw:
+
+    @pytest.mark.parametrize("line_width", [1, 3, -1])
+    def test_rectangles_same_as_cv2(self, line_width):
+        """draw_rectangles should equal to cv2.rectangle one by one"""
+        rects = [
+            Rectangle(5, 5, 20, 30), Rectangle(-5, 40, 10, 70),
+            Rectangle(30, 10, 45, 25), Rectangle(60, 70, 80, 90),
+            Rectangle(12.4, 20.6, 35, 50)
+        ]
+        img = Image(np.zeros((50, 60, 3), dtype=np.uint8))
+        expected = Image(np.zeros((50, 60, 3), dtype=np.uint8))
+        colors = np.random.randint(0, 255, size=(len(rects), 3))
+        draw_rectangles(img, rects, colors, line_width)
+        for rect, color in zip(rects, colors.tolist()):
+            cv2.rectangle(
+                expected,
+                (int(round(rect.xmin)), int(round(rect.ymin))),
+                (int(round(rect.xmax)), int(round(rect.ymax))),
+                color, line_width
+            )
+        assert np.all(img == expected)
+
+    @pytest.mark.parametrize(
+        "draw", [
+            lambda img: draw_rectangle(img, Rectangle(2, 3, 12, 10), 255, 1),
+            lambda img: draw_rectangles(img, [Rectangle(2, 3, 12, 10)], 255),
+            lambda img: draw_points(img, [Point(2, 3)], 255),
+        ],
+        ids=["rectangle", "rectangles", "points"]
+    )
+    def test_drawing_invalidates_conversions(self, draw):
+        """Cached conversions should be recomputed after drawing"""
+        img = Image(np.zeros((20, 20), dtype=np.uint8)).cache_conversions()
+        before = img.to_color()
+        draw(img)
+        assert img.to_color() is not before
+        assert np.all(img.to_color()[..., 2] == img)
+
+    def test_rectangles_filled_one_color(self):
+        """Filled rectangles of one color should equal to cv2.rectangle"""
+        ymin = np.random.randint(-20, 50, size=200)
+        xmin = np.random.randint(-20, 60, size=200)
+        size = np.random.randint(1, 30, size=(2, 200))
+        rects = RectangleArray(ymin, xmin, ymin + size[0], xmin + size[1])
+        img = Image(np.zeros((50, 60, 3), dtype=np.uint8))
+        expected = Image(np.zeros((50, 60, 3), dtype=np.uint8))
+        draw_rectangles(img, rects, (0, 0, 255), line_width=-1)
+        for rect in rects.to_rectangles():
+            cv2.rectangle(
+                expected, (int(rect.xmin), int(rect.ymin)),
+                (int(rect.xmax), int(rect.ymax)), (0, 0, 255), -1
+            )
+        assert np.all(img == expected)
+
+    def test_rectangles_gray(self):
+        """Gray image accepts int color for rectangles"""
+        img = Image(np.zeros((20, 20), dtype=np.uint8))
+        rects = RectangleArray.from_rectangles([Rectangle(2, 3, 12, 10)])
+        draw_rectangles(img, rects, 255, line_width=-1)
+        expected = np.zeros((20, 20), dtype=np.uint8)
+        expected[2:13, 3:11] = 255
+        assert np.all(img == expected)
+
+        with pytest.raises(ValueError):
+            draw_rectangles(img, rects, (0, 0, 255))
+
+    def test_points(self):
+        """Points outside image are skipped with clip, or raise ValueError"""
+        img = Image(np.zeros((10, 20, 3), dtype=np.uint8))
+        points = [Point(1, 2), Point(9, 19), Point(10, 5), Point(-1, 3)]
+        with pytest.raises(ValueError):
+            draw_points(img, points, (0, 255, 0))
+        assert np.all(img == 0)
+
+        colors = np.array([[1, 1, 1], [2, 2, 2], [3, 3, 3], [4, 4, 4]])
+        draw_points(img, PointArray.from_points(points), colors, clip=True)
+        assert np.all(img[1, 2] == 1) and np.all(img[9, 19] == 2)
+        assert np.count_nonzero(img) == 6
+
+        draw_points(img, np.array([[0, 0], [5, 5]]), (0, 255, 0))
+        assert np.all(img[5, 5] == (0, 255, 0))
+
+    def test_draw_scalar_color(self):
+        """Scalar color should be used for every channel of color image"""
+        img = Image(np.zeros((20, 30, 3), dtype=np.uint8))
+        draw_points(img, [Point(1, 2)], 200)
+        assert np.all(img[1, 2] == 200)
+
+        expected = img.copy()
+        draw_rectangle(expected, Rectangle(3, 4, 10, 12), (50, 50, 50), 1)
+        draw_rectangles(img, [Rectangle(3, 4, 10, 12)], 50)
+        assert np.all(img == expected)
+
+
+class _GrayIdentity(SingularOperation):
+    _color = "gray"
+
+    def _operate(self, img: np.ndarray) -> np.ndarray:
+        return img
+
+
+class _ColorIdentity(SingularOperation):
+    _color = "color"
+
+    def _operate(self, img: np.ndarray) -> np.ndarray:
+        return img
+
+
+class TestChain:
+
+    @staticmethod
+    def _eager(img, stages):
+        for op, other in stages:
+            img = op.on(img) if other is None else op.on(img, other)
+        return img
+
+    @pytest.mark.parametrize(
+        "file", [SAMPLE_IMAGES[0], IMAGE_BW], ids=["color", "gray"]
+    )
+    def test_same_as_eager(self, file):
+        """Chain should give same result and name as operating one by one"""
+        img = Image.from_file(file)
+        ref = Image(np.random.randint(0, 255, size=img.shape, dtype=np.uint8))
+        region = Rectangle(20, 30, 120, 150)
+        stage_lists = [
+            [(Laplacian(), None), (Crop(region), None)],
+            [(Laplacian(5), None), (AbsDiff(), ref), (Crop(region), None)],
+            [(Canny(), None), (Laplacian(), None), (Crop(region), None)],
+            [(Overlap(), ref), (Laplacian(), None), (Crop(region), None)],
+            [
+                (Crop(Rectangle(10, 10, 200, 250)), None),
+                (Laplacian(), None),
+                (Crop(Rectangle(0, 5, 100, 120)), None),
+                (Canny(), None)
+            ],
+            [(Crop(Rectangle(0, 0, img.h, img.w)), None)],
+        ]
+        for stages in stage_lists:
+            chain = Chain()
+            for op, other in stages:
+                chain = chain.then(op, other=other)
+            assert len(chain) == len(stages)
+
+            result = chain.on(img)
+            expected = self._eager(img, stages)
+            assert result.name == expected.name
+            assert result.shape == expected.shape
+            assert np.all(result == expected)
+            assert not np.shares_memory(result, img)
+
+    def test_color_not_restored_from_gray(self):
+        """Gray derived from color should not convert back to the original"""
+        img = Image.from_file(SAMPLE_IMAGES[0])
+        stages = [(_GrayIdentity(), None), (_ColorIdentity(), None)]
+        result = Chain(*[op for op, _ in stages]).on(img)
+        expected = self._eager(img, stages)
+        assert np.all(result == expected)
+        assert np.all(result[..., 0] == result[..., 2])
+
+    def test_crop_moved_to_front(self):
+        """Crop should be computed before operations with finite halo"""
+        chain = Chain(Laplacian(), Crop(Rectangle(20, 30, 60, 90)), Canny())
+        planned = chain._plan((100, 200))
+        assert [type(op) for op, _ in planned] == \
+            [Crop, Laplacian, Crop, Canny]
+        assert (planned[0][0].ymin, planned[0][0].xmax) == (19, 91)
+
+        # Canny depends on whole image, Crop can not move before it
+        chain = Chain(Canny(), Crop(Rectangle(20, 30, 60, 90)))
+        assert [type(op) for op, _ in chain._plan((100, 200))] == [Canny, Crop]
+
+    def test_invalid_stages(self):
+        """Chain should refuse invalid operations or operands"""
+        with pytest.raises(TypeError):
+            Chain(np.abs)
+
+        with pytest.raises(ValueError):
+            Chain().then(AbsDiff())
+
+        with pytest.raises(ValueError):
+            Chain(Crop(Rectangle(0, 0, 500, 500))).on(
+                Image(np.zeros((100, 100), dtype=np.uint8))
+            )
+
+
+class TestBatch:
+
+    @pytest.mark.parametrize(
+        "shape", [(40, 50, 3), (40, 50)], ids=["color", "gray"]
+    )
+    @pytest.mark.parametrize(
+        "op", [Crop(Rectangle(5, 10, 30, 45)), Canny(), Laplacian()],
+        ids=["crop", "canny", "laplacian"]
+    )
+    def test_singular(self, op, shape):
+        """on_batch should equal to .on() for each image"""
+        stack = np.random.randint(0, 255, size=(4,) + shape, dtype=np.uint8)
+        imgs = [
+            Image(array, name="img{}".format(idx))
+            for idx, array in enumerate(stack)
+        ]
+
+        results = op.on_batch(imgs, workers=2)
+        assert len(results) == len(imgs)
+        for result, img in zip(results, imgs):
+            expected = op.on(img)
+            assert result.name == expected.name
+            assert np.all(result == expected)
+
+        results = op.on_batch(stack)
+        for result, img in zip(results, imgs):
+            assert np.all(result == op.on(img))
+            assert not np.shares_memory(result, stack)
+
+    @pytest.mark.parametrize(
+        "op", [AbsDiff(), Overlap(), CrossCorrelate2D()],
+        ids=["absdiff", "overlap", "correlate"]
+    )
+    def test_binary(self, op):
+        """on_batch should equal to .on() for each pair of images"""
+        shape = (4, 30, 20, 3)
+        stack1 = np.random.randint(0, 255, size=shape, dtype=np.uint8)
+        stack2 = np.random.randint(0, 255, size=shape, dtype=np.uint8)
+        imgs1 = [Image(array) for array in stack1]
+        imgs2 = [Image(array) for array in stack2]
+
+        results = op.on_batch(imgs1, imgs2)
+        for result, img1, img2 in zip(results, imgs1, imgs2):
+            expected = op.on(img1, img2)
+            assert result.name == expected.name
+            assert np.all(result == expected)
+
+        results = op.on_batch(stack1, stack2)
+        for result, img1, img2 in zip(results, imgs1, imgs2):
+            assert np.all(result == op.on(img1, img2))
+
+        # single image paired with the whole batch
+        results = op.on_batch(imgs1, imgs2[0])
+        for result, img1 in zip(results, imgs1):
+            assert np.all(result == op.on(img1, imgs2[0]))
+
+    def test_different_shapes(self):
+        """Images of different shapes should be operated one by one"""
+        imgs = [
+            Image(np.random.randint(0, 255, size=(20, 30, 3), dtype=np.uint8)),
+            Image(np.random.randint(0, 255, size=(25, 35), dtype=np.uint8))
+        ]
+        op = Crop(Rectangle(0, 0, 10, 10))
+        results = op.on_batch(imgs)
+        assert [result.shape for result in results] == [(10, 10, 3), (10, 10)]
+
+        with pytest.raises(ValueError):
+            AbsDiff().on_batch(imgs, imgs[:1])
+
+
+class TestOut:
+
+    @pytest.mark.parametrize(
+        "shape", [(40, 50, 3), (40, 50)], ids=["color", "gray"]
+    )
+    @pytest.mark.parametrize(
+        "op", [Crop(Rectangle(5, 10, 30, 45)), Canny(), Laplacian()],
+        ids=["crop", "canny", "laplacian"]
+    )
+    def test_singular(self, op, shape):
+        """.on() with out should equal to .on() and write into out"""
+        img = Image(
+            np.random.randint(0, 255, size=shape, dtype=np.uint8), "img"
+        )
+        expected = op.on(img)
+        out = np.empty_like(expected)
+        for _ in range(2):
+            result = op.on(img, out=out)
+            assert np.shares_memory(result, out)
+            assert result.name == expected.name
+            assert np.all(result == expected)
+
+    @pytest.mark.parametrize(
+        "op", [AbsDiff(), AbsDiff(threshold=30), Overlap(), CrossCorrelate2D()],
+        ids=["absdiff", "threshold", "overlap", "correlate"]
+    )
+    def test_binary(self, op):
+        """.on() with out should equal to .on() and write into out"""
+        shape = (30, 20, 3)
+        img1 = Image(np.random.randint(0, 255, shape, dtype=np.uint8), "a")
+        img2 = Image(np.random.randint(0, 255, shape, dtype=np.uint8), "b")
+        expected = op.on(img1, img2)
+        out = Image(np.empty_like(expected))
+        for _ in range(2):
+            result = op.on(img1, img2, out=out)
+            assert result is out
+            assert result.name == expected.name
+            assert np.all(result == expected)
+
+    def test_invalid_out(self):
+        """out of wrong shape or dtype should raise ValueError"""
+        img = Image(np.zeros((40, 50, 3), dtype=np.uint8))
+        with pytest.raises(ValueError):
+            Canny().on(img, out=np.empty((40, 50, 3), dtype=np.uint8))
+        with pytest.raises(ValueError):
+            Laplacian().on(img, out=np.empty((40, 50, 3), dtype=np.float32))
+        with pytest.raises(ValueError):
+            AbsDiff().on(img, img, out=np.empty((40, 50), dtype=np.uint8))
+
+
+class _CountedLaplacian(Laplacian):
+    """Laplacian counting calls of .on(), in class not to change keys"""
+
+    calls = 0
+
+    def on(self, img, out=None):
+        _CountedLaplacian.calls += 1
+        return super().on(img, out)
+
+
+class TestResultCache:
+
+    def test_hit(self, tmp_path: pathlib.Path):
+        """Same operation on same image should be read from cache"""
+        cache = ResultCache(tmp_path)
+        img = Image(np.random.randint(0, 255, (40, 50, 3), np.uint8), "img")
+        op = _CountedLaplacian()
+        _CountedLaplacian.calls = 0
+
+        expected = op.on(img)
+        first = cache.on(op, img)
+        cached = cache.on(op, img)
+        assert _CountedLaplacian.calls == 2
+        assert np.all(first == expected) and np.all(cached == expected)
+        assert cached.name == expected.name
+        assert cache.nbytes > expected.nbytes
+
+        # results are copy-on-write
+        cached[...] = 0
+        assert np.all(cache.on(op, img) == expected)
+
+        # new cache of the same directory reads results stored before
+        assert np.all(ResultCache(tmp_path).on(op, img) == expected)
+        assert _CountedLaplacian.calls == 2
+
+    def test_keys(self, tmp_path: pathlib.Path):
+        """Keys should depend on image content, operation and parameters"""
+        cache = ResultCache(tmp_path)
+        img1 = Image(np.zeros((20, 30), np.uint8), "a")
+        img2 = Image(np.zeros((20, 30), np.uint8), "b")
+        key = cache.key(Canny(), img1)
+
+        assert cache.key(Canny(), img2) == key
+        assert cache.key(Canny(threshold1=20), img1) != key
+        assert cache.key(Laplacian(), img1) != key
+        assert cache.key(Canny(), img1.T) != key
+        img2[0, 0] = 1
+        assert cache.key(Canny(), img2) != key
+
+        assert cache.key(MorphChanVese(num_iter=3), img1) != \
+            cache.key(MorphChanVese(num_iter=4), img1)
+        assert cache.key(AbsDiff(), img1, img2) != \
+            cache.key(AbsDiff(), img2, img1)
+
+        with pytest.raises(TypeError):
+            cache.key(MorphChanVese(iter_callback=print), img1)
+
+    def test_non_operation_result(self, tmp_path: pathlib.Path):
+        """Results of _FromSK and BinaryOperation should be cached as well"""
+        cache = ResultCache(tmp_path)
+        img1 = Image(np.random.randint(0, 255, (30, 40), np.uint8), "a")
+        img2 = Image(np.random.randint(0, 255, (30, 40), np.uint8), "b")
+
+        op = MorphChanVese(num_iter=2)
+        expected = op.on(img1)
+        cache.on(op, img1)
+        cached = cache.on(op, img1)
+        assert not isinstance(cached, Image)
+        assert np.all(cached == expected)
+
+        expected = AbsDiff().on(img1, img2)
+        cache.on(AbsDiff(), img1, img2)
+        cached = cache.on(AbsDiff(), img1, img2)
+        assert cached.name == expected.name
+        assert np.all(cached == expected)
+
+    def test_eviction(self, tmp_path: pathlib.Path):
+        """Least recently used results should be removed over max_bytes"""
+        imgs = [Image(np.full((100, 100), idx, np.uint8)) for idx in range(3)]
+        op = _CountedLaplacian()
+        _CountedLaplacian.calls = 0
+        # room for two results of 10000 bytes with .npy headers
+        cache = ResultCache(tmp_path, max_bytes=25000)
+
+        cache.on(op, imgs[0])
+        cache.on(op, imgs[1])
+        cache.on(op, imgs[0])
+        cache.on(op, imgs[2])
+        assert _CountedLaplacian.calls == 3
+        assert len(list(tmp_path.glob("*.npy"))) == 2
+        assert cache.nbytes <= 25000
+
+        cache.on(op, imgs[0])
+        assert _CountedLaplacian.calls == 3
+        cache.on(op, imgs[1])
+        assert _CountedLaplacian.calls == 4
+
+        cache.clear()
+        assert cache.nbytes == 0
+        assert list(tmp_path.iterdir()) == []
+
+
+def _sleep_pid(img: np.ndarray) -> int:
+    """Sleep for img[0, 0] / 10 seconds, return pid of the worker"""
+    time.sleep(img[0, 0] / 10)
+    return os.getpid()
+
+
+class _SleepPid(_FromSK):
+    op_func = staticmethod(_sleep_pid)
+
+
+class TestProcessRunner:
+
+    def test_map(self):
+        """ProcessRunner.map should return results of .on() in order"""
+        imgs = [
+            Image.from_file(SAMPLE_IMAGES[0]).resize((60, 80)),
+            Image.from_file(IMAGE_BW).resize((50, 40)),
+            Image(np.random.randint(0, 255, size=(30, 30), dtype=np.uint8))
+        ]
+        op = MorphChanVese(num_iter=5, smoothing=0)
+        with ProcessRunner(op, workers=2) as runner:
+            results = runner.map(imgs)
+
+        assert len(results) == len(imgs)
+        for result, img in zip(results, imgs):
+            assert np.all(result == op.on(img))
+
+    def test_timeout_and_cancel(self):
+        """Slow images should time out, and pending ones can be cancelled"""
+        img = Image(np.random.randint(0, 255, size=(300, 300), dtype=np.uint8))
+        op = ChanVese(max_num_iter=100000, tol=0)
+
+        with ProcessRunner(op, workers=1, timeout=0.5) as runner:
+            future = runner.submit([img])[0]
+            with pytest.raises(TimeoutError):
+                future.result()
+
+        runner = ProcessRunner(op, workers=1)
+        futures = runner.submit([img, img])
+        runner.close(cancel=True)
+        for future in futures:
+            with pytest.raises(CancelledError):
+                future.result()
+
+    def test_reuse_workers(self):
+        """Workers should be kept for next images, and replaced if killed"""
+        fast = Image(np.zeros((10, 10), dtype=np.uint8))
+        with ProcessRunner(_SleepPid(), workers=2) as runner:
+            pids = runner.map([fast] * 8)
+        assert len(set(pids)) <= 2 and os.getpid() not in pids
+
+        slow = Image(np.full((10, 10), 50, dtype=np.uint8))
+        with ProcessRunner(_SleepPid(), workers=1, timeout=0.5) as runner:
+            futures = runner.submit([slow, fast, fast])
+            with pytest.raises(TimeoutError):
+                futures[0].result()
+            assert futures[1].result() == futures[2].result()
+
+    def test_close_twice(self):
+        """Closing a closed ProcessRunner should do nothing"""
+        op = MorphChanVese(num_iter=1)
+        with ProcessRunner(op, workers=1) as runner:
+            runner.map([Image(np.zeros((10, 10), dtype=np.uint8))])
+            runner.close()
+        runner.close(cancel=True)
+
+        with pytest.raises(RuntimeError):
+            runner.submit([Image(np.zeros((10, 10), dtype=np.uint8))])
+
+    def test_invalid_operation(self):
+        """ProcessRunner only runs scikit-image operations"""
+        with pytest.raises(TypeError):
+            ProcessRunner(Canny())
+
+
 if __name__ == "__main__":
     pytest.main(["-s", "-v", __file__])
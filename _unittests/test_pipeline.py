@@ -0,0 +1,93 @@
+import pathlib
+import time
+
+import numpy as np
+import pytest
+
+from IMGBOX.core import Image
+from IMGBOX.pipeline import Pipeline
+from IMGBOX.shapes import Rectangle
+from IMGBOX.Operations.difference import AbsDiff
+from IMGBOX.Operations.draw import draw_rectangle
+from IMGBOX.Operations.edges import Laplacian
+
+
+def _images(count: int, pulled: list = None):
+    """Generate random images named by index, recording pulled indices"""
+    for idx in range(count):
+        if pulled is not None:
+            pulled.append(idx)
+        array = np.random.randint(0, 255, (30, 40, 3), dtype=np.uint8)
+        yield Image(array, name="{:02d}".format(idx))
+
+
+def _sleep_then_name(img: Image) -> str:
+    """Slow down images of even index, to complete out of order"""
+    if int(img.name) % 2 == 0:
+        time.sleep(0.02)
+    return img.name
+
+
+class TestPipeline:
+
+    def test_stages(self, tmp_path: pathlib.Path):
+        """Results should equal to operating one by one, in order"""
+        imgs = list(_images(10))
+        background = Image(np.zeros((30, 40, 3), dtype=np.uint8))
+        region = Rectangle(5, 5, 20, 30)
+
+        results = list(
+            Pipeline(imgs)
+            .map(Laplacian(), workers=3)
+            .map(AbsDiff(), background, workers=2)
+            .apply(draw_rectangle, region, (0, 0, 255), 1)
+            .save(str(tmp_path.joinpath("{name}.png")), workers=2)
+        )
+
+        assert len(results) == len(imgs)
+        for img, result in zip(imgs, results):
+            expected = AbsDiff().on(Laplacian().on(img), background)
+            draw_rectangle(expected, region, (0, 0, 255), 1)
+            assert np.all(result == expected)
+            saved = Image.from_file(str(tmp_path.joinpath(result.name + ".png")))
+            assert np.all(saved == expected)
+
+    def test_unordered(self):
+        """Unordered pipeline should yield all results as they are done"""
+        names = list(Pipeline(_images(8), ordered=False).map(
+            _sleep_then_name, workers=8
+        ))
+        assert sorted(names) == ["{:02d}".format(idx) for idx in range(8)]
+        assert names != sorted(names)
+
+        names = list(Pipeline(_images(8)).map(_sleep_then_name, workers=8))
+        assert names == sorted(names)
+
+    def test_bounded(self):
+        """Stages should pull at most queue items ahead of consumer"""
+        pulled = []
+        pipeline = Pipeline(_images(100, pulled))
+        pipeline.map(Laplacian(), workers=2, queue=3)
+        pipeline.map(lambda img: img, workers=1, queue=2)
+
+        results = iter(pipeline)
+        next(results)
+        time.sleep(0.05)
+        # one consumed, plus pending items of each stage
+        assert len(pulled) <= 1 + 3 + 2
+        assert 1 + len(list(results)) == 100
+        assert len(pulled) == 100
+
+    def test_error(self):
+        """Errors of stages should be raised to the consumer"""
+        def fail(img):
+            if img.name == "03":
+                raise RuntimeError("failed on " + img.name)
+            return img
+
+        with pytest.raises(RuntimeError):
+            Pipeline(_images(10)).map(fail, workers=2).run()
+
+        for kwargs in [{"workers": 0}, {"workers": -1}, {"queue": 0}]:
+            with pytest.raises(ValueError):
+                Pipeline(_images(10)).map(fail, **kwargs)
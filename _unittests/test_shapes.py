@@ -2,7 +2,7 @@ import pytest
 import numpy as np
 
 from IMGBOX.core import Image
-from IMGBOX.shapes import Rectangle, Point
+from IMGBOX.shapes import Rectangle, Point, RectangleArray, PointArray
 
 
 class TestPoint:
@@ -148,5 +148,105 @@ class TestRectangle:
         assert not Rectangle.overlap(rect3, rect1)
 
 
+class TestPointArray:
+
+    def test_construct(self):
+        """PointArray should convert from and to Point objects"""
+        points = [Point(y=8, x=5), Point(y=-1, x=3), Point(y=0, x=0)]
+        array = PointArray.from_points(points)
+        assert len(array) == 3
+        assert array.to_points() == points
+        assert array[1] == Point(y=-1, x=3)
+        assert array[1:].to_points() == points[1:]
+        assert np.all(PointArray.from_array(array.array).y == [8, -1, 0])
+
+        with pytest.raises(ValueError):
+            PointArray.from_array(np.zeros((3, 3)))
+
+    def test_inside_image(self):
+        """PointArray.inside should equal to Point.inside of each"""
+        sample_img = Image(np.zeros((100, 200, 3), dtype=np.uint8))
+        points = [
+            Point(y=0, x=0), Point(y=99, x=199), Point(y=-1, x=50),
+            Point(y=100, x=50), Point(y=50, x=-1), Point(y=50, x=200)
+        ]
+        mask = PointArray.from_points(points).inside(sample_img)
+        assert list(mask) == [pt.inside(sample_img) for pt in points]
+
+
+class TestRectangleArray:
+
+    @staticmethod
+    def _random_rectangles(n: int) -> RectangleArray:
+        ymin = np.random.uniform(-50, 500, size=n)
+        xmin = np.round(np.random.uniform(-50, 500, size=n))
+        height = np.random.uniform(1, 60, size=n)
+        width = np.round(np.random.uniform(1, 60, size=n))
+        return RectangleArray(ymin, xmin, ymin + height, xmin + width)
+
+    def test_construct(self):
+        """RectangleArray should convert from and to Rectangle objects"""
+        rects = [Rectangle(1, 2, 3, 4), Rectangle(-10, -20, 10, 60)]
+        array = RectangleArray.from_rectangles(rects)
+        assert len(array) == 2
+        assert array.to_rectangles() == rects
+        assert array[0] == rects[0]
+        assert np.all(array.area == [rect.area for rect in rects])
+
+        with pytest.raises(ValueError):
+            RectangleArray([300, 100], [100, 100], [500, 50], [500, 200])
+
+    def test_overlap_and_iou(self):
+        """Overlap matrix should equal to Rectangle.overlap of each pair"""
+        rects = self._random_rectangles(50)
+        others = self._random_rectangles(30)
+        overlap = rects.overlap(others)
+        iou = rects.iou(others)
+        assert overlap.shape == iou.shape == (50, 30)
+        for i, rect1 in enumerate(rects):
+            for j, rect2 in enumerate(others):
+                assert overlap[i, j] == Rectangle.overlap(rect1, rect2)
+        assert np.all((iou > 0) == overlap)
+        assert np.allclose(np.diag(rects.iou(rects)), 1)
+
+        # rectangles with only same boarder are not considered overlapped
+        assert not rects.overlap(Rectangle(-100, -100, -50, -50)).any()
+
+    def test_overlapping_pairs(self):
+        """Sweep should find same pairs as the full overlap matrix"""
+        rects = self._random_rectangles(300)
+        expected = np.argwhere(np.triu(rects.overlap(rects), k=1))
+        assert np.array_equal(rects.overlapping_pairs(), expected)
+
+        others = self._random_rectangles(100)
+        expected = np.argwhere(rects.overlap(others))
+        assert np.array_equal(rects.overlapping_pairs(others), expected)
+
+    def test_overlapping_pairs_mixed_sizes(self):
+        """Few large rectangles among many small should find same pairs"""
+        small = self._random_rectangles(500)
+        ymin = np.random.uniform(-50, 500, size=8)
+        xmin = np.random.uniform(-50, 500, size=8)
+        size = np.random.uniform(100, 600, size=8)
+        large = RectangleArray(ymin, xmin, ymin + size, xmin + size)
+        rects = RectangleArray.from_array(
+            np.concatenate([small.array, large.array])
+        )
+        expected = np.argwhere(np.triu(rects.overlap(rects), k=1))
+        assert np.array_equal(rects.overlapping_pairs(), expected)
+
+        expected = np.argwhere(small.overlap(large))
+        assert np.array_equal(small.overlapping_pairs(large), expected)
+
+    def test_inside_image(self):
+        """Rectangles should lie entirely inside image"""
+        sample_img = Image(np.zeros((100, 200), dtype=np.uint8))
+        rects = RectangleArray.from_rectangles([
+            Rectangle(0, 0, 100, 200), Rectangle(-1, 0, 10, 10),
+            Rectangle(50, 150, 100, 201)
+        ])
+        assert list(rects.inside(sample_img)) == [True, False, False]
+
+
 if __name__ == "__main__":
     pytest.main(["-s", "-v", __file__])
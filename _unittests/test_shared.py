@@ -0,0 +1,67 @@
+import pickle
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+from IMGBOX.core import Image
+from IMGBOX.shared import SharedImage
+
+from IMGBOX._unittests.configs import SAMPLE_IMAGES, IMAGE_BW
+
+
+def _invert_in_worker(shared: SharedImage) -> str:
+    """Invert shared image in place, return name seen by the worker"""
+    with shared:
+        img = shared.image
+        np.subtract(255, img, out=img)
+        name = img.name
+        del img
+    return name
+
+
+@pytest.mark.parametrize(
+    "file", [SAMPLE_IMAGES[0], IMAGE_BW], ids=["color", "gray"]
+)
+class TestSharedImage:
+
+    def test_from_image(self, file):
+        """SharedImage should view the same pixels and name as Image"""
+        img = Image.from_file(file)
+        with SharedImage.from_image(img) as shared:
+            view = shared.image
+            assert view.name == img.name
+            assert np.all(view == img)
+            assert not np.shares_memory(view, img)
+
+            # handles attach to the same memory, without copying pixels
+            attached = pickle.loads(pickle.dumps(shared))
+            assert len(pickle.dumps(shared)) < 1000
+            assert attached.handle == shared.handle and not attached.owner
+            attached.image[0, 0] = 7
+            assert np.all(view[0, 0] == 7)
+            attached.close()
+            del view
+
+        with pytest.raises(ValueError):
+            shared.image
+        with pytest.raises(FileNotFoundError):
+            SharedImage.attach(shared.handle, shared.shape, shared.name)
+
+    @pytest.mark.parametrize("method", ["fork", "spawn"])
+    def test_worker_process(self, file, method):
+        """Writes of worker process should be seen by the owner"""
+        img = Image.from_file(file)
+        ctx = mp.get_context(method)
+        with SharedImage.from_image(img) as shared:
+            with ctx.Pool(1) as pool:
+                name = pool.apply(_invert_in_worker, (shared,))
+            assert name == img.name
+            assert np.all(shared.image == 255 - img)
+
+
+def test_create_invalid_shape():
+    """Shape of images not supported by Image should raise ValueError"""
+    for shape in [(10, 10, 4), (10,), (0, 10)]:
+        with pytest.raises(ValueError):
+            SharedImage.create(shape)
@@ -0,0 +1,81 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+from IMGBOX.core import Image
+from IMGBOX.shapes import Rectangle
+from IMGBOX.tiled import TiledImage
+from IMGBOX.Operations.edges import Canny, Laplacian
+from IMGBOX.Operations.crop import Crop
+
+from IMGBOX._unittests.configs import SAMPLE_IMAGES, IMAGE_BW
+
+
+@pytest.mark.parametrize(
+    "file", [SAMPLE_IMAGES[0], IMAGE_BW], ids=["color", "gray"]
+)
+class TestTiledImage:
+
+    def test_from_image(self, file, tmp_path: pathlib.Path):
+        """TiledImage should store the same pixels as Image"""
+        img = Image.from_file(file)
+        tiled = TiledImage.from_image(img, tmp_path.joinpath("img.npy"))
+        assert (tiled.h, tiled.w, tiled.c) == (img.h, img.w, img.c)
+        assert tiled.name == img.name
+
+        opened = TiledImage.open(tmp_path.joinpath("img.npy"))
+        assert np.all(opened.to_image() == img)
+        region = Rectangle(10, 20, 50, 70)
+        assert np.all(opened.read(region) == img[10:50, 20:70])
+
+        with pytest.raises(ValueError):
+            opened.read(Rectangle(0, 0, img.h + 1, 10))
+
+    def test_tiles(self, file, tmp_path: pathlib.Path):
+        """Tiles should cover the whole image without overlapping"""
+        img = Image.from_file(file)
+        tiled = TiledImage.from_image(
+            img, tmp_path.joinpath("img.npy"), tile_shape=(64, 100)
+        )
+        covered = np.zeros(img.shape[:2], dtype=np.int32)
+        for tile in tiled.tiles():
+            covered[int(tile.ymin):int(tile.ymax),
+                    int(tile.xmin):int(tile.xmax)] += 1
+        assert np.all(covered == 1)
+
+    def test_apply(self, file, tmp_path: pathlib.Path):
+        """Operating tile by tile should equal to operating on whole image"""
+        img = Image.from_file(file)
+        tiled = TiledImage.from_image(
+            img, tmp_path.joinpath("img.npy"), tile_shape=(64, 100)
+        )
+
+        op = Laplacian(5)
+        result = tiled.apply(op, tmp_path.joinpath("out.npy"), workers=4)
+        expected = op.on(img)
+        assert result.name == expected.name
+        assert np.all(result.to_image() == expected)
+        assert np.all(TiledImage.open(tmp_path.joinpath("out.npy")).to_image()
+                      == expected)
+
+        # Canny changes color image to gray
+        result = tiled.apply(Canny(), tmp_path.joinpath("out.npy"), halo=8)
+        assert result.shape == img.shape[:2]
+
+    def test_apply_invalid(self, file, tmp_path: pathlib.Path):
+        """Operations need halo and must keep shape of tiles"""
+        tiled = TiledImage.from_image(
+            Image.from_file(file), tmp_path.joinpath("img.npy")
+        )
+        out = tmp_path.joinpath("out.npy")
+        with pytest.raises(ValueError):
+            tiled.apply(Canny(), out)
+        with pytest.raises(ValueError):
+            tiled.apply(Crop(Rectangle(0, 0, 10, 10)), out, halo=0)
+        with pytest.raises(ValueError):
+            tiled.apply(Laplacian(), out, workers=0)
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", "-v", __file__])
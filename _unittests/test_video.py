@@ -0,0 +1,98 @@
+import pathlib
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from IMGBOX.core import Image
+from IMGBOX.video import FrameSource
+
+from IMGBOX._unittests.configs import SAMPLE_IMAGES
+
+
+FRAMES = 20
+
+
+@pytest.fixture
+def video(tmp_path: pathlib.Path) -> str:
+    """A video of FRAMES frames, frame i is filled by value 10 * i"""
+    file = str(tmp_path.joinpath("record.avi"))
+    writer = cv2.VideoWriter(file, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for idx in range(FRAMES):
+        writer.write(np.full((48, 64, 3), 10 * idx, dtype=np.uint8))
+    writer.release()
+    return file
+
+
+def _values(frames) -> list:
+    """Frame values of the video fixture, undo lossy compression"""
+    return [int(round(np.asarray(frame).mean() / 10)) for frame in frames]
+
+
+class TestFrameSource:
+
+    def test_video(self, video):
+        """Frames should be yielded in order as Image objects"""
+        with FrameSource(video, buffer=4) as source:
+            assert len(source) == FRAMES
+            assert source.fps == 10
+            frames = list(source)
+
+        assert _values(frames) == list(range(FRAMES))
+        assert all(isinstance(frame, Image) for frame in frames)
+        assert frames[3].name == "record_000003"
+        assert frames[3].shape == (48, 64, 3)
+
+    def test_stride_and_seek(self, video):
+        """Stride should skip frames, and seek should restart from index"""
+        with FrameSource(video, stride=3, start=1, buffer=2) as source:
+            assert _values([next(source), next(source)]) == [1, 4]
+            source.seek(10)
+            assert _values(source) == [10, 13, 16, 19]
+
+            source.seek(0)
+            assert _values([next(source)]) == [0]
+
+            with pytest.raises(ValueError):
+                source.seek(FRAMES)
+
+    def test_drop(self, video):
+        """With drop, only latest frames are kept for slow consumer"""
+        with FrameSource(video, buffer=3, drop=True) as source:
+            first = next(source)
+            time.sleep(0.5)  # decoder runs to the end meanwhile
+            frames = [first] + list(source)
+
+        # frame 0 may be dropped before the first next() takes it
+        values = _values(frames)
+        assert values[-3:] == list(range(FRAMES - 3, FRAMES))
+        assert values == sorted(values)
+        assert len(values) == 4 and source.dropped == FRAMES - 4
+
+    def test_sequence(self, tmp_path: pathlib.Path):
+        """Image sequence should be read from directory in order"""
+        img = Image.from_file(SAMPLE_IMAGES[0])
+        for idx in range(5):
+            img.save(str(tmp_path.joinpath("{:02d}.png".format(idx))))
+        tmp_path.joinpath("02.png").write_bytes(b"corrupted")
+
+        with pytest.warns(UserWarning):
+            with FrameSource(tmp_path, stride=2) as source:
+                assert len(source) == 5
+                frames = list(source)
+        assert [frame.name for frame in frames] == ["00", "04"]
+        assert all(np.all(frame == img) for frame in frames)
+
+        source = FrameSource(str(tmp_path.joinpath("*.png")))
+        source.seek(3)
+        assert [frame.name for frame in source] == ["03", "04"]
+
+    def test_invalid(self, tmp_path: pathlib.Path):
+        """Unreadable video and invalid options should raise ValueError"""
+        file = tmp_path.joinpath("broken.avi")
+        file.write_bytes(b"not a video")
+        with pytest.raises(ValueError):
+            FrameSource(str(file))
+        with pytest.raises(ValueError):
+            FrameSource(tmp_path, stride=0)
@@ -0,0 +1,147 @@
+import os
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ["configure_async"]
+
+
+class _Budget:
+    """Bytes of images in flight, waited by coroutines of any event loop"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._lock = threading.Lock()
+        # entries of [loop, future, nbytes, granted], in order of waiting
+        self._waiters = deque()
+
+    async def acquire(self, nbytes: int) -> int:
+        """Wait until nbytes fit in budget, return bytes to be released
+
+        An item larger than the whole budget waits until nothing else
+        is in flight, instead of waiting forever,
+        even if the budget is lowered while waiting.
+        """
+        nbytes = min(nbytes, self.max_bytes)
+        with self._lock:
+            if not self._waiters and self.used + nbytes <= self.max_bytes:
+                self.used += nbytes
+                return nbytes
+            loop = asyncio.get_running_loop()
+            entry = [loop, loop.create_future(), nbytes, False]
+            self._waiters.append(entry)
+
+        try:
+            await entry[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = entry[3]
+                if not granted:
+                    self._waiters.remove(entry)
+            if granted:
+                self.release(entry[2])
+            else:
+                self._grant()
+            raise
+        # may be clamped again by a lowered budget
+        return entry[2]
+
+    def release(self, nbytes: int):
+        with self._lock:
+            self.used -= nbytes
+        self._grant()
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+        self._grant()
+
+    def _grant(self):
+        """Wake up waiters in order while they fit in budget"""
+        granted = []
+        with self._lock:
+            while self._waiters:
+                entry = self._waiters[0]
+                entry[2] = min(entry[2], self.max_bytes)
+                if self.used + entry[2] > self.max_bytes:
+                    break
+                self._waiters.popleft()
+                entry[3] = True
+                self.used += entry[2]
+                granted.append(entry)
+
+        for loop, future, nbytes, _ in granted:
+            try:
+                loop.call_soon_threadsafe(_set_granted, future)
+            except RuntimeError:  # loop closed
+                self.release(nbytes)
+
+
+def _set_granted(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Offloader:
+    """Shared executor running blocking calls of async API"""
+
+    def __init__(self, workers: int = None, max_bytes: int = 2**30):
+        self.workers = workers
+        self.budget = _Budget(max_bytes)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers or (os.cpu_count() or 1),
+                    thread_name_prefix="IMGBOX-async"
+                )
+            return self._executor
+
+    def configure(self, workers: int = None, max_bytes: int = None):
+        if workers is not None:
+            with self._lock:
+                old, self._executor = self._executor, None
+                self.workers = workers
+            if old is not None:
+                old.shutdown(wait=False)
+        if max_bytes is not None:
+            self.budget.resize(max_bytes)
+
+    async def run(self, nbytes: int, func, *args):
+        """Run func(*args) on the executor once nbytes fit in budget
+
+        Cancelling it cancels func if not started yet,
+        and its bytes are released only after func stops.
+        """
+        granted = await self.budget.acquire(nbytes)
+        try:
+            future = self.executor().submit(func, *args)
+        except BaseException:
+            self.budget.release(granted)
+            raise
+        future.add_done_callback(lambda _: self.budget.release(granted))
+        return await asyncio.wrap_future(future)
+
+
+_offloader = _Offloader()
+
+
+def configure_async(workers: int = None, max_bytes: int = None):
+    """Configure the executor shared by async API, e.g. Image.afrom_file
+
+    Args:
+        workers (int): number of threads, default to cpu count.
+            Calls already submitted finish on the previous executor.
+        max_bytes (int): cap of bytes of images in flight, 1 GB by default.
+            Calls wait until their images fit, in order of calling.
+    """
+    if workers is not None and workers <= 0:
+        raise ValueError("workers must > 0, got {}".format(workers))
+    if max_bytes is not None and max_bytes <= 0:
+        raise ValueError("max_bytes must > 0, got {}".format(max_bytes))
+    _offloader.configure(workers, max_bytes)
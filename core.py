@@ -1,35 +1,436 @@
 import os
+import mmap
+import glob
+import uuid
+import struct
 import pathlib
 import operator
+import warnings
+import threading
+import weakref
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import partial
-from typing import Tuple
+from typing import Tuple, List, Iterable, Iterator, Union
 from numbers import Number
 
 import cv2
 import numpy as np
 
 from IMGBOX.shapes import Rectangle
+from IMGBOX.aio import _offloader
 
-__all__ = ["Image"]
+__all__ = ["Image", "ImageInfo", "ImageWriter"]
 
 
-def _safe_imread(file: str) -> np.ndarray:
-    """Read an image file and detect corropyt"""
+def _safe_imread(file: str, flags: int = cv2.IMREAD_UNCHANGED) -> np.ndarray:
+    """Read an image file and detect corropyt
+
+    The file is memory-mapped and decoded in place,
+    so the compressed content is never copied into a Python bytes object.
+    """
+    array = None
     with open(file, "rb") as f:
-        content = f.read()
-        array = np.frombuffer(content, np.uint8)
-        array = cv2.imdecode(array, cv2.IMREAD_UNCHANGED)
-        if array is None:
-            msg = "Decode image {} failed"
-            raise ValueError(msg.format(file))
-        return array
+        if os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                content = np.frombuffer(buffer, np.uint8)
+                array = cv2.imdecode(content, flags)
+                del content  # release the export before closing the mmap
+
+    if array is None:
+        msg = "Decode image {} failed"
+        raise ValueError(msg.format(file))
+    return array
+
+
+class ImageInfo(namedtuple(
+        "ImageInfo", ["h", "w", "c", "format", "depth"], defaults=(8,))):
+    """Image shape and format read from file header
+
+    c is the channels decoded with cv2.IMREAD_UNCHANGED like Image.c,
+    i.e. 0 for gray image and 4 for image with alpha channel,
+    format is one of "jpeg", "png", "bmp",
+    and depth is bits of each channel decoded, 8 or 16.
+    """
+
+
+def _read_exact(f, size: int) -> bytes:
+    content = f.read(size)
+    if len(content) != size:
+        raise ValueError("Unexpected end of header")
+    return content
+
+
+def _read_jpeg_header(f) -> ImageInfo:
+    """Read shape from SOF marker, f is positioned after SOI marker"""
+    while True:
+        marker = _read_exact(f, 2)
+        if marker[0] != 0xFF:
+            raise ValueError("Invalid JPEG marker {}".format(marker))
+
+        code = marker[1]
+        if 0xD0 <= code <= 0xD7 or code in (0x01, 0xFF):
+            continue  # markers without payload
+        elif code in (0xD8, 0xD9, 0xDA):
+            raise ValueError("No SOF marker before image data")
+
+        length = struct.unpack(">H", _read_exact(f, 2))[0]
+        if length < 2:
+            raise ValueError("Invalid JPEG segment length {}".format(length))
+
+        # SOF0 ~ SOF15, except DHT(C4), JPG(C8) and DAC(CC)
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            _, h, w, components = struct.unpack(">BHHB", _read_exact(f, 6))
+            if components not in (1, 3, 4):
+                msg = "Invalid number of JPEG components {}"
+                raise ValueError(msg.format(components))
+            return ImageInfo(h, w, 0 if components == 1 else 3, "jpeg")
+
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _read_png_header(f) -> ImageInfo:
+    """Read shape from IHDR chunk, f is positioned after PNG signature"""
+    length, chunk = struct.unpack(">I4s", _read_exact(f, 8))
+    if chunk != b"IHDR" or length != 13:
+        raise ValueError("First PNG chunk must be IHDR, got {}".format(chunk))
+
+    w, h, bit_depth, color_type = struct.unpack(">IIBB", _read_exact(f, 10))
+    if color_type not in (0, 2, 3, 4, 6):
+        raise ValueError("Invalid PNG color type {}".format(color_type))
+    # bit depth of 1, 2, 4 are decoded as 8
+    depth = 16 if bit_depth == 16 else 8
+
+    if color_type == 0:
+        c = 0
+    elif color_type in (4, 6):
+        c = 4
+    else:
+        # RGB or palette image with tRNS chunk are decoded with alpha
+        c = 3
+        f.seek(length - 10 + 4, os.SEEK_CUR)  # rest of IHDR and its CRC
+        while True:
+            header = f.read(8)
+            if len(header) != 8:
+                break
+            length, chunk = struct.unpack(">I4s", header)
+            if chunk == b"tRNS":
+                c = 4
+            if chunk in (b"tRNS", b"IDAT", b"IEND"):
+                break
+            f.seek(length + 4, os.SEEK_CUR)
+    return ImageInfo(h, w, c, "png", depth)
+
+
+def _read_bmp_header(f) -> ImageInfo:
+    """Read shape from DIB header, f is positioned after 'BM'"""
+    f.seek(12, os.SEEK_CUR)  # file size, reserved and pixel offset
+    dib_size = struct.unpack("<I", _read_exact(f, 4))[0]
+    if dib_size == 12:
+        w, h, _, bits = struct.unpack("<HHHH", _read_exact(f, 8))
+        palette_size, entry_size = 0, 3
+    elif dib_size >= 40:
+        w, h, _, bits, _, _, _, _, palette_size = \
+            struct.unpack("<iiHHIIiiI", _read_exact(f, 32))
+        f.seek(dib_size - 36, os.SEEK_CUR)
+        entry_size = 4
+    else:
+        raise ValueError("Invalid BMP header size {}".format(dib_size))
+
+    if bits not in (1, 4, 8, 16, 24, 32):
+        raise ValueError("Invalid BMP bit count {}".format(bits))
+
+    c = 4 if bits == 32 else 3
+    if bits <= 8:
+        # palette image is decoded as gray if all entries are gray
+        palette_size = palette_size if palette_size else 2 ** bits
+        palette = _read_exact(f, palette_size * entry_size)
+        palette = np.frombuffer(palette, np.uint8)
+        palette = palette.reshape(palette_size, entry_size)[:, :3]
+        if np.all(palette == palette[:, :1]):
+            c = 0
+    return ImageInfo(abs(h), abs(w), c, "bmp")
+
+
+_HEADER_READERS = [
+    (b"\xff\xd8", _read_jpeg_header),
+    (b"\x89PNG\r\n\x1a\n", _read_png_header),
+    (b"BM", _read_bmp_header),
+]
+
+
+def _read_header(file: str) -> ImageInfo:
+    """Read ImageInfo from file header, None if the format is unsupported"""
+    with open(file, "rb") as f:
+        magic = f.read(8)
+        for signature, reader in _HEADER_READERS:
+            if magic.startswith(signature):
+                f.seek(len(signature))
+                try:
+                    info = reader(f)
+                except (ValueError, struct.error) as err:
+                    msg = "Decode image {} failed: {}"
+                    raise ValueError(msg.format(file, err))
+
+                if info.h <= 0 or info.w <= 0:
+                    msg = "Decode image {} failed: invalid shape {}"
+                    raise ValueError(msg.format(file, (info.h, info.w)))
+                return info
+    return None
+
+
+_REDUCED_FLAGS = {
+    (0, 8): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    (0, 4): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (0, 2): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (3, 8): cv2.IMREAD_REDUCED_COLOR_8,
+    (3, 4): cv2.IMREAD_REDUCED_COLOR_4,
+    (3, 2): cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+
+def _reduced_decode_flags(
+        channels: int, shape: Tuple[int, int], target: Tuple[int, int]
+        ) -> int:
+    """Find the cheapest decode flags that still decode at least target shape
+
+    JPEG decoded with IMREAD_REDUCED_*_N has shape of ceil(shape / N).
+    """
+    for factor in (8, 4, 2):
+        flags = _REDUCED_FLAGS.get((channels, factor))
+        reduced = [-(-dim // factor) for dim in shape]
+        if flags is not None and \
+                reduced[0] >= target[0] and reduced[1] >= target[1]:
+            return flags | cv2.IMREAD_IGNORE_ORIENTATION
+    return cv2.IMREAD_UNCHANGED
+
+
+def _get_keep_aspect_ratio_shape(
+        target_shape: tuple, dst_shape: tuple
+        ) -> Tuple[int, int]:
+    """Get the resize shape that fits into dst_shape with the
+       aspect ratio (almost) unchanged.
+
+    Args:
+        target_shape: the shape of (h, w) to be resized
+        dst_shape: the shape of (h, w) for target_shape to fits into
+
+    Return
+        tuple of (h, w), the new shape for target shape to resize
+    """
+    msg = "Shape must be tuple of (height, width)"
+    assert len(target_shape) == len(dst_shape) == 2, msg
+
+    target_h, target_w = target_shape
+    dst_h, dst_w = dst_shape
+
+    if target_h > dst_h or target_w > dst_w:
+        ratio_h = target_h / dst_h
+        ratio_w = target_w / dst_w
+        if ratio_h > ratio_w:
+            new_h = dst_h
+            new_w = int(target_w / ratio_h)
+        else:
+            new_h = int(target_h / ratio_w)
+            new_w = dst_w
+        return (new_h, new_w)
+    else:
+        return target_h, target_w
+
+
+def _decoded_nbytes(file: str) -> int:
+    """Bytes of decoded image by header of file, 0 if unknown"""
+    try:
+        info = _read_header(file)
+    except (ValueError, OSError):
+        return 0
+    return info.h * info.w * max(info.c, 1) * info.depth // 8
+
+
+def _expand_files(files: Union[str, pathlib.Path, Iterable]) -> List[str]:
+    """Expand a directory, a glob pattern or an iterable into files"""
+    if isinstance(files, (str, pathlib.Path)):
+        path = pathlib.Path(files)
+        if path.is_dir():
+            return sorted(str(f) for f in path.iterdir() if f.is_file())
+        elif any(char in str(files) for char in "*?["):
+            return sorted(glob.glob(str(files)))
+        else:
+            return [str(files)]
+    return [str(f) for f in files]
+
+
+def _encode_params(
+        ext: str, quality: int = None, compression: int = None
+        ) -> List[int]:
+    """cv2.imencode parameters for JPEG quality and PNG compression level"""
+    params = []
+    if quality is not None:
+        if ext.lower() not in (".jpg", ".jpeg", ".jpe"):
+            msg = "quality only applies to JPEG file, got {}"
+            raise ValueError(msg.format(ext))
+        if not 0 <= quality <= 100:
+            raise ValueError("quality must in [0, 100], got {}".format(quality))
+        params += [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if compression is not None:
+        if ext.lower() != ".png":
+            msg = "compression only applies to PNG file, got {}"
+            raise ValueError(msg.format(ext))
+        if not 0 <= compression <= 9:
+            msg = "compression must in [0, 9], got {}"
+            raise ValueError(msg.format(compression))
+        params += [cv2.IMWRITE_PNG_COMPRESSION, int(compression)]
+    return params
+
+
+def _write_file(
+        array: np.ndarray, out_file: str, overwrite: bool, params: List[int]
+        ) -> str:
+    """Encode array and write it to out_file atomically
+
+    The encoded content is written to a temporary file beside out_file
+    and then renamed, so no one sees a partially written file.
+    Without overwrite, it is hard-linked instead of renamed,
+    which fails if out_file exists, even created by others meanwhile.
+    """
+    target = pathlib.Path(out_file)
+    try:
+        success, encoded = cv2.imencode(target.suffix, array, params)
+    except cv2.error as err:
+        success, encoded = False, err
+    if not success:
+        msg = "Can not encode image to {}: {}"
+        raise ValueError(msg.format(target, encoded))
+
+    temp = target.with_name(".{}.{}.tmp".format(target.name, uuid.uuid4().hex))
+    msg = "Can not write image to {}, it alreay exists."
+    try:
+        fd = os.open(str(temp), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        with open(fd, "wb") as f:
+            f.write(encoded)
+        if overwrite:
+            os.replace(str(temp), str(target))
+        else:
+            try:
+                os.link(str(temp), str(target))
+            except FileExistsError:
+                raise ValueError(msg.format(target)) from None
+            except OSError:
+                # file systems without hard links
+                if target.exists():
+                    raise ValueError(msg.format(target)) from None
+                os.replace(str(temp), str(target))
+    finally:
+        if temp.exists():
+            temp.unlink()
+    return str(target)
+
+
+def _is_owned_contiguous(array: np.ndarray, dtype) -> bool:
+    """Check if array can be viewed as Image without copying"""
+    return array.flags.owndata and \
+        array.flags.c_contiguous and \
+        array.flags.writeable and \
+        array.dtype == dtype
+
+
+class _ConversionCache:
+    """Converted representations of Images, bounded by total bytes
+
+    Entries are keyed by (id of source Image, kind of conversion),
+    the least recently used are evicted when exceeding max_bytes,
+    and all entries of an Image are dropped when it is garbage collected.
+    """
+
+    _KINDS = ("gray", "color", "float32")
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._finalizers = {}
+        # dropping an entry may collect an Image and discard its entries
+        self._lock = threading.RLock()
+
+    def get(self, img: "Image", kind: str, convert) -> "Image":
+        """Cached conversion of img, or the result of convert() cached"""
+        key = (id(img), kind)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        converted = convert()
+        # conversions are shared, and derived from an unchanged source
+        converted.flags.writeable = False
+        converted._cache_conversions = True
+        if converted.nbytes > self.max_bytes:
+            return converted
+
+        with self._lock:
+            if key in self._entries:  # converted by another thread
+                return self._entries[key]
+            if id(img) not in self._finalizers:
+                self._finalizers[id(img)] = weakref.finalize(
+                    img, self._forget, id(img)
+                )
+            self._entries[key] = converted
+            self.nbytes += converted.nbytes
+            self.evict()
+        return converted
+
+    def discard(self, img: "Image"):
+        """Drop cached conversions of img"""
+        self._discard_id(id(img))
+
+    def evict(self):
+        """Drop least recently used entries until within max_bytes"""
+        with self._lock:
+            while self.nbytes > self.max_bytes and self._entries:
+                _, converted = self._entries.popitem(last=False)
+                self.nbytes -= converted.nbytes
+
+    def _discard_id(self, img_id: int):
+        with self._lock:
+            for kind in self._KINDS:
+                converted = self._entries.pop((img_id, kind), None)
+                if converted is not None:
+                    self.nbytes -= converted.nbytes
+
+    def _forget(self, img_id: int):
+        with self._lock:
+            self._discard_id(img_id)
+            self._finalizers.pop(img_id, None)
+
+
+_conversions = _ConversionCache(max_bytes=512 * 2**20)
+
+
+def _check_out(out: np.ndarray, shape: tuple) -> "Image":
+    """Check out can hold uint8 result of shape, and view it as Image
+
+    cv2 silently allocates a new array for unfit dst,
+    so out must be checked before passing it to cv2.
+    """
+    if not isinstance(out, np.ndarray) or out.shape != tuple(shape) or \
+            out.dtype != np.uint8 or not out.flags.c_contiguous or \
+            not out.flags.writeable:
+        msg = "out must be writeable C-contiguous uint8 array of {}, got {}"
+        raise ValueError(msg.format(
+            tuple(shape), getattr(out, "shape", type(out))
+        ))
+    if isinstance(out, Image):
+        _conversions.discard(out)
+        return out
+    return out.view(Image)
 
 
 class Image(np.ndarray):
 
     def __new__(
             cls, array: np.ndarray, name: str = "",
-            to_color: bool = False, dtype=np.uint8
+            to_color: bool = False, dtype=np.uint8,
+            copy: bool = True
             ):
         """
         checkout numpy tutorial:
@@ -40,6 +441,10 @@ class Image(np.ndarray):
             name (str): the name of the Image
             to_color (bool): if auto cast the image into BGR
             dtype: data type for the image array
+            copy (bool):
+                if False, the Image is a view of array when array is
+                a C-contiguous array of dtype which owns its memory,
+                otherwise array is always copied.
         """
         input_array_info = "array of shape {} and dtype {}"
         input_array_info = input_array_info.format(array.shape, array.dtype)
@@ -49,6 +454,8 @@ class Image(np.ndarray):
 
         if array.ndim == 2 and to_color:
             array = cv2.cvtColor(array, cv2.COLOR_GRAY2BGR)
+            # the converted array is not referenced by anyone else
+            copy = False
         elif array.ndim == 3 and array.shape[-1] != 3:
             msg = "Color image array must be (h, w, 3), get {}"
             raise ValueError(msg.format(input_array_info))
@@ -56,7 +463,10 @@ class Image(np.ndarray):
             msg = "Array must be (h, w, 3) for color; (h, w) for gray, got {}"
             raise ValueError(msg.format(input_array_info))
 
-        instance = np.array(array, dtype=dtype, copy=True).view(cls)
+        if not copy and _is_owned_contiguous(array, dtype):
+            instance = array.view(cls)
+        else:
+            instance = np.array(array, dtype=dtype, copy=True).view(cls)
         instance.name = name if name else "array_" + str(id(array))
         return instance
 
@@ -65,33 +475,274 @@ class Image(np.ndarray):
             return
         self.name = getattr(obj, "name", None)
 
+    def __reduce__(self):
+        # ndarray pickles only the array, keep name along with it
+        constructor, args, state = super().__reduce__()
+        return constructor, args, (state, self.name)
+
+    def __setstate__(self, state):
+        array_state, self.name = state
+        super().__setstate__(array_state)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if getattr(self, "_cache_conversions", False):
+            _conversions.discard(self)
+
+    def cache_conversions(self, enable: bool = True) -> "Image":
+        """Reuse results of .to_gray(), .to_color() and .to_float32()
+
+        Once enabled, each conversion is computed once and returned as
+        a read-only Image until the image is written by item assignment,
+        e.g. by draw_points. Writes by other means, like cv2 functions
+        drawing in place or through views of the image, must be followed
+        by .invalidate_conversions().
+        Cached conversions of all images share a memory budget,
+        see Image.set_conversion_cache_size.
+
+        Returns:
+            the image itself
+        """
+        self._cache_conversions = enable
+        if not enable:
+            _conversions.discard(self)
+        return self
+
+    def invalidate_conversions(self):
+        """Drop cached conversions after the image is written"""
+        _conversions.discard(self)
+
+    @staticmethod
+    def set_conversion_cache_size(max_bytes: int):
+        """Set memory budget of cached conversions, 512 MB by default"""
+        if max_bytes < 0:
+            raise ValueError("max_bytes must >= 0, got {}".format(max_bytes))
+        _conversions.max_bytes = max_bytes
+        _conversions.evict()
+
+    def _converted(self, kind: str, convert) -> "Image":
+        if getattr(self, "_cache_conversions", False):
+            return _conversions.get(self, kind, convert)
+        return convert()
+
     @classmethod
-    def from_file(cls, file: str):
+    def from_file(
+            cls, file: str,
+            max_shape: Tuple[int, int] = None, scale: float = None
+            ):
         """Construct an Image object from image file
 
         Note: it currently use cv2 to read image
 
+        When max_shape or scale is given, JPEG files are decoded at
+        1/2, 1/4 or 1/8 resolution whenever possible,
+        then resized into the target shape with INTER_AREA.
+
         Args:
             file (str): the target image file
+            max_shape (Tuple[int, int]):
+                (h, w) the image should fit into, keeping aspect ratio.
+                Image smaller than max_shape is not resized.
+            scale (float): the ratio to resize the image, must > 0
+        """
+        if max_shape is None and scale is None:
+            array = _safe_imread(file)
+            return cls.__new__(
+                cls, array=array, name=pathlib.Path(file).stem, copy=False
+            )
+        elif max_shape is not None and scale is not None:
+            msg = "Can not specify both max_shape and scale, got {} and {}"
+            raise ValueError(msg.format(max_shape, scale))
+        elif scale is not None and not scale > 0:
+            msg = "scale must > 0, got {}"
+            raise ValueError(msg.format(scale))
+
+        try:
+            info = _read_header(file)
+        except ValueError:
+            info = None  # leave it for the decoder to decide
+
+        if info is None or info.format != "jpeg":
+            array = _safe_imread(file)
+            shape = array.shape[:2]
+        else:
+            shape = (info.h, info.w)
+
+        if scale is not None:
+            target = tuple(max(1, int(round(dim * scale))) for dim in shape)
+        else:
+            target = _get_keep_aspect_ratio_shape(shape, tuple(max_shape))
+            # max_shape of numpy integers gives numpy integers, which
+            # resize refuses
+            target = tuple(max(1, int(dim)) for dim in target)
+
+        if info is not None and info.format == "jpeg":
+            flags = _reduced_decode_flags(info.c, shape, target)
+            array = _safe_imread(file, flags=flags)
+
+        img = cls.__new__(
+            cls, array=array, name=pathlib.Path(file).stem, copy=False
+        )
+        if img.shape[:2] != target:
+            img = img.resize(target)
+        return img
+
+    @classmethod
+    async def afrom_file(
+            cls, file: str,
+            max_shape: Tuple[int, int] = None, scale: float = None
+            ) -> "Image":
+        """Async Image.from_file, run on the executor of configure_async
+
+        Bytes in flight are estimated by the header of file.
         """
-        array = _safe_imread(file)
-        return cls.__new__(
-            cls, array=array, name=pathlib.Path(file).stem
+        nbytes = await _offloader.run(0, _decoded_nbytes, str(file))
+        return await _offloader.run(
+            nbytes, partial(cls.from_file, file, max_shape, scale)
         )
 
-    def save(self, out_file: str, overwrite: bool = True):
+    @staticmethod
+    def probe(file: str) -> ImageInfo:
+        """Read shape and format of image file without decoding pixels
+
+        Only headers of JPEG, PNG and BMP files are supported.
+
+        Args:
+            file (str): the target image file
+
+        Returns:
+            ImageInfo of (h, w, c, format, depth)
+
+        Raises:
+            ValueError: if the header is corrupted or format unsupported
+        """
+        info = _read_header(file)
+        if info is None:
+            msg = "Unsupported image format of {}"
+            raise ValueError(msg.format(file))
+        return info
+
+    @classmethod
+    def from_files(
+            cls, files: Union[str, pathlib.Path, Iterable],
+            workers: int = None, prefetch: int = None,
+            errors: list = None
+            ) -> Iterator["Image"]:
+        """Construct Image objects from many image files in parallel
+
+        Files are read and decoded on a thread pool, with at most prefetch
+        images decoded ahead of the consumer.
+        Files fail to read or decode are skipped without aborting the others.
+        Arguments are checked when called, not when iterated.
+
+        Args:
+            files: a directory, a glob pattern or an iterable of image files
+            workers (int): number of decoding threads, default to cpu count
+            prefetch (int): max number of pending images, default 2 * workers
+            errors (list):
+                if given, (file, ValueError or OSError) of the files fail to
+                read or decode are appended to it,
+                otherwise a warning is issued for each of them.
+
+        Returns:
+            iterator of Image objects, in the same order as files
+        """
+        files = _expand_files(files)
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        prefetch = 2 * workers if prefetch is None else prefetch
+        if workers <= 0 or prefetch <= 0:
+            msg = "workers and prefetch must > 0, got {} and {}"
+            raise ValueError(msg.format(workers, prefetch))
+        return cls._iter_files(files, workers, prefetch, errors)
+
+    @classmethod
+    def _iter_files(
+            cls, files: List[str], workers: int, prefetch: int,
+            errors: list = None
+            ) -> Iterator["Image"]:
+        """Generator of from_files, with arguments checked"""
+        files = iter(files)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = deque()
+
+        def submit_next():
+            file = next(files, None)
+            if file is not None:
+                pending.append((file, executor.submit(cls.from_file, file)))
+
+        try:
+            for _ in range(prefetch):
+                submit_next()
+
+            while pending:
+                file, future = pending.popleft()
+                submit_next()
+                try:
+                    img = future.result()
+                except (ValueError, OSError) as err:
+                    if errors is None:
+                        warnings.warn(str(err))
+                    else:
+                        errors.append((file, err))
+                    continue
+                yield img
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def save(
+            self, out_file: str, overwrite: bool = True,
+            quality: int = None, compression: int = None
+            ):
         """Output image to file
 
+        The file is written atomically, i.e. encoded into a temporary file
+        and then renamed to out_file.
+
         Args:
             out_file (str): the target output file
             overwrite (bool): if out_file exists, over-write it or not.
+            quality (int): JPEG quality in [0, 100], higher for larger file
+            compression (int):
+                PNG compression level in [0, 9], higher for smaller file
+                but slower encoding
         """
         if not overwrite:
             target = pathlib.Path(out_file)
             if pathlib.Path(out_file).exists():
                 msg = "Can not write image to {}, it alreay exists."
                 raise ValueError(msg.format(target))
-        cv2.imwrite(out_file, self)
+        params = _encode_params(
+            pathlib.Path(out_file).suffix, quality, compression
+        )
+        _write_file(self, str(out_file), overwrite, params)
+
+    async def asave(
+            self, out_file: str, overwrite: bool = True,
+            quality: int = None, compression: int = None
+            ):
+        """Async Image.save, run on the executor of configure_async
+
+        The image must not be changed until it is saved.
+        """
+        await _offloader.run(self.nbytes, partial(
+            self.save, out_file, overwrite=overwrite,
+            quality=quality, compression=compression
+        ))
+
+    def save_async(
+            self, out_file: str, overwrite: bool = True,
+            quality: int = None, compression: int = None
+            ) -> Future:
+        """Output image to file on the shared ImageWriter
+
+        See ImageWriter.save, the image is copied before returning.
+        """
+        return ImageWriter.shared().save(
+            self, out_file, overwrite=overwrite,
+            quality=quality, compression=compression
+        )
 
     @property
     def h(self) -> int:
@@ -109,26 +760,62 @@ class Image(np.ndarray):
     def is_color(self) -> bool:
         return self.c == 3
 
-    def to_color(self):
+    def to_color(self, out: np.ndarray = None):
+        """Convert to BGR image, itself if already color and out is None
+
+        Args:
+            out: if given, uint8 array of (h, w, 3) to write the result in
+        """
+        if out is not None:
+            out = _check_out(out, self.shape[:2] + (3,))
+            if self.is_color:
+                np.copyto(out, self)
+            else:
+                cv2.cvtColor(self, cv2.COLOR_GRAY2BGR, dst=out)
+            out.name = self.name
+            return out
+
         if self.is_color:
             return self
         else:
-            return Image(
+            return self._converted("color", lambda: Image(
                 cv2.cvtColor(self, cv2.COLOR_GRAY2BGR),
-                name=self.name
-            )
+                name=self.name, copy=False
+            ))
+
+    def to_gray(self, out: np.ndarray = None):
+        """Convert to gray image, itself if already gray and out is None
+
+        Args:
+            out: if given, uint8 array of (h, w) to write the result in
+        """
+        if out is not None:
+            out = _check_out(out, self.shape[:2])
+            if self.is_color:
+                cv2.cvtColor(self, cv2.COLOR_BGR2GRAY, dst=out)
+            else:
+                np.copyto(out, self)
+            out.name = self.name
+            return out
 
-    def to_gray(self):
         if self.is_color:
-            return Image(
-                cv2.cvtColor(self, cv2.COLOR_BGR2GRAY), name=self.name
-            )
+            return self._converted("gray", lambda: Image(
+                cv2.cvtColor(self, cv2.COLOR_BGR2GRAY),
+                name=self.name, copy=False
+            ))
         else:
             return self
 
+    def to_float32(self):
+        """Convert values to float32, itself if already float32"""
+        if self.dtype == np.float32:
+            return self
+        return self._converted("float32", lambda: self.astype(np.float32))
+
     def resize(
             self, shape: Tuple[int, int],
-            interpolation: str = "INTER_AREA"
+            interpolation: str = "INTER_AREA",
+            out: np.ndarray = None
             ):
         """Resize image into given shape
 
@@ -138,8 +825,9 @@ class Image(np.ndarray):
                 one of - "INTER_AREA": default,
                 "INTER_LINEAR", "INTER_NEAREST", "INTER_CUBIC",
                 "INTER_LANCZOS4"
+            out: if given, uint8 array of resized shape to write the result in
         Return:
-            a new Image object with shape resized
+            a new Image object with shape resized, or out if given
         """
         if not hasattr(cv2, interpolation):
             msg = "Not supported interpolation method: {}"
@@ -151,11 +839,20 @@ class Image(np.ndarray):
             msg = "Invalid target shape: {}"
             raise ValueError(msg.format(shape))
 
+        if out is not None:
+            out = _check_out(out, tuple(shape) + self.shape[2:])
+            cv2.resize(
+                self, shape[::-1], dst=out,
+                interpolation=getattr(cv2, interpolation)
+            )
+            out.name = self.name
+            return out
+
         resize = cv2.resize(
             self, shape[::-1],
             interpolation=getattr(cv2, interpolation)
         )
-        return Image(resize, name=self.name)
+        return Image(resize, name=self.name, copy=False)
 
     def concate(self, other, axis: int):
         """Concatenate image with another image
@@ -194,6 +891,94 @@ class Image(np.ndarray):
         name = "Concate-{}-by-{}"
         result = Image(
             np.concatenate((self, other), axis=axis),
-            name=name.format(self.name, other.name)
+            name=name.format(self.name, other.name), copy=False
         )
         return result
+
+
+class ImageWriter:
+    """Encode and write Images to files on background threads
+
+    At most max_pending images are waiting or being written,
+    and .save() blocks until one of them is done if full,
+    so a producer faster than encoding does not pile up images in memory.
+
+    Example:
+        with ImageWriter(workers=4) as writer:
+            futures = [
+                writer.save(img, "out/{}.jpg".format(img.name), quality=90)
+                for img in Image.from_files("frames/")
+            ]
+        # leaving the context waits for all writes
+        failed = [f for f in futures if f.exception() is not None]
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, workers: int = None, max_pending: int = None):
+        """
+        Args:
+            workers (int): number of writing threads, default to cpu count
+            max_pending (int):
+                max number of images waiting or being written,
+                default to 2 * workers
+        """
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        max_pending = 2 * workers if max_pending is None else max_pending
+        if workers <= 0 or max_pending <= 0:
+            msg = "workers and max_pending must > 0, got {} and {}"
+            raise ValueError(msg.format(workers, max_pending))
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="ImageWriter"
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    @classmethod
+    def shared(cls) -> "ImageWriter":
+        """The writer of Image.save_async, created on first use"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def save(
+            self, img: Image, out_file: str, overwrite: bool = True,
+            quality: int = None, compression: int = None, copy: bool = True
+            ) -> Future:
+        """Queue img to be written to out_file, block if writer is full
+
+        Args:
+            img, out_file, overwrite, quality, compression: see Image.save
+            copy (bool): if False, img is not copied,
+                and must not be changed until the returned future is done
+
+        Returns:
+            Future of out_file, whose .result() raises errors of writing,
+            e.g. ValueError if out_file exists and overwrite is False
+        """
+        params = _encode_params(
+            pathlib.Path(out_file).suffix, quality, compression
+        )
+        self._slots.acquire()
+        try:
+            array = np.array(img, copy=True) if copy else img
+            future = self._executor.submit(
+                _write_file, array, str(out_file), overwrite, params
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self, wait: bool = True):
+        """Stop accepting images, wait for pending writes if wait"""
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "ImageWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close(wait=True)
@@ -0,0 +1,212 @@
+import heapq
+from typing import Tuple
+
+import numpy as np
+
+from IMGBOX.shapes import RectangleArray, _as_rectangle_array
+
+__all__ = ["nms", "soft_nms", "merge_rectangles"]
+
+
+def _check_scores(rects: RectangleArray, scores) -> np.ndarray:
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.shape != (len(rects),):
+        msg = "scores must be 1-D of length {}, got {}"
+        raise ValueError(msg.format(len(rects), scores.shape))
+    return scores
+
+
+def _neighbors(
+        rects: RectangleArray, min_iou: float
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sparse graph of rectangle pairs with IoU > min_iou
+
+    Returns:
+        (indptr, indices, ious) in CSR format,
+        neighbors of i are indices[indptr[i]:indptr[i + 1]]
+    """
+    pairs = rects.overlapping_pairs()
+    rows, cols = pairs[:, 0], pairs[:, 1]
+    heights = np.minimum(rects.ymax[rows], rects.ymax[cols]) - \
+        np.maximum(rects.ymin[rows], rects.ymin[cols])
+    widths = np.minimum(rects.xmax[rows], rects.xmax[cols]) - \
+        np.maximum(rects.xmin[rows], rects.xmin[cols])
+    inter = heights * widths
+    ious = inter / (rects.area[rows] + rects.area[cols] - inter)
+
+    kept = ious > min_iou
+    rows, cols, ious = rows[kept], cols[kept], ious[kept]
+    # each pair is an edge in both direction
+    rows, cols = np.concatenate([rows, cols]), np.concatenate([cols, rows])
+    ious = np.concatenate([ious, ious])
+
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(len(rects) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(rects)), out=indptr[1:])
+    return indptr, cols[order], ious[order]
+
+
+def _greedy(rects: RectangleArray, scores, iou_threshold: float):
+    """Kept indices, and index of the kept rectangle suppressing each"""
+    if not 0 <= iou_threshold < 1:
+        msg = "iou_threshold must in [0, 1), got {}"
+        raise ValueError(msg.format(iou_threshold))
+
+    indptr, indices, _ = _neighbors(rects, iou_threshold)
+    order = np.argsort(-scores, kind="stable")
+    # isolated rectangles are always kept, only visit the connected ones
+    connected = np.diff(indptr)[order] > 0
+    indptr, indices = indptr.tolist(), indices.tolist()
+
+    owners = np.arange(len(rects))
+    suppressed = [False] * len(rects)
+    for idx in order[connected].tolist():
+        if suppressed[idx]:
+            continue
+        for neighbor in indices[indptr[idx]:indptr[idx + 1]]:
+            if not suppressed[neighbor]:
+                suppressed[neighbor] = True
+                owners[neighbor] = idx
+    kept = order[~np.array(suppressed, dtype=bool)[order]]
+    return kept, owners
+
+
+def nms(rects, scores, iou_threshold: float = 0.5) -> np.ndarray:
+    """Greedy non-maximum suppression
+
+    Rectangles are visited by descending score, and each kept rectangle
+    suppresses the rest whose IoU with it > iou_threshold.
+    Only pairs overlapped are computed, see RectangleArray.overlapping_pairs.
+
+    Args:
+        rects: RectangleArray or iterable of Rectangle
+        scores: array-like of N scores
+        iou_threshold (float): in [0, 1)
+
+    Returns:
+        int array of indices of kept rectangles, by descending score
+    """
+    rects = _as_rectangle_array(rects)
+    scores = _check_scores(rects, scores)
+    kept, _ = _greedy(rects, scores, iou_threshold)
+    return kept
+
+
+def soft_nms(
+        rects, scores, sigma: float = 0.5, iou_threshold: float = 0.3,
+        score_threshold: float = 1e-3, method: str = "gaussian"
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """Soft non-maximum suppression (Bodla et al. 2017)
+
+    Instead of being removed, scores of rectangles overlapped with a kept
+    one are decayed, by exp(-iou^2 / sigma) for "gaussian",
+    or by (1 - iou) if iou > iou_threshold for "linear".
+
+    Args:
+        rects: RectangleArray or iterable of Rectangle
+        scores: array-like of N scores
+        sigma (float): for "gaussian" method, must > 0
+        iou_threshold (float): for "linear" method
+        score_threshold (float): rectangles decayed below it are dropped
+        method (str): "gaussian" or "linear"
+
+    Returns:
+        tuple of (indices, scores) of kept rectangles, by descending
+        decayed score
+    """
+    if method == "gaussian":
+        if not sigma > 0:
+            raise ValueError("sigma must > 0, got {}".format(sigma))
+        min_iou = 0
+    elif method == "linear":
+        min_iou = iou_threshold
+    else:
+        msg = "Unrecognized soft-NMS method: {}".format(method)
+        raise ValueError(msg)
+
+    rects = _as_rectangle_array(rects)
+    scores = _check_scores(rects, scores)
+    indptr, indices, ious = _neighbors(rects, min_iou)
+    if method == "gaussian":
+        decays = np.exp(-ious ** 2 / sigma)
+    else:
+        decays = 1 - ious
+    # isolated rectangles are never decayed, only heap the connected ones
+    connected = np.flatnonzero(np.diff(indptr) > 0)
+    isolated = np.flatnonzero(
+        (np.diff(indptr) == 0) & (scores >= score_threshold)
+    )
+    indptr, indices, decays = \
+        indptr.tolist(), indices.tolist(), decays.tolist()
+
+    current = scores.tolist()
+    done = [False] * len(rects)
+    heap = list(zip((-scores[connected]).tolist(), connected.tolist()))
+    heapq.heapify(heap)
+
+    kept, kept_scores = [], []
+    while heap:
+        score, idx = heapq.heappop(heap)
+        score = -score
+        if done[idx] or score != current[idx]:
+            continue  # stale entry of a decayed score
+        if score < score_threshold:
+            break
+        done[idx] = True
+        kept.append(idx)
+        kept_scores.append(score)
+        for pos in range(indptr[idx], indptr[idx + 1]):
+            neighbor = indices[pos]
+            if not done[neighbor]:
+                current[neighbor] *= decays[pos]
+                heapq.heappush(heap, (-current[neighbor], neighbor))
+
+    kept = np.concatenate([np.array(kept, dtype=np.int64), isolated])
+    kept_scores = np.concatenate([kept_scores, scores[isolated]])
+    order = np.argsort(-kept_scores, kind="stable")
+    return kept[order], kept_scores[order]
+
+
+def merge_rectangles(
+        rects, scores, iou_threshold: float = 0.5
+        ) -> Tuple[RectangleArray, np.ndarray]:
+    """Merge clusters of overlapped rectangles into one
+
+    Clusters are formed by greedy NMS: each kept rectangle and those it
+    suppresses. The merged rectangle is the score-weighted average
+    of the cluster, and its score is the max score of the cluster.
+
+    Args:
+        rects: RectangleArray or iterable of Rectangle
+        scores: array-like of N non-negative scores
+        iou_threshold (float): in [0, 1)
+
+    Returns:
+        tuple of (RectangleArray, scores) of merged rectangles,
+        by descending score
+    """
+    rects = _as_rectangle_array(rects)
+    scores = _check_scores(rects, scores)
+    if np.any(scores < 0):
+        raise ValueError("scores must >= 0 for weighted average")
+
+    kept, owners = _greedy(rects, scores, iou_threshold)
+    # cluster id of each rectangle, in the order of kept
+    cluster_of = np.empty(len(rects), dtype=np.int64)
+    cluster_of[kept] = np.arange(len(kept))
+    clusters = cluster_of[owners]
+
+    weights = np.bincount(clusters, weights=scores, minlength=len(kept))
+    counts = np.bincount(clusters, minlength=len(kept))
+    coords = []
+    for coord in (rects.ymin, rects.xmin, rects.ymax, rects.xmax):
+        weighted = np.bincount(
+            clusters, weights=coord * scores, minlength=len(kept)
+        )
+        plain = np.bincount(clusters, weights=coord, minlength=len(kept))
+        # clusters of zero scores are plain averaged
+        coords.append(np.where(
+            weights > 0, weighted / np.where(weights > 0, weights, 1),
+            plain / counts
+        ))
+    return RectangleArray(*coords), scores[kept]
@@ -0,0 +1,161 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable, Iterator, Union
+
+from IMGBOX.core import Image
+
+__all__ = ["Pipeline"]
+
+
+def _run_stage(
+        items: Iterator, func: Callable,
+        workers: int, queue: int, ordered: bool
+        ) -> Iterator:
+    """Yield func(item) of items, computed by a thread pool
+
+    At most queue items are pulled from upstream ahead of the consumer,
+    so a slow stage holds back those before it instead of piling up items.
+    """
+    items = iter(items)
+    executor = ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="Pipeline"
+    )
+    pending = deque()
+
+    def submit_next():
+        for item in items:
+            pending.append(executor.submit(func, item))
+            break
+
+    try:
+        for _ in range(queue):
+            submit_next()
+
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(f for f in pending if f in done)
+                pending.remove(future)
+            result = future.result()
+            submit_next()
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+class Pipeline:
+    """Stream images through stages, each running on threads of its own
+
+    Each stage keeps its workers busy with a bounded number of items,
+    so reading, operating and saving of different images overlap.
+    Operations and OpenCV functions release the GIL in most of the time,
+    therefore threads of stages run in parallel.
+
+    Example:
+        (
+            Pipeline(Image.from_files("frames/", workers=4))
+            .map(Canny(), workers=8)
+            .apply(draw_rectangle, region, 255, 2)
+            .save("edges/{name}.png", workers=4)
+            .run()
+        )
+    """
+
+    def __init__(self, source: Iterable, ordered: bool = True):
+        """
+        Args:
+            source: iterable of items to stream, e.g. Image.from_files(...)
+                or a FrameSource
+            ordered (bool): if False, each stage yields results as soon as
+                they are done instead of in the order of source
+        """
+        self._source = source
+        self._stages = []
+        self.ordered = ordered
+
+    def map(
+            self, operation: Union[Callable, object], *args,
+            workers: int = 1, queue: int = None
+            ) -> "Pipeline":
+        """Add a stage yielding result of operation on each item
+
+        Args:
+            operation: an object with .on(), e.g. SingularOperation,
+                or a callable, called by (item, *args)
+            args: other arguments, e.g. the second image of BinaryOperation
+            workers (int): number of threads of the stage
+            queue (int): max number of pending items, default 2 * workers
+
+        Returns:
+            the pipeline itself
+        """
+        func = operation.on if hasattr(operation, "on") else operation
+
+        def stage(item):
+            return func(item, *args)
+        return self._add(stage, workers, queue)
+
+    def apply(
+            self, func: Callable, *args,
+            workers: int = 1, queue: int = None
+            ) -> "Pipeline":
+        """Add a stage calling func(item, *args) and yielding the item
+
+        For functions changing items in place, e.g. draw_rectangle.
+        See Pipeline.map for arguments.
+        """
+        def stage(item):
+            func(item, *args)
+            return item
+        return self._add(stage, workers, queue)
+
+    def save(
+            self, out_file: Union[str, Callable[[Image], str]],
+            overwrite: bool = True, quality: int = None,
+            compression: int = None, workers: int = 1, queue: int = None
+            ) -> "Pipeline":
+        """Add a stage saving each Image and yielding it
+
+        Args:
+            out_file: format of file with field {name} of the Image,
+                e.g. "out/{name}.jpg", or a callable of Image to its file
+            overwrite, quality, compression: see Image.save
+        """
+        def stage(img: Image):
+            if callable(out_file):
+                file = out_file(img)
+            else:
+                file = out_file.format(name=img.name)
+            img.save(
+                file, overwrite=overwrite,
+                quality=quality, compression=compression
+            )
+            return img
+        return self._add(stage, workers, queue)
+
+    def __iter__(self) -> Iterator:
+        items = iter(self._source)
+        for stage, workers, queue in self._stages:
+            items = _run_stage(items, stage, workers, queue, self.ordered)
+        return items
+
+    def run(self) -> int:
+        """Stream all items through stages, return the number of items"""
+        count = 0
+        for _ in self:
+            count += 1
+        return count
+
+    def _add(self, stage: Callable, workers: int, queue: int) -> "Pipeline":
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        queue = 2 * workers if queue is None else queue
+        if workers <= 0 or queue <= 0:
+            msg = "workers and queue must > 0, got {} and {}"
+            raise ValueError(msg.format(workers, queue))
+        self._stages.append((stage, workers, queue))
+        return self
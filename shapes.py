@@ -1,9 +1,10 @@
 from numbers import Number
 from collections import namedtuple
+from typing import Iterable, Iterator, Union
 
 import numpy as np
 
-__all__ = ["Rectangle", "Point"]
+__all__ = ["Rectangle", "Point", "RectangleArray", "PointArray"]
 
 
 def _cvt2float(number) -> float:
@@ -71,3 +72,311 @@ class Rectangle(namedtuple("Rectangle", ["ymin", "xmin", "ymax", "xmax"])):
     def overlap_with(self, other) -> bool:
         """if the rectange is overlapped with another rectangle"""
         return self.overlap(self, other)
+
+
+class PointArray:
+    """Many points stored as arrays of y and x
+
+    Indexing by int returns a Point,
+    indexing by slice, mask or indices returns a PointArray.
+    """
+
+    def __init__(self, y, x):
+        """
+        Args:
+            y, x: array-like of int with same length
+        """
+        self.y = np.array(y, dtype=np.int64, ndmin=1)
+        self.x = np.array(x, dtype=np.int64, ndmin=1)
+        if self.y.ndim != 1 or self.y.shape != self.x.shape:
+            msg = "y and x must be 1-D of same length, got {} and {}"
+            raise ValueError(msg.format(self.y.shape, self.x.shape))
+
+    @classmethod
+    def from_points(cls, points: Iterable[Point]) -> "PointArray":
+        """Construct from iterable of Point"""
+        array = np.array([(pt.y, pt.x) for pt in points], dtype=np.int64)
+        return cls.from_array(array.reshape(-1, 2))
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> "PointArray":
+        """Construct from array of (N, 2), each row is (y, x)"""
+        array = np.asarray(array)
+        if not (array.ndim == 2 and array.shape[-1] == 2):
+            msg = "Invalid dimension for points, must be (N, 2), got {}"
+            raise ValueError(msg.format(array.shape))
+        return cls(array[:, 0], array[:, 1])
+
+    @property
+    def array(self) -> np.ndarray:
+        """Points as array of (N, 2), each row is (y, x)"""
+        return np.stack([self.y, self.x], axis=1)
+
+    def to_points(self) -> list:
+        return list(self)
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    def __iter__(self) -> Iterator[Point]:
+        for y, x in zip(self.y.tolist(), self.x.tolist()):
+            yield Point(y, x)
+
+    def __getitem__(self, index) -> Union[Point, "PointArray"]:
+        if isinstance(index, (int, np.integer)):
+            return Point(self.y[index], self.x[index])
+        return PointArray(self.y[index], self.x[index])
+
+    def __repr__(self) -> str:
+        return "PointArray(n={})".format(len(self))
+
+    def inside(self, image) -> np.ndarray:
+        """Mask of points locate inside given image"""
+        h, w = image.shape[:2]
+        return (0 <= self.y) & (self.y < h) & (0 <= self.x) & (self.x < w)
+
+
+def _expand(starts: np.ndarray, counts: np.ndarray):
+    """Expand ranges [start, start + count) into (range ids, values)"""
+    ids = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+    return ids, starts[ids] + offsets
+
+
+def _as_rectangle_array(rects) -> "RectangleArray":
+    if isinstance(rects, RectangleArray):
+        return rects
+    elif isinstance(rects, Rectangle):
+        return RectangleArray.from_rectangles([rects])
+    return RectangleArray.from_rectangles(rects)
+
+
+class RectangleArray:
+    """Many rectangles stored as arrays of ymin, xmin, ymax, xmax
+
+    Indexing by int returns a Rectangle,
+    indexing by slice, mask or indices returns a RectangleArray.
+    Like Rectangle.overlap, rectangles with only same boarder
+    are not considered overlapped.
+    """
+
+    def __init__(self, ymin, xmin, ymax, xmax):
+        """
+        Args:
+            ymin, xmin, ymax, xmax: array-like of numbers with same length
+        """
+        coords = [
+            np.array(coord, dtype=np.float64, ndmin=1)
+            for coord in (ymin, xmin, ymax, xmax)
+        ]
+        if coords[0].ndim != 1 or \
+                any(coord.shape != coords[0].shape for coord in coords):
+            msg = "Coordinates must be 1-D of same length, got {}"
+            raise ValueError(msg.format([coord.shape for coord in coords]))
+
+        self.ymin, self.xmin, self.ymax, self.xmax = coords
+        if not np.all(self.ymin < self.ymax):
+            raise ValueError("ymin must less than ymax")
+        elif not np.all(self.xmin < self.xmax):
+            raise ValueError("xmin must less than xmax")
+
+    @classmethod
+    def from_rectangles(
+            cls, rects: Iterable[Rectangle]
+            ) -> "RectangleArray":
+        """Construct from iterable of Rectangle"""
+        array = np.array([tuple(rect) for rect in rects], dtype=np.float64)
+        return cls.from_array(array.reshape(-1, 4))
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> "RectangleArray":
+        """Construct from array of (N, 4), rows of (ymin, xmin, ymax, xmax)"""
+        array = np.asarray(array)
+        if not (array.ndim == 2 and array.shape[-1] == 4):
+            msg = "Invalid dimension for rectangles, must be (N, 4), got {}"
+            raise ValueError(msg.format(array.shape))
+        return cls(array[:, 0], array[:, 1], array[:, 2], array[:, 3])
+
+    @property
+    def array(self) -> np.ndarray:
+        """Rectangles as array of (N, 4), rows of (ymin, xmin, ymax, xmax)"""
+        return np.stack([self.ymin, self.xmin, self.ymax, self.xmax], axis=1)
+
+    def to_rectangles(self) -> list:
+        return list(self)
+
+    def __len__(self) -> int:
+        return len(self.ymin)
+
+    def __iter__(self) -> Iterator[Rectangle]:
+        for coords in self.array.tolist():
+            yield Rectangle(*coords)
+
+    def __getitem__(self, index) -> Union[Rectangle, "RectangleArray"]:
+        if isinstance(index, (int, np.integer)):
+            return Rectangle(
+                self.ymin[index], self.xmin[index],
+                self.ymax[index], self.xmax[index]
+            )
+        return RectangleArray(
+            self.ymin[index], self.xmin[index],
+            self.ymax[index], self.xmax[index]
+        )
+
+    def __repr__(self) -> str:
+        return "RectangleArray(n={})".format(len(self))
+
+    @property
+    def area(self) -> np.ndarray:
+        """the areas of the rectangles"""
+        return (self.ymax - self.ymin) * (self.xmax - self.xmin)
+
+    def inside(self, image) -> np.ndarray:
+        """Mask of rectangles lie entirely inside given image"""
+        h, w = image.shape[:2]
+        return (self.ymin >= 0) & (self.xmin >= 0) & \
+            (self.ymax <= h) & (self.xmax <= w)
+
+    def _intersection(self, other: "RectangleArray") -> np.ndarray:
+        """Pairwise intersection heights and widths of (N, M)"""
+        heights = np.minimum(self.ymax[:, None], other.ymax[None, :]) - \
+            np.maximum(self.ymin[:, None], other.ymin[None, :])
+        widths = np.minimum(self.xmax[:, None], other.xmax[None, :]) - \
+            np.maximum(self.xmin[:, None], other.xmin[None, :])
+        return heights, widths
+
+    def overlap(self, other) -> np.ndarray:
+        """Pairwise overlap matrix of (N, M)
+
+        Args:
+            other: RectangleArray, Rectangle or iterable of Rectangle
+        """
+        heights, widths = self._intersection(_as_rectangle_array(other))
+        return (heights > 0) & (widths > 0)
+
+    def iou(self, other) -> np.ndarray:
+        """Pairwise intersection over union matrix of (N, M)
+
+        Args:
+            other: RectangleArray, Rectangle or iterable of Rectangle
+        """
+        other = _as_rectangle_array(other)
+        heights, widths = self._intersection(other)
+        inter = np.clip(heights, 0, None) * np.clip(widths, 0, None)
+        union = self.area[:, None] + other.area[None, :] - inter
+        return inter / union
+
+    def overlapping_pairs(self, other=None) -> np.ndarray:
+        """Find all overlapping pairs with a multi-level grid index
+
+        Rectangles are binned into cells of about their own size,
+        and only rectangles sharing a cell are checked,
+        instead of checking all N * N pairs.
+
+        Args:
+            other:
+                RectangleArray, Rectangle or iterable of Rectangle,
+                if None, pairs within the rectangles themselves are found
+
+        Returns:
+            int array of (K, 2), each row (i, j) for self[i] overlaps with
+            other[j], or with self[j] where i < j if other is None.
+            Rows are sorted in lexicographic order.
+        """
+        if other is None:
+            pairs = self._grid_pairs()
+            pairs.sort(axis=1)
+        else:
+            other = _as_rectangle_array(other)
+            merged = RectangleArray.from_array(
+                np.concatenate([self.array, other.array])
+            )
+            pairs = merged._grid_pairs()
+            pairs.sort(axis=1)
+            # keep pairs between self and other only
+            n = len(self)
+            pairs = pairs[(pairs[:, 0] < n) & (pairs[:, 1] >= n)]
+            pairs[:, 1] -= n
+
+        order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+        return pairs[order]
+
+    def _grid_pairs(self) -> np.ndarray:
+        """Overlapping pairs of (K, 2), in arbitrary order
+
+        Rectangles are put into levels of grids, level L of cells
+        2 ** L times the median size, each rectangle in the finest level
+        its size fits in a cell, so it covers at most 2 x 2 cells.
+        A pair is found at the level of the larger one, where the smaller
+        one is looked up as a visitor.
+        """
+        if len(self) < 2:
+            return np.empty((0, 2), dtype=np.int64)
+
+        sizes = np.maximum(self.ymax - self.ymin, self.xmax - self.xmin)
+        base = np.median(sizes)
+        if not base > 0:
+            # rectangles of zero size never overlap, any size works
+            base = max(sizes.max(), 1)
+        levels = np.ceil(np.log2(np.maximum(sizes / base, 1))).astype(np.int64)
+
+        pairs = []
+        for level in np.unique(levels):
+            residents = np.flatnonzero(levels == level)
+            visitors = np.flatnonzero(levels < level)
+            pairs.append(self._level_pairs(
+                base * 2 ** int(level), residents, visitors
+            ))
+        return np.concatenate(pairs)
+
+    def _level_pairs(
+            self, cell: float, residents: np.ndarray, visitors: np.ndarray
+            ) -> np.ndarray:
+        """Overlapping pairs of residents, and of resident and visitor
+
+        Each pair is reported only in the cell holding top-left corner of
+        their intersection, which both of them cover.
+        """
+        y0, x0 = self.ymin.min(), self.xmin.min()
+        ncols = int((self.xmax.max() - x0) // cell) + 1
+        indices = np.concatenate([residents, visitors])
+        ys = ((self.ymin[indices] - y0) // cell).astype(np.int64)
+        xs = ((self.xmin[indices] - x0) // cell).astype(np.int64)
+        ye = ((self.ymax[indices] - y0) // cell).astype(np.int64)
+        xe = ((self.xmax[indices] - x0) // cell).astype(np.int64)
+
+        # one entry for each (rectangle, cell covered by it)
+        heights, widths = ye - ys + 1, xe - xs + 1
+        entries, offsets = _expand(
+            np.zeros(len(indices), dtype=np.int64), heights * widths
+        )
+        cells = (ys[entries] + offsets // widths[entries]) * ncols + \
+            xs[entries] + offsets % widths[entries]
+
+        # residents go before visitors in each cell
+        visiting = entries >= len(residents)
+        order = np.lexsort((visiting, cells))
+        cells, owners = cells[order], indices[entries[order]]
+        visiting = visiting[order]
+        # pair each resident with entries after it in the same cell
+        ends = np.searchsorted(cells, cells, side="right")
+        starts = np.arange(len(cells)) + 1
+        ends[visiting] = starts[visiting]
+        firsts, seconds = _expand(starts, ends - starts)
+        cells, rows, cols = cells[firsts], owners[firsts], owners[seconds]
+
+        overlapped = (self.ymin[rows] < self.ymax[cols]) & \
+            (self.ymin[cols] < self.ymax[rows]) & \
+            (self.xmin[rows] < self.xmax[cols]) & \
+            (self.xmin[cols] < self.xmax[rows])
+        cells, rows, cols = \
+            cells[overlapped], rows[overlapped], cols[overlapped]
+
+        top = np.maximum(self.ymin[rows], self.ymin[cols])
+        left = np.maximum(self.xmin[rows], self.xmin[cols])
+        corner = ((top - y0) // cell).astype(np.int64) * ncols + \
+            ((left - x0) // cell).astype(np.int64)
+        unique = corner == cells
+        return np.stack([rows[unique], cols[unique]], axis=1)
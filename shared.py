@@ -0,0 +1,113 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from IMGBOX.core import Image
+
+__all__ = ["SharedImage"]
+
+
+class SharedImage:
+    """Image stored in shared memory, passed to other processes by handle
+
+    Pickling a SharedImage only sends the handle, shape and name,
+    and unpickling it attaches to the same memory without copying pixels,
+    so writes of one process are seen by the others.
+
+    The creating process owns the memory: every process should .close()
+    its attachment, and the owner should .unlink() the memory
+    after all processes are done, or it lasts until the system reboots.
+    Leaving the with-block does both for the owner, and closes for others.
+
+    Example:
+        with SharedImage.from_image(img) as shared:
+            with ProcessPoolExecutor() as pool:
+                masks = list(pool.map(segment, [shared] * 4, params))
+
+        def segment(shared, param):
+            with shared:
+                return ChanVese(**param).on(shared.image)
+    """
+
+    def __init__(
+            self, shm: SharedMemory, shape: tuple,
+            name: str, owner: bool = False
+            ):
+        """Use SharedImage.create, .from_image or .attach instead"""
+        self._shm = shm
+        self.shape = tuple(shape)
+        self.name = name
+        self.owner = owner
+        self._closed = False
+
+    @classmethod
+    def create(cls, shape: tuple, name: str = "") -> "SharedImage":
+        """Create zero-filled shared memory for image of shape
+
+        Args:
+            shape (tuple): (h, w, 3) for color; (h, w) for gray image
+            name (str): the name of the image
+        """
+        shape = tuple(int(dim) for dim in shape)
+        valid = len(shape) == 2 or (len(shape) == 3 and shape[-1] == 3)
+        if not valid or any(dim <= 0 for dim in shape):
+            msg = "Shape must be (h, w, 3) for color; (h, w) for gray, got {}"
+            raise ValueError(msg.format(shape))
+
+        shm = SharedMemory(create=True, size=int(np.prod(shape)))
+        name = name if name else "shared_" + shm.name
+        return cls(shm, shape, name, owner=True)
+
+    @classmethod
+    def from_image(cls, img: Image) -> "SharedImage":
+        """Copy an Image into new shared memory"""
+        shared = cls.create(img.shape, img.name)
+        shared._array()[...] = img
+        return shared
+
+    @classmethod
+    def attach(cls, handle: str, shape: tuple, name: str) -> "SharedImage":
+        """Attach to shared memory of handle created by another process"""
+        return cls(SharedMemory(name=handle), shape, name)
+
+    @property
+    def handle(self) -> str:
+        """Name of the shared memory block"""
+        return self._shm.name
+
+    @property
+    def image(self) -> Image:
+        """Image viewing the shared memory, without copying
+
+        Views must be deleted before .close(), otherwise BufferError.
+        """
+        img = self._array().view(Image)
+        img.name = self.name
+        return img
+
+    def close(self):
+        """Detach this process from the shared memory"""
+        if not self._closed:
+            self._shm.close()
+            self._closed = True
+
+    def unlink(self):
+        """Free the shared memory, after all processes are done"""
+        self._shm.unlink()
+
+    def __reduce__(self):
+        return SharedImage.attach, (self.handle, self.shape, self.name)
+
+    def __enter__(self) -> "SharedImage":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        if self.owner:
+            self.unlink()
+
+    def _array(self) -> np.ndarray:
+        if self._closed:
+            msg = "SharedImage {} is closed".format(self.name)
+            raise ValueError(msg)
+        return np.ndarray(self.shape, dtype=np.uint8, buffer=self._shm.buf)
@@ -0,0 +1,234 @@
+import os
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Iterator
+
+import numpy as np
+
+from IMGBOX.core import Image
+from IMGBOX.shapes import Rectangle
+from IMGBOX.Operations.base import SingularOperation
+
+__all__ = ["TiledImage"]
+
+
+def _region_of(rect: Rectangle) -> Tuple[int, int, int, int]:
+    return int(rect.ymin), int(rect.xmin), int(rect.ymax), int(rect.xmax)
+
+
+class TiledImage:
+    """Image too large for memory, stored in a memory-mapped file
+
+    Pixels are kept in a backing store, which is any array-like object
+    sliced by [ymin:ymax, xmin:xmax], e.g. numpy.memmap, h5py or zarr array,
+    and only read into memory tile by tile.
+
+    Example:
+        scan = TiledImage.open("scan.npy")
+        edges = scan.apply(Laplacian(), "edges.npy", workers=8)
+    """
+
+    def __init__(
+            self, store, name: str = "",
+            tile_shape: Tuple[int, int] = (1024, 1024)
+            ):
+        """
+        Args:
+            store: array-like of (h, w, 3) or (h, w) of uint8
+            name (str): the name of the image
+            tile_shape (Tuple[int, int]): (h, w) of tiles to be processed
+        """
+        shape = tuple(store.shape)
+        valid = len(shape) == 2 or (len(shape) == 3 and shape[-1] == 3)
+        if np.dtype(store.dtype) != np.uint8 or not valid:
+            msg = "Store must be uint8 of (h, w, 3) or (h, w), got {} {}"
+            raise ValueError(msg.format(store.dtype, shape))
+
+        if len(tile_shape) != 2 or any(dim <= 0 for dim in tile_shape):
+            msg = "Invalid tile shape: {}"
+            raise ValueError(msg.format(tile_shape))
+
+        self.store = store
+        self.name = name if name else "tiled_" + str(id(store))
+        self.tile_shape = tuple(int(dim) for dim in tile_shape)
+
+    @classmethod
+    def create(
+            cls, file: str, shape: tuple,
+            tile_shape: Tuple[int, int] = (1024, 1024)
+            ) -> "TiledImage":
+        """Create a zero-filled image in a .npy file, overwriting it
+
+        Args:
+            file (str): the .npy file to store pixels
+            shape (tuple): (h, w, 3) for color; (h, w) for gray image
+        """
+        store = np.lib.format.open_memmap(
+            str(file), mode="w+", dtype=np.uint8, shape=tuple(shape)
+        )
+        return cls(store, name=pathlib.Path(file).stem, tile_shape=tile_shape)
+
+    @classmethod
+    def open(
+            cls, file: str, mode: str = "r",
+            tile_shape: Tuple[int, int] = (1024, 1024)
+            ) -> "TiledImage":
+        """Open image stored in a .npy file without reading it
+
+        Args:
+            file (str): the .npy file
+            mode (str): "r" for read-only, "r+" for read and write
+        """
+        store = np.load(str(file), mmap_mode=mode)
+        return cls(store, name=pathlib.Path(file).stem, tile_shape=tile_shape)
+
+    @classmethod
+    def from_image(
+            cls, img: Image, file: str,
+            tile_shape: Tuple[int, int] = (1024, 1024)
+            ) -> "TiledImage":
+        """Write an in-memory Image into a .npy file"""
+        tiled = cls.create(file, img.shape, tile_shape=tile_shape)
+        tiled.store[...] = img
+        tiled.store.flush()
+        tiled.name = img.name
+        return tiled
+
+    @property
+    def shape(self) -> tuple:
+        return tuple(self.store.shape)
+
+    @property
+    def h(self) -> int:
+        return self.shape[0]
+
+    @property
+    def w(self) -> int:
+        return self.shape[1]
+
+    @property
+    def c(self) -> int:
+        return 0 if len(self.shape) == 2 else self.shape[-1]
+
+    @property
+    def is_color(self) -> bool:
+        return self.c == 3
+
+    def tiles(self) -> Iterator[Rectangle]:
+        """Regions of tiles, in row-major order"""
+        tile_h, tile_w = self.tile_shape
+        for ymin in range(0, self.h, tile_h):
+            for xmin in range(0, self.w, tile_w):
+                yield Rectangle(
+                    ymin, xmin,
+                    min(ymin + tile_h, self.h), min(xmin + tile_w, self.w)
+                )
+
+    def read(self, region: Rectangle) -> Image:
+        """Read pixels inside region into memory"""
+        ymin, xmin, ymax, xmax = _region_of(region)
+        if ymin < 0 or xmin < 0 or ymax > self.h or xmax > self.w:
+            msg = "Region out of range: read {} from image shape {}"
+            raise ValueError(msg.format(region, self.shape))
+        return Image(
+            np.asarray(self.store[ymin:ymax, xmin:xmax, ...]),
+            name="{}[{}:{}, {}:{}]".format(self.name, ymin, ymax, xmin, xmax)
+        )
+
+    def write(self, region: Rectangle, array: np.ndarray):
+        """Write array into pixels inside region"""
+        ymin, xmin, ymax, xmax = _region_of(region)
+        if ymin < 0 or xmin < 0 or ymax > self.h or xmax > self.w:
+            msg = "Region out of range: write {} to image shape {}"
+            raise ValueError(msg.format(region, self.shape))
+        self.store[ymin:ymax, xmin:xmax, ...] = array
+
+    def to_image(self) -> Image:
+        """Read the whole image into memory"""
+        return Image(np.asarray(self.store), name=self.name)
+
+    def flush(self):
+        """Write changes of memory-mapped store to disk"""
+        if hasattr(self.store, "flush"):
+            self.store.flush()
+
+    def apply(
+            self, operation: SingularOperation, out_file: str,
+            halo: int = None, workers: int = None
+            ) -> "TiledImage":
+        """Operate tile by tile and stitch results into a .npy file
+
+        Each tile is read together with halo pixels around it,
+        so operations with a bounded _halo, e.g. Laplacian,
+        give the same result as operating on the whole image.
+        Results of operations whose _halo is None are only approximate:
+        e.g. hysteresis of Canny may follow edges arbitrarily far,
+        beyond any halo given.
+
+        Args:
+            operation:
+                a SingularOperation keeping (h, w) of image unchanged
+            out_file (str): the .npy file to store result, overwriting it
+            halo (int):
+                pixels read around each tile, default to operation._halo.
+                Must be given for operations whose _halo is None,
+                e.g. for Canny, pixels of its Sobel and Gaussian kernels,
+                which keeps gradients exact but not the hysteresis.
+            workers (int): number of threads, default to cpu count
+
+        Returns:
+            TiledImage of the result, stored in out_file
+        """
+        if not isinstance(operation, SingularOperation):
+            msg = "TiledImage only applies SingularOperation, got {}"
+            raise TypeError(msg.format(type(operation)))
+
+        halo = operation._halo if halo is None else halo
+        if halo is None:
+            msg = "{} depends on the whole image, halo must be given"
+            raise ValueError(msg.format(operation.__class__.__name__))
+        elif halo < 0:
+            raise ValueError("halo must >= 0, got {}".format(halo))
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        if workers <= 0:
+            raise ValueError("workers must > 0, got {}".format(workers))
+
+        def operate(tile: Rectangle) -> np.ndarray:
+            ymin, xmin, ymax, xmax = _region_of(tile)
+            outer = (
+                max(ymin - halo, 0), max(xmin - halo, 0),
+                min(ymax + halo, self.h), min(xmax + halo, self.w)
+            )
+            result = operation.on(self.read(Rectangle(*outer)))
+            if result.shape[:2] != (outer[2] - outer[0], outer[3] - outer[1]):
+                msg = "{} changes shape of tile from {} to {}"
+                raise ValueError(msg.format(
+                    operation.__class__.__name__,
+                    (outer[2] - outer[0], outer[3] - outer[1]),
+                    result.shape[:2]
+                ))
+            return result[
+                ymin - outer[0]:ymax - outer[0],
+                xmin - outer[1]:xmax - outer[1], ...
+            ]
+
+        # result channels are known only after operating the first tile
+        tiles = list(self.tiles())
+        first = operate(tiles[0])
+        out = TiledImage.create(
+            out_file, self.shape[:2] + first.shape[2:],
+            tile_shape=self.tile_shape
+        )
+        out.write(tiles[0], first)
+        del first
+
+        def operate_and_write(tile: Rectangle):
+            out.write(tile, operate(tile))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # consume results for raising errors of tiles
+            for _ in executor.map(operate_and_write, tiles[1:]):
+                pass
+        out.flush()
+        out.name = "{} on ".format(operation.__class__.__name__) + self.name
+        return out
@@ -0,0 +1,219 @@
+import pathlib
+import threading
+import warnings
+from collections import deque
+from typing import Union, Iterable
+
+import cv2
+
+from IMGBOX.core import Image, _expand_files
+
+__all__ = ["FrameSource"]
+
+
+class FrameSource:
+    """Frames of a video or an image sequence, decoded in background
+
+    Frames are decoded by a background thread into a ring buffer
+    of at most buffer frames, and iterated as Image objects.
+    Frames of video are named "{name}_{index:06d}" by their index,
+    those of image sequence keep names of their files.
+
+    When the buffer is full, the decoder waits for the consumer,
+    or with drop=True, the oldest frame in buffer is dropped instead,
+    e.g. to keep up with a live camera.
+
+    Example:
+        with FrameSource("record.mp4", stride=5) as frames:
+            for frame in frames:
+                edges = Canny().on(frame)
+    """
+
+    def __init__(
+            self, source: Union[str, pathlib.Path, int, Iterable],
+            stride: int = 1, start: int = 0, buffer: int = 16,
+            drop: bool = False, name: str = None
+            ):
+        """
+        Args:
+            source: one of
+                a) a video file, or a camera index, read by cv2.VideoCapture
+                b) a directory, a glob pattern or an iterable of image files
+            stride (int): yield one frame in every stride frames
+            start (int): index of the first frame
+            buffer (int): max number of decoded frames waiting in buffer
+            drop (bool): drop oldest frames instead of waiting when full
+            name (str): name of video frames, default to stem of the file
+        """
+        if stride <= 0 or buffer <= 0 or start < 0:
+            msg = "stride, buffer must > 0 and start >= 0, got {}, {}, {}"
+            raise ValueError(msg.format(stride, buffer, start))
+
+        self._capture, self._files = None, None
+        if isinstance(source, int) or (
+                isinstance(source, (str, pathlib.Path))
+                and pathlib.Path(source).is_file()
+                ):
+            source = source if isinstance(source, int) else str(source)
+            self._capture = cv2.VideoCapture(source)
+            if not self._capture.isOpened():
+                msg = "Can not open video: {}".format(source)
+                raise ValueError(msg)
+            default_name = "camera{}".format(source) \
+                if isinstance(source, int) else pathlib.Path(source).stem
+            # VideoCapture is not thread-safe, so never queried while
+            # the decoding thread may be reading it
+            self._count = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            self._fps = self._capture.get(cv2.CAP_PROP_FPS)
+        else:
+            self._files = _expand_files(source)
+            default_name = "sequence"
+            self._count, self._fps = len(self._files), 0.0
+
+        self.name = name if name else default_name
+        self.stride = stride
+        self.dropped = 0
+
+        self._frames = deque(maxlen=buffer)
+        self._drop = drop
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self._finished = False
+        self._error = None
+        self._position = start
+
+    @property
+    def is_camera(self) -> bool:
+        return self._capture is not None and self._count <= 0
+
+    @property
+    def fps(self) -> float:
+        """Frames per second of video, 0 if unknown or for image sequence"""
+        return self._fps
+
+    def __len__(self) -> int:
+        """Number of frames in source, ignoring stride and start"""
+        return max(self._count, 0)
+
+    def seek(self, index: int):
+        """Continue from frame of index, dropping decoded frames
+
+        For videos, accuracy of seeking depends on the codec and backend.
+        """
+        if self.is_camera:
+            raise ValueError("Can not seek frames of camera")
+        if not 0 <= index < len(self):
+            msg = "Seek frame {} out of range of {} frames"
+            raise ValueError(msg.format(index, len(self)))
+
+        self._stop_decoding()
+        with self._cond:
+            self._frames.clear()
+            self._finished, self._error = False, None
+            self._position = index
+
+    def __iter__(self) -> "FrameSource":
+        return self
+
+    def __next__(self) -> Image:
+        with self._cond:
+            if self._thread is None and not self._finished:
+                self._stop = False
+                self._thread = threading.Thread(
+                    target=self._decode, args=(self._position,), daemon=True
+                )
+                self._thread.start()
+
+            while not self._frames and not self._finished:
+                self._cond.wait()
+            if self._frames:
+                _, frame = self._frames.popleft()
+                self._cond.notify_all()
+                return frame
+
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+            raise StopIteration
+
+    def close(self):
+        """Stop decoding and release the video"""
+        self._stop_decoding()
+        with self._cond:
+            self._frames.clear()
+            self._finished = True
+        if self._capture is not None:
+            self._capture.release()
+
+    def __enter__(self) -> "FrameSource":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _stop_decoding(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def _put(self, index: int, frame: Image) -> bool:
+        """Put frame into buffer, return False if decoding is stopped"""
+        with self._cond:
+            while not self._drop and not self._stop and \
+                    len(self._frames) == self._frames.maxlen:
+                self._cond.wait()
+            if self._stop:
+                return False
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append((index, frame))
+            self._cond.notify_all()
+            return True
+
+    def _decode(self, start: int):
+        """Entry of decoding thread"""
+        try:
+            if self._capture is not None:
+                self._decode_video(start)
+            else:
+                self._decode_files(start)
+        except Exception as err:
+            with self._cond:
+                self._error = err
+        finally:
+            with self._cond:
+                if not self._stop:
+                    self._finished = True
+                self._cond.notify_all()
+
+    def _decode_video(self, start: int):
+        capture = self._capture
+        if not self.is_camera:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        index = start
+        while True:
+            success, frame = capture.read()
+            if not success:
+                return
+            name = "{}_{:06d}".format(self.name, index)
+            if not self._put(index, Image(frame, name=name, copy=False)):
+                return
+            index += self.stride
+            # skipped frames are grabbed without decoding
+            for _ in range(self.stride - 1):
+                if self._stop or not capture.grab():
+                    return
+
+    def _decode_files(self, start: int):
+        for index in range(start, len(self._files), self.stride):
+            try:
+                frame = Image.from_file(self._files[index])
+            except ValueError as err:
+                warnings.warn(str(err))
+                continue
+            if not self._put(index, frame):
+                return